@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import httpx
 import uuid
@@ -8,6 +8,7 @@ import time
 import logging
 from middleware import RateLimitMiddleware, RequestIDMiddleware
 from dependencies import verify_token
+from responses import FastJSONResponse
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,6 +17,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
+    default_response_class=FastJSONResponse,
     title="API Gateway",
     version="1.0.0",
     description="Gateway for microservices task management system"
@@ -39,6 +41,9 @@ ORDER_SERVICE_URL = "http://orders-service:8002"
 DEV_USER_SERVICE_URL = "http://localhost:8001"
 DEV_ORDER_SERVICE_URL = "http://localhost:8002"
 
+# заголовки транспорта upstream-ответа; тело уже раскодировано httpx
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length"}
+
 def get_service_urls():
     import os
     env = os.getenv("ENVIRONMENT", "development")
@@ -80,6 +85,60 @@ async def proxy_auth(request: Request, path: str):
     user_service_url, _ = get_service_urls()
     return await proxy_request(request, user_service_url, f"auth/{path}")
 
+@app.get("/v1/orders/events")
+async def proxy_order_events(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(verify_token)
+):
+    # SSE нельзя буферизовать целиком, как в proxy_request: отдаем поток по мере поступления
+    _, order_service_url = get_service_urls()
+    
+    headers = {"Authorization": request.headers["authorization"], "Accept": "text/event-stream"}
+    if request.headers.get("last-event-id"):
+        headers["Last-Event-ID"] = request.headers["last-event-id"]
+    request_id = getattr(request.state, 'request_id', None)
+    if request_id:
+        headers["X-Request-ID"] = request_id
+    
+    client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+    try:
+        upstream = await client.send(
+            client.build_request("GET", f"{order_service_url}/v1/orders/events", headers=headers),
+            stream=True
+        )
+    except httpx.ConnectError:
+        await client.aclose()
+        logger.error(f"Cannot connect to service: {order_service_url}")
+        return FastJSONResponse(
+            status_code=503,
+            content={
+                "success": False,
+                "error": {
+                    "code": "SERVICE_UNAVAILABLE",
+                    "message": "Service temporarily unavailable"
+                }
+            }
+        )
+    
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+            await client.aclose()
+    
+    return StreamingResponse(
+        relay(),
+        status_code=upstream.status_code,
+        headers={
+            "Content-Type": upstream.headers.get("content-type", "text/event-stream"),
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.api_route("/v1/orders/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy_orders(
     request: Request, 
@@ -109,18 +168,21 @@ async def proxy_request(request: Request, base_url: str, path: str):
                 url=url,
                 headers=headers,
                 content=await request.body(),
-                params=dict(request.query_params)
+                params=request.query_params.multi_items()
             )
-        #Возвращаем ответ от сервиса
-        return JSONResponse(
-            content=response.json(),
+        #Возвращаем ответ от сервиса как есть, без разбора и повторного кодирования JSON
+        return Response(
+            content=response.content,
             status_code=response.status_code,
-            headers=dict(response.headers)
+            headers={
+                name: value for name, value in response.headers.items()
+                if name.lower() not in HOP_BY_HOP_HEADERS
+            }
         )
     
     except httpx.ConnectError:
         logger.error(f"Cannot connect to service: {base_url}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=503,
             content={
                 "success": False,
@@ -132,7 +194,7 @@ async def proxy_request(request: Request, base_url: str, path: str):
         )
     except Exception as e:
         logger.error(f"Proxy error: {str(e)}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={
                 "success": False,
@@ -148,7 +210,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     request_id = getattr(request.state, 'request_id', 'unknown')
     logger.warning(f"HTTPException: {exc.status_code} - {exc.detail} - ID: {request_id}")
     
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
@@ -0,0 +1,90 @@
+"""Первичные ключи заказов: случайные uuid4 против упорядоченных по времени UUIDv7.
+
+Скорость вставки (всего и на последней пачке, когда B-дерево уже большое) и размер
+индекса первичного ключа orders и таблицы order_items (WITHOUT ROWID, ключ
+(order_id, position)) после заполнения. Размер берется из dbstat, если SQLite
+собран с ним, иначе - размер файла.
+
+    python benchmarks/bench_ids.py --orders 200000 --batch 500
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+os.environ["DATABASE_URL"] = os.path.join(tempfile.mkdtemp(), "bench_orders.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "service_orders"))
+
+from database import OrderDB  # noqa: E402
+from ids import new_id  # noqa: E402
+from models import OrderItem, OrderStatus  # noqa: E402
+
+ITEMS = [
+    OrderItem(product_id="prod_1", product_name="Product 1", quantity=2, price=25.5),
+    OrderItem(product_id="prod_2", product_name="Product 2", quantity=1, price=10.0),
+]
+GENERATORS = [("uuid4", lambda: str(uuid.uuid4())), ("uuid7", new_id)]
+
+
+def make_order(order_id: str, user_index: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "id": order_id,
+        "user_id": f"user_{user_index % 100}",
+        "items": ITEMS,
+        "status": OrderStatus.CREATED,
+        "total_amount": 61.0,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def fill(db: OrderDB, generate, total: int, batch: int):
+    # -> (секунды на все пачки, секунды на последнюю)
+    started = time.perf_counter()
+    last = 0.0
+    for offset in range(0, total, batch):
+        orders = [make_order(generate(), i) for i in range(offset, min(offset + batch, total))]
+        batch_started = time.perf_counter()
+        db.create_orders_bulk(orders)
+        last = time.perf_counter() - batch_started
+    return time.perf_counter() - started, last
+
+
+def sizes(path: str) -> dict:
+    with sqlite3.connect(path) as conn:
+        try:
+            rows = conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall()
+        except sqlite3.OperationalError:
+            return {"file": os.path.getsize(path)}
+    by_name = dict(rows)
+    return {"orders pk": by_name.get("sqlite_autoindex_orders_1", 0), "order_items": by_name.get("order_items", 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'ids':<8}{'orders':>9}{'seconds':>10}{'orders/s':>11}{'last batch/s':>14}  index size, MiB")
+    for name, generate in GENERATORS:
+        path = os.path.join(tempfile.mkdtemp(), f"bench_{name}.db")
+        db = OrderDB(db_path=path, shards=1)
+        elapsed, last = fill(db, generate, args.orders, args.batch)
+        index = "  ".join(f"{label} {size / 2 ** 20:.1f}" for label, size in sizes(path).items())
+        print(
+            f"{name:<8}{args.orders:>9}{elapsed:>10.2f}{args.orders / elapsed:>11.0f}"
+            f"{args.batch / last:>14.0f}  {index}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Кодирование страницы заказов в JSON: JSONResponse (stdlib json) против
+FastJSONResponse (orjson и stdlib-fallback).
+
+Два вида данных: dict из строк БД (as_dicts, время - datetime) и model_dump() моделей
+с datetime и Enum - для обоих JSONResponse нужен jsonable_encoder, FastJSONResponse
+кодирует сам.
+
+    python benchmarks/bench_json_encoding.py --rows 100 --repeat 500
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_orders.db")
+os.environ["DATABASE_URL"] = DB_PATH
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "service_orders"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import responses  # noqa: E402
+from database import order_db  # noqa: E402
+from models import OrderItem, OrderResponse, OrderStatus  # noqa: E402
+
+USER_ID = "bench_user"
+ITEMS = [
+    OrderItem(product_id="prod_1", product_name="Product 1", quantity=2, price=25.5),
+    OrderItem(product_id="prod_2", product_name="Product 2", quantity=1, price=10.0),
+    OrderItem(product_id="prod_3", product_name="Product 3", quantity=3, price=4.25),
+]
+
+
+def populate(total: int):
+    start = datetime(2024, 1, 1)
+    orders = []
+    for i in range(total):
+        created_at = start + timedelta(minutes=i, microseconds=i)
+        orders.append({
+            "id": str(uuid.uuid4()),
+            "user_id": USER_ID,
+            "items": ITEMS,
+            "status": OrderStatus.CREATED,
+            "total_amount": order_db.calculate_total_amount(ITEMS),
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+    order_db.create_orders_bulk(orders)
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    populate(args.rows)
+
+    rows = {"success": True, "data": {"orders": order_db.get_orders_by_user(USER_ID, 0, args.rows, as_dicts=True)}}
+    models = {
+        "success": True,
+        "data": {"orders": [
+            OrderResponse(**order.model_dump()).model_dump()
+            for order in order_db.get_orders_by_user(USER_ID, 0, args.rows)
+        ]}
+    }
+
+    encoders = [("stdlib", False)] + ([("orjson", True)] if responses.orjson is not None else [])
+    expected = JSONResponse(jsonable_encoder(rows)).body
+
+    print(f"{'payload':<10}{'encoder':<34}{'median ms':>10}{'bytes':>9}")
+    for payload_name, payload in (("rows", rows), ("models", models)):
+        body = JSONResponse(jsonable_encoder(payload)).body
+        assert body == expected
+        baseline = measure(lambda: JSONResponse(jsonable_encoder(payload)), args.repeat)
+        print(f"{payload_name:<10}{'JSONResponse + jsonable_encoder':<34}{baseline:>10.3f}{len(body):>9}")
+
+        for encoder_name, use_orjson in encoders:
+            responses.USE_ORJSON = use_orjson
+            assert responses.FastJSONResponse(payload).body == expected
+            elapsed = measure(lambda: responses.FastJSONResponse(payload), args.repeat)
+            print(f"{payload_name:<10}{'FastJSONResponse/' + encoder_name:<34}{elapsed:>10.3f}{len(body):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Создание заказов под параллельной нагрузкой: коммит на запрос против group commit
+(OrderWriteBatcher) с разными окнами - пропускная способность и задержка запроса.
+
+    python benchmarks/bench_orders_batching.py --orders 5000 --concurrency 200 --window 1 --window 5 --window 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_orders.db")
+os.environ["DATABASE_URL"] = DB_PATH
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "service_orders"))
+
+from batching import OrderWriteBatcher  # noqa: E402
+from database import order_db  # noqa: E402
+from models import OrderItem, OrderStatus  # noqa: E402
+
+ITEMS = [
+    OrderItem(product_id="prod_1", product_name="Product 1", quantity=2, price=25.5),
+    OrderItem(product_id="prod_2", product_name="Product 2", quantity=1, price=10.0),
+]
+
+
+def make_order(user_index: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": f"user_{user_index % 100}",
+        "items": ITEMS,
+        "status": OrderStatus.CREATED,
+        "total_amount": order_db.calculate_total_amount(ITEMS),
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+async def run(total: int, concurrency: int, create) -> tuple:
+    # concurrency клиентов, каждый создает заказы последовательно, как HTTP-клиент
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            started = time.perf_counter()
+            # запрос ждет своей очереди в event loop, как после разбора HTTP
+            await asyncio.sleep(0)
+            order = await create(make_order(i))
+            assert order is not None
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+async def direct_create(order_data: dict):
+    # как эндпоинт без батчинга: синхронный коммит прямо в event loop
+    return order_db.create_order(order_data)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--window", type=float, action="append", help="окно батча, мс")
+    parser.add_argument("--max-rows", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'mode':<16}{'orders/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'avg batch':>11}")
+    elapsed, p50, p99 = await run(args.orders, args.concurrency, direct_create)
+    print(f"{'per-request':<16}{args.orders / elapsed:>10.0f}{p50:>10.2f}{p99:>10.2f}{1:>11}")
+
+    for window in args.window or [0, 1, 5, 20]:
+        writer = OrderWriteBatcher(order_db, window_ms=window, max_rows=args.max_rows)
+        elapsed, p50, p99 = await run(args.orders, args.concurrency, writer.create_order)
+        await writer.close()
+        avg_batch = writer.stats()["avg_batch"]
+        print(f"{'batch/' + f'{window:g}ms':<16}{args.orders / elapsed:>10.0f}{p50:>10.2f}{p99:>10.2f}{avg_batch:>11}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Создание заказов: по одному (create_order) против пачек (create_orders_bulk).
+
+    python benchmarks/bench_orders_bulk.py --orders 5000 --batch 100
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_orders.db")
+os.environ["DATABASE_URL"] = DB_PATH
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "service_orders"))
+
+from database import order_db  # noqa: E402
+from models import OrderItem, OrderStatus  # noqa: E402
+
+ITEMS = [
+    OrderItem(product_id="prod_1", product_name="Product 1", quantity=2, price=25.5),
+    OrderItem(product_id="prod_2", product_name="Product 2", quantity=1, price=10.0),
+]
+
+
+def make_order(user_index: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": f"user_{user_index % 100}",
+        "items": ITEMS,
+        "status": OrderStatus.CREATED,
+        "total_amount": order_db.calculate_total_amount(ITEMS),
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def run_single(total: int) -> float:
+    started = time.perf_counter()
+    for i in range(total):
+        order_db.create_order(make_order(i))
+    return time.perf_counter() - started
+
+
+def run_bulk(total: int, batch: int) -> float:
+    started = time.perf_counter()
+    for offset in range(0, total, batch):
+        order_db.create_orders_bulk([make_order(i) for i in range(offset, min(offset + batch, total))])
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--batch", type=int, action="append")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'mode':<14}{'orders':>8}{'seconds':>10}{'orders/s':>12}")
+    elapsed = run_single(args.orders)
+    print(f"{'single':<14}{args.orders:>8}{elapsed:>10.2f}{args.orders / elapsed:>12.0f}")
+    for batch in args.batch or [10, 100, 500]:
+        elapsed = run_bulk(args.orders, batch)
+        print(f"{'bulk/' + str(batch):<14}{args.orders:>8}{elapsed:>10.2f}{args.orders / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
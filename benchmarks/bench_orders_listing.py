@@ -0,0 +1,98 @@
+"""Страница из 100 заказов: модели (Order -> OrderResponse -> StandardResponse ->
+jsonable_encoder) против строк БД сразу в dict и JSON (as_dicts + json_response).
+
+    python benchmarks/bench_orders_listing.py --rows 100 --repeat 300
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_orders.db")
+os.environ["DATABASE_URL"] = DB_PATH
+# первая страница пользователя кэшируется: с кэшем путь dicts мерил бы чтение из памяти
+os.environ["ORDER_CACHE_ENABLED"] = "false"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "service_orders"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from database import order_db  # noqa: E402
+from main import json_response  # noqa: E402
+from models import OrderItem, OrderResponse, OrderStatus, StandardResponse  # noqa: E402
+
+USER_ID = "bench_user"
+ITEMS = [
+    OrderItem(product_id="prod_1", product_name="Product 1", quantity=2, price=25.5),
+    OrderItem(product_id="prod_2", product_name="Product 2", quantity=1, price=10.0),
+    OrderItem(product_id="prod_3", product_name="Product 3", quantity=3, price=4.25),
+]
+
+
+def populate(total: int):
+    start = datetime(2024, 1, 1)
+    orders = []
+    for i in range(total):
+        created_at = start + timedelta(minutes=i)
+        orders.append({
+            "id": str(uuid.uuid4()),
+            "user_id": USER_ID,
+            "items": ITEMS,
+            "status": OrderStatus.CREATED,
+            "total_amount": order_db.calculate_total_amount(ITEMS),
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+    order_db.create_orders_bulk(orders)
+
+
+def via_models(rows: int) -> bytes:
+    # прежний путь: модели из строк, затем OrderResponse, затем проверка response_model
+    orders = order_db.get_orders_by_user(USER_ID, 0, rows)
+    response = StandardResponse(
+        success=True,
+        data={"orders": [OrderResponse(**order.dict()).dict() for order in orders], "pagination": {}}
+    )
+    validated = StandardResponse.model_validate(response.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def via_dicts(rows: int) -> bytes:
+    orders = order_db.get_orders_by_user(USER_ID, 0, rows, as_dicts=True)
+    return json_response({"orders": orders, "pagination": {}}).body
+
+
+def measure(fn, rows: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    populate(args.rows)
+    assert via_models(args.rows) == via_dicts(args.rows)
+
+    db_only = measure(lambda rows: order_db.get_orders_by_user(USER_ID, 0, rows, as_dicts=True), args.rows, args.repeat)
+    print(f"{'path':<10}{'median ms':>12}{'serialize ms':>14}")
+    for name, fn in (("models", via_models), ("dicts", via_dicts)):
+        total = measure(fn, args.rows, args.repeat)
+        print(f"{name:<10}{total:>12.2f}{total - db_only:>14.2f}")
+    print(f"{'db only':<10}{db_only:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
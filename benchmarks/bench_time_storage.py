@@ -0,0 +1,136 @@
+"""Хранение времени заказов: ISO-строки (старый формат) против целых микросекунд эпохи.
+
+Одни и те же заказы в двух файлах, второй - копия первой с временем в ISO. На странице
+из --page заказов пользователя меряются выборка строк, разбор времени для моделей
+(fromisoformat против from_db_time) и путь as_dicts до JSON, а также COUNT по
+диапазону created_at и размер таблицы orders с индексами.
+
+    python benchmarks/bench_time_storage.py --orders 50000 --page 100 --repeat 300
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_orders.db")
+os.environ["DATABASE_URL"] = DB_PATH
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "service_orders"))
+
+import responses  # noqa: E402
+from database import ORDER_COLUMNS, from_db_time, order_db  # noqa: E402
+from models import OrderItem, OrderStatus  # noqa: E402
+
+USERS = 50
+START = datetime(2024, 1, 1)
+ITEMS = [OrderItem(product_id="prod_1", product_name="Product 1", quantity=2, price=25.5)]
+
+
+def populate(total: int):
+    orders = []
+    for i in range(total):
+        created_at = START + timedelta(seconds=i * 37, microseconds=i * 7919 % 1_000_000)
+        orders.append({
+            "id": str(uuid.uuid4()),
+            "user_id": f"user_{i % USERS}",
+            "items": ITEMS,
+            "status": OrderStatus.CREATED,
+            "total_amount": 51.0,
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+    for offset in range(0, total, 1000):
+        order_db.create_orders_bulk(orders[offset:offset + 1000])
+
+
+def iso_copy(path: str) -> str:
+    # та же база с временем в ISO, как до миграции
+    # база в WAL: копия файла без checkpoint потеряла бы еще не перенесенные страницы,
+    # backup читает согласованный снимок вместе с WAL
+    legacy = os.path.join(os.path.dirname(path), "bench_orders_iso.db")
+    source = sqlite3.connect(path)
+    conn = sqlite3.connect(legacy)
+    try:
+        source.backup(conn)
+        conn.create_function("iso", 1, lambda value: from_db_time(value).isoformat())
+        conn.execute("UPDATE orders SET created_at = iso(created_at), updated_at = iso(updated_at)")
+        conn.commit()
+    finally:
+        source.close()
+        conn.close()
+    return legacy
+
+
+def table_size(conn) -> float:
+    rows = conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall()
+    return sum(size for name, size in rows if name == "orders" or name.startswith(("idx_orders_", "sqlite_autoindex_orders"))) / 2 ** 20
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    populate(args.orders)
+    formats = [
+        ("iso", iso_copy(DB_PATH), datetime.fromisoformat, lambda value: value),
+        ("epoch", DB_PATH, from_db_time, from_db_time)
+    ]
+
+    page_query = f"SELECT {ORDER_COLUMNS} FROM orders WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ?"
+    range_query = "SELECT COUNT(*) FROM orders WHERE created_at BETWEEN ? AND ?"
+    # заказы идут каждые 37 секунд: диапазон - примерно треть базы
+    span = timedelta(seconds=37 * args.orders)
+    range_from, range_to = START + span / 3, START + span * 2 / 3
+
+    print(f"{'format':<8}{'fetch us':>10}{'parse us':>10}{'dict+json us':>14}{'range count us':>16}{'orders+idx MiB':>16}")
+    bodies = []
+    for name, path, parse, to_dict_time in formats:
+        with sqlite3.connect(path) as conn:
+            # база в WAL: после VACUUM страницы переносятся в основной файл, чтобы чтение не шло через WAL
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            bounds = (range_from.isoformat(), range_to.isoformat()) if name == "iso" else (
+                (range_from - datetime(1970, 1, 1)) // timedelta(microseconds=1),
+                (range_to - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+            )
+            rows = conn.execute(page_query, ("user_1", args.page)).fetchall()
+
+            fetch = measure(lambda: conn.execute(page_query, ("user_1", args.page)).fetchall(), args.repeat)
+            # то, что _order_from_row делает со временем каждой строки
+            parsed = measure(lambda: [(parse(row[4]), parse(row[5])) for row in rows], args.repeat)
+
+            def dicts_json():
+                orders = [
+                    {"id": row[0], "created_at": to_dict_time(row[4]), "updated_at": to_dict_time(row[5])}
+                    for row in rows
+                ]
+                return responses.dumps({"orders": orders})
+
+            dicts = measure(dicts_json, args.repeat)
+            bodies.append(dicts_json())
+            counted = measure(lambda: conn.execute(range_query, bounds).fetchone(), args.repeat)
+            print(f"{name:<8}{fetch:>10.1f}{parsed:>10.1f}{dicts:>14.1f}{counted:>16.1f}{table_size(conn):>16.2f}")
+
+    assert bodies[0] == bodies[1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Поиск пользователей по подстроке email: FTS5 trigram против LIKE '%x%'.
+
+    python benchmarks/bench_users_search.py --users 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_users.db")
+os.environ["DATABASE_URL"] = DB_PATH
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "service_users"))
+
+from database import to_db_time, user_db  # noqa: E402
+
+
+def populate(total: int, batch: int = 50_000):
+    start = datetime(2024, 1, 1)
+    with user_db.get_connection() as conn:
+        for offset in range(0, total, batch):
+            rows = []
+            for i in range(offset, min(offset + batch, total)):
+                ts = to_db_time(start + timedelta(seconds=i))
+                rows.append((str(uuid.uuid4()), f"user{i}@tenant{i % 1000}.example.com",
+                             "x", f"User {i}", "user", ts, ts))
+            conn.executemany(
+                "INSERT INTO users (id, email, password_hash, name, roles, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not user_db.search_enabled:
+        print("FTS5 trigram is not available in this SQLite build")
+        return
+
+    started = time.perf_counter()
+    populate(args.users)
+    print(f"populated {args.users} users in {time.perf_counter() - started:.1f}s ({DB_PATH})")
+
+    # селективный, средний и широкий фильтр
+    terms = [f"user{args.users // 2}@", "tenant42.", "example"]
+
+    print(f"{'filter':<24}{'mode':<8}{'list ms':>10}{'count ms':>10}{'matches':>10}")
+    for term in terms:
+        for mode, enabled in (("like", False), ("fts", True)):
+            user_db.search_enabled = enabled
+            list_ms = measure(lambda: user_db.get_all_users(0, 10, term), args.repeat)
+            count_ms = measure(lambda: user_db.get_users_count(term), args.repeat)
+            matches = user_db.get_users_count(term)
+            print(f"{term:<24}{mode:<8}{list_ms:>10.2f}{count_ms:>10.2f}{matches:>10}")
+    user_db.search_enabled = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from models import Order
+
+logger = logging.getLogger(__name__)
+
+class OrderWriteBatcher:
+    # Group commit для create_order: заказы из параллельных запросов копятся в очереди,
+    # единственный писатель сбрасывает их одной транзакцией раз в window_ms или
+    # по набору max_rows. Future запроса завершается после коммита его пачки.
+    def __init__(self, db, window_ms: float = 0.0, max_rows: int = 200):
+        self.db = db
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self.batches = 0
+        self.rows = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def create_order(self, order_data: dict) -> Optional[Order]:
+        self._ensure_writer()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((order_data, future))
+        if self._queue.qsize() >= self.max_rows:
+            self._full.set()
+        return await future
+
+    def _ensure_writer(self):
+        # писатель стартует лениво в текущем event loop
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue()
+            self._full = asyncio.Event()
+            self._writer = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # ждем окно, если пачка не набралась раньше; при окне 0 пачку составляет
+            # то, что накопилось, пока шел предыдущий коммит
+            if self.window > 0 and self._queue.qsize() < self.max_rows - 1:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+
+            while len(batch) < self.max_rows and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # транзакция у каждого шарда своя: пачка сбрасывается по шардам
+            by_shard = defaultdict(list)
+            for entry in batch:
+                by_shard[self.db.shard_for_user(entry[0]["user_id"])].append(entry)
+            for shard_batch in by_shard.values():
+                await self._flush(shard_batch)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        orders_data = [order_data for order_data, _ in batch]
+        try:
+            orders = await asyncio.to_thread(self.db.create_orders_bulk, orders_data)
+            if orders is None:
+                # одна плохая строка не должна валить всю пачку: повторяем по одной
+                orders = [await asyncio.to_thread(self.db.create_order, order_data) for order_data in orders_data]
+
+            for (_, future), order in zip(batch, orders):
+                if not future.done():
+                    future.set_result(order)
+
+            self.batches += 1
+            self.rows += len(batch)
+
+        except Exception as e:
+            logger.error(f"Order write batch failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    async def close(self):
+        # дописываем очередь и останавливаем писателя
+        if self._writer is None or self._writer.done():
+            return
+
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_rows": self.max_rows,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch": round(self.rows / self.batches, 2) if self.batches else 0.0
+        }
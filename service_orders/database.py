@@ -1,9 +1,15 @@
+import heapq
+import json
 import logging
 import sqlite3
-import json
-from typing import List, Optional
-from datetime import datetime
-from models import Order, OrderItem, OrderStatus
+import zlib
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from datetime import datetime, timedelta, timezone
+from models import Order, OrderItem, OrderStatus, TERMINAL_STATUSES, allowed_sources
+from cache import TTLCache, MISSING
+from ids import new_id
 import os
 
 logger = logging.getLogger(__name__)
@@ -11,83 +17,695 @@ logger = logging.getLogger(__name__)
 #configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "orders.db")
 
+# Число файлов-шардов; все заказы пользователя лежат в одном шарде
+ORDER_SHARDS = int(os.getenv("ORDER_SHARDS", "1"))
+
+# Кэш заказов и первых страниц списков; сбрасывается при каждой записи через этот
+# процесс, записи из других процессов (manage.py) видны не позже чем через ORDER_CACHE_TTL
+ORDER_CACHE_ENABLED = os.getenv("ORDER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ORDER_CACHE_SIZE = int(os.getenv("ORDER_CACHE_SIZE", "10000"))
+ORDER_CACHE_TTL = float(os.getenv("ORDER_CACHE_TTL", "30"))
+
+ORDER_COLUMN_NAMES = ["id", "user_id", "status", "total_amount", "created_at", "updated_at", "version"]
+ORDER_COLUMNS = ", ".join(ORDER_COLUMN_NAMES)
+ITEM_COLUMNS = "order_id, position, product_id, product_name, quantity, price"
+
+# user_id строки счетчиков по всем пользователям
+ALL_USERS = "*"
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+def to_db_time(value: datetime) -> int:
+    # время хранится целым числом микросекунд от эпохи UTC; naive datetime - это UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // MICROSECOND
+
+def from_db_time(value: int) -> datetime:
+    # naive UTC; в ISO-строку время переводит только кодировщик ответа.
+    # Целочисленная арифметика timedelta - точно для любой даты, без float
+    return EPOCH + MICROSECOND * value
+
+def epoch_us(value):
+    # SQL-функция миграции: ISO-строка старого формата -> микросекунды, числа как есть
+    if isinstance(value, str):
+        return to_db_time(datetime.fromisoformat(value))
+    return value
+
+def pick_fields(order: dict, fields: Optional[Set[str]] = None) -> dict:
+    if fields is None:
+        return order
+    return {name: value for name, value in order.items() if name in fields}
+
+def order_columns(fields: Optional[Set[str]] = None) -> str:
+    # Столбцы вне fields читаются как NULL: позиции в строке не меняются, а запросу
+    # может хватить индекса. id и created_at нужны всегда - позиции и курсор
+    if fields is None:
+        return ORDER_COLUMNS
+    return ", ".join(
+        column if column in fields or column in ("id", "created_at") else "NULL"
+        for column in ORDER_COLUMN_NAMES
+    )
+
+def orders_source(include_archived: bool = False) -> str:
+    # горячая таблица или она же вместе с архивом
+    if not include_archived:
+        return "orders"
+    return f"(SELECT {ORDER_COLUMNS} FROM orders UNION ALL SELECT {ORDER_COLUMNS} FROM orders_archive)"
+
+def items_source(include_archived: bool = False) -> str:
+    if not include_archived:
+        return "order_items"
+    return f"(SELECT {ITEM_COLUMNS} FROM order_items UNION ALL SELECT {ITEM_COLUMNS} FROM order_items_archive)"
+
+def status_condition(statuses: List[str]) -> Tuple[str, list]:
+    if len(statuses) == 1:
+        return "status = ?", list(statuses)
+    return f"status IN ({', '.join('?' for _ in statuses)})", list(statuses)
+
+def listing_conditions(status_filter: List[str] = None, created_from: datetime = None,
+                       created_to: datetime = None, product_filter: str = None,
+                       include_archived: bool = False) -> Tuple[List[str], list]:
+    # Фильтры списков заказов. Статусы и диапазон created_at ложатся на индексы
+    # (..., status, created_at, id) и (..., created_at, id) как диапазон, а не фильтр страницы
+    conditions = []
+    params = []
+    
+    if status_filter:
+        condition, status_params = status_condition(status_filter)
+        conditions.append(condition)
+        params.extend(status_params)
+    if created_from:
+        conditions.append("created_at >= ?")
+        params.append(to_db_time(created_from))
+    if created_to:
+        conditions.append("created_at <= ?")
+        params.append(to_db_time(created_to))
+    if product_filter:
+        conditions.append(f"id IN (SELECT order_id FROM {items_source(include_archived)} WHERE product_id = ?)")
+        params.append(product_filter)
+    
+    return conditions, params
+
+def shard_paths(base_path: str, count: int) -> List[str]:
+    # один шард - сам DATABASE_URL, иначе orders.0-of-4.db, orders.1-of-4.db, ...
+    if count <= 1:
+        return [base_path]
+    root, ext = os.path.splitext(base_path)
+    return [f"{root}.{index}-of-{count}{ext}" for index in range(count)]
+
+def shard_of(key: str, count: int) -> int:
+    return zlib.crc32(key.encode()) % count
+
 class OrderDB:
-    def __init__(self):
-        self.db_path = DATABASE_URL
+    def __init__(self, db_path: str = DATABASE_URL, shards: int = ORDER_SHARDS):
+        self.db_path = db_path
+        self.shard_paths = shard_paths(db_path, shards)
+        # ("id", order_id) -> dict заказа, ("user", user_id) -> (limit, dict первой страницы);
+        # значения общие для всех вызовов - не изменять на месте
+        self.cache = TTLCache(ORDER_CACHE_SIZE if ORDER_CACHE_ENABLED else 0, ORDER_CACHE_TTL)
+        # растет при каждой записи: чтение, которое пересеклось с записью
+        # (create_orders_bulk из потока батчера), не кладет результат в кэш
+        self._cache_epoch = 0
         self.init_database()
 
     def init_database(self):
+        for path in self.shard_paths:
+            self._init_shard(path)
+
+    def _init_shard(self, path: str):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite3.connect(path) as conn:
                 cursor = conn.cursor()
                 
+                # WAL: долгие чтения (экспорт) не блокируют запись
+                cursor.execute('PRAGMA journal_mode=WAL')
+                
                 # Create orders table
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS orders (
                         id TEXT PRIMARY KEY,
                         user_id TEXT NOT NULL,
-                        items TEXT NOT NULL,
                         status TEXT NOT NULL,
                         total_amount REAL NOT NULL,
-                        created_at TIMESTAMP NOT NULL,
-                        updated_at TIMESTAMP NOT NULL
+                        created_at INTEGER NOT NULL,
+                        updated_at INTEGER NOT NULL,
+                        version INTEGER NOT NULL DEFAULT 1
                     )
                 ''')
                 
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)')
+                cursor.execute("PRAGMA table_info(orders)")
+                if 'version' not in [column[1] for column in cursor.fetchall()]:
+                    cursor.execute('ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+                
+                # Позиции заказа; первичный ключ (order_id, position) хранит их рядом с заказом
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS order_items (
+                        order_id TEXT NOT NULL,
+                        position INTEGER NOT NULL,
+                        product_id TEXT NOT NULL,
+                        product_name TEXT NOT NULL,
+                        quantity INTEGER NOT NULL,
+                        price REAL NOT NULL,
+                        PRIMARY KEY (order_id, position)
+                    ) WITHOUT ROWID
+                ''')
+                
+                self._migrate_items_blob(cursor)
+                
+                # (created_at, id) в конце индексов - порядок выдачи и keyset-курсор
+                cursor.execute('DROP INDEX IF EXISTS idx_orders_user_id')
+                cursor.execute('DROP INDEX IF EXISTS idx_orders_created_at')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders(user_id, created_at, id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_status_created ON orders(user_id, status, created_at, id)')
+                cursor.execute('DROP INDEX IF EXISTS idx_orders_status')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders(status, created_at, id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at, id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_order_items_product_id ON order_items(product_id)')
+                
+                self._init_archive(cursor)
+                self._init_idempotency(cursor)
+                self._migrate_epoch_times(cursor, path)
+                self._init_counters(cursor)
+                self._init_stats(cursor)
                 
                 conn.commit()
-                logger.info("Orders database initialized successfully")
+                logger.info(f"Orders database initialized successfully: {path}")
                 
         except sqlite3.Error as e:
             logger.error(f"Database initialization error: {e}")
             raise
 
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
+    def _migrate_items_blob(self, cursor):
+        # старая схема хранила позиции JSON-строкой в orders.items
+        cursor.execute("PRAGMA table_info(orders)")
+        if 'items' not in [column[1] for column in cursor.fetchall()]:
+            return
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO order_items (order_id, position, product_id, product_name, quantity, price)
+            SELECT orders.id, item.key,
+                   json_extract(item.value, '$.product_id'),
+                   json_extract(item.value, '$.product_name'),
+                   json_extract(item.value, '$.quantity'),
+                   json_extract(item.value, '$.price')
+            FROM orders, json_each(orders.items) AS item
+        ''')
+        migrated = cursor.rowcount
+        cursor.execute('ALTER TABLE orders DROP COLUMN items')
+        logger.info(f"Migrated {migrated} order items from JSON column")
+
+    def _migrate_epoch_times(self, cursor, path: str):
+        # старая схема хранила время ISO-строками; перевод идет в транзакции инициализации,
+        # триггеры сводок со старым date(created_at) пересоздает _init_stats
+        cursor.connection.create_function("epoch_us", 1, epoch_us, deterministic=True)
+        migrated = 0
+        for table in ("orders", "orders_archive"):
+            cursor.execute(f'''
+                UPDATE {table} SET created_at = epoch_us(created_at), updated_at = epoch_us(updated_at)
+                WHERE typeof(created_at) = 'text' OR typeof(updated_at) = 'text'
+            ''')
+            migrated += cursor.rowcount
+        cursor.execute("UPDATE idempotency_keys SET created_at = epoch_us(created_at) WHERE typeof(created_at) = 'text'")
+        
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'order_stats_ai'")
+        trigger = cursor.fetchone()
+        if trigger and 'unixepoch' not in trigger[0]:
+            cursor.execute('DROP TRIGGER order_stats_ai')
+            cursor.execute('DROP TRIGGER IF EXISTS order_stats_cancel_au')
+        
+        if migrated:
+            logger.info(f"Migrated {migrated} orders to epoch timestamps: {path}")
+
+    def _init_archive(self, cursor):
+        # Холодные заказы в конечных статусах: та же схема, что у горячих таблиц,
+        # в том же файле - перенос пачки идет одной транзакцией
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS orders_archive (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total_amount REAL NOT NULL,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_items_archive (
+                order_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                product_id TEXT NOT NULL,
+                product_name TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                price REAL NOT NULL,
+                PRIMARY KEY (order_id, position)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_archive_user_created ON orders_archive(user_id, created_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_archive_status_created ON orders_archive(status, created_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_archive_created ON orders_archive(created_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_order_items_archive_product_id ON order_items_archive(product_id)')
+
+    def _init_idempotency(self, cursor):
+        # Idempotency-Key создания заказа: ключ пишется в одной транзакции с заказом
+        # в шарде пользователя, повтор упирается в первичный ключ и второй заказ не создает
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                user_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                order_id TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (user_id, key)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at)')
+
+    def _init_counters(self, cursor):
+        # Число заказов по (user_id, status) и по всем пользователям (ALL_USERS);
+        # триггеры обновляют счетчики в той же транзакции, что и сам заказ.
+        # Архивные заказы считаются отдельно, по статусу в archive_counts
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_counts'")
+        exists = cursor.fetchone() is not None
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archive_counts'")
+        archive_exists = cursor.fetchone() is not None
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_counts (
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, status)
+            ) WITHOUT ROWID
+        ''')
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS order_counts_ai AFTER INSERT ON orders BEGIN
+                INSERT INTO order_counts (user_id, status, count) VALUES (new.user_id, new.status, 1)
+                ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+                INSERT INTO order_counts (user_id, status, count) VALUES ('{ALL_USERS}', new.status, 1)
+                ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS order_counts_ad AFTER DELETE ON orders BEGIN
+                UPDATE order_counts SET count = count - 1
+                WHERE user_id IN (old.user_id, '{ALL_USERS}') AND status = old.status;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS order_counts_au AFTER UPDATE OF status ON orders
+            WHEN old.status IS NOT new.status BEGIN
+                UPDATE order_counts SET count = count - 1
+                WHERE user_id IN (old.user_id, '{ALL_USERS}') AND status = old.status;
+                INSERT INTO order_counts (user_id, status, count) VALUES (new.user_id, new.status, 1)
+                ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+                INSERT INTO order_counts (user_id, status, count) VALUES ('{ALL_USERS}', new.status, 1)
+                ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        
+        if not exists:
+            cursor.execute('''
+                INSERT INTO order_counts (user_id, status, count)
+                SELECT user_id, status, COUNT(*) FROM orders GROUP BY user_id, status
+            ''')
+            cursor.execute(f'''
+                INSERT INTO order_counts (user_id, status, count)
+                SELECT '{ALL_USERS}', status, COUNT(*) FROM orders GROUP BY status
+            ''')
+        
+        # архивная строка не меняется: ее вставляет архивация и копирование шардов
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_counts (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS archive_counts_ai AFTER INSERT ON orders_archive BEGIN
+                INSERT INTO archive_counts (status, count) VALUES (new.status, 1)
+                ON CONFLICT (status) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS archive_counts_ad AFTER DELETE ON orders_archive BEGIN
+                UPDATE archive_counts SET count = count - 1 WHERE status = old.status;
+            END
+        ''')
+        
+        if not archive_exists:
+            cursor.execute('''
+                INSERT INTO archive_counts (status, count)
+                SELECT status, COUNT(*) FROM orders_archive GROUP BY status
+            ''')
+
+    def _init_stats(self, cursor):
+        # Сводки для аналитики, их ведут триггеры в транзакции заказа.
+        # Выручка и траты считаются без отмененных заказов. Удаление и архивация
+        # заказа их не меняют - их пересчитывает rebuild_stats() по обеим таблицам.
+        # Число заказов по статусам сводки не хранят: это строки ALL_USERS в order_counts
+        # плюс archive_counts (get_stats_overview)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_daily_stats'")
+        exists = cursor.fetchone() is not None
+        
+        # прежняя копия счетчиков по статусам (order_status_stats) и ее триггеры
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'order_stats_ai'")
+        trigger = cursor.fetchone()
+        if trigger and 'order_status_stats' in trigger[0]:
+            cursor.execute('DROP TRIGGER order_stats_ai')
+        cursor.execute('DROP TRIGGER IF EXISTS order_stats_au')
+        cursor.execute('DROP TABLE IF EXISTS order_status_stats')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_daily_stats (
+                day TEXT PRIMARY KEY,
+                orders_count INTEGER NOT NULL,
+                revenue REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_spend_stats (
+                user_id TEXT PRIMARY KEY,
+                orders_count INTEGER NOT NULL,
+                total_spent REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_spend_total ON user_spend_stats(total_spent)')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS order_stats_ai AFTER INSERT ON orders BEGIN
+                INSERT INTO order_daily_stats (day, orders_count, revenue)
+                VALUES (date(new.created_at / 1000000, 'unixepoch'), 1, iif(new.status = 'cancelled', 0, new.total_amount))
+                ON CONFLICT (day) DO UPDATE SET
+                    orders_count = orders_count + 1,
+                    revenue = revenue + excluded.revenue;
+                INSERT INTO user_spend_stats (user_id, orders_count, total_spent)
+                SELECT new.user_id, 1, new.total_amount WHERE new.status != 'cancelled'
+                ON CONFLICT (user_id) DO UPDATE SET
+                    orders_count = orders_count + 1,
+                    total_spent = total_spent + excluded.total_spent;
+            END
+        ''')
+        # отмена вычитает заказ из выручки и трат; обратный переход возвращает
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS order_stats_cancel_au AFTER UPDATE OF status ON orders
+            WHEN (old.status = 'cancelled') != (new.status = 'cancelled') BEGIN
+                UPDATE order_daily_stats
+                SET revenue = revenue + iif(new.status = 'cancelled', -new.total_amount, new.total_amount)
+                WHERE day = date(new.created_at / 1000000, 'unixepoch');
+                INSERT INTO user_spend_stats (user_id, orders_count, total_spent)
+                VALUES (
+                    new.user_id,
+                    iif(new.status = 'cancelled', -1, 1),
+                    iif(new.status = 'cancelled', -new.total_amount, new.total_amount)
+                )
+                ON CONFLICT (user_id) DO UPDATE SET
+                    orders_count = orders_count + excluded.orders_count,
+                    total_spent = total_spent + excluded.total_spent;
+            END
+        ''')
+        
+        if not exists:
+            self._fill_stats(cursor)
+
+    def _fill_stats(self, cursor):
+        source = orders_source(include_archived=True)
+        cursor.execute(f'''
+            INSERT INTO order_daily_stats (day, orders_count, revenue)
+            SELECT date(created_at / 1000000, 'unixepoch'), COUNT(*), TOTAL(iif(status = 'cancelled', 0, total_amount))
+            FROM {source} GROUP BY 1
+        ''')
+        cursor.execute(f'''
+            INSERT INTO user_spend_stats (user_id, orders_count, total_spent)
+            SELECT user_id, COUNT(*), TOTAL(total_amount)
+            FROM {source} WHERE status != 'cancelled' GROUP BY user_id
+        ''')
+
+    def rebuild_stats(self) -> bool:
+        # полный пересчет сводок по горячим и архивным заказам
+        try:
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.execute('DELETE FROM order_daily_stats')
+                    cursor.execute('DELETE FROM user_spend_stats')
+                    self._fill_stats(cursor)
+                    conn.commit()
+            
+            logger.info("Order stats rebuilt")
+            return True
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error rebuilding order stats: {e}")
+            return False
+
+    def get_stats_overview(self) -> Optional[dict]:
+        try:
+            by_status = {status.value: 0 for status in OrderStatus}
+            revenue = 0.0
+            
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    
+                    # горячие и архивные заказы - только из счетчиков
+                    cursor.execute('SELECT status, count FROM order_counts WHERE user_id = ?', (ALL_USERS,))
+                    rows = cursor.fetchall()
+                    cursor.execute('SELECT status, count FROM archive_counts')
+                    for status, orders_count in rows + cursor.fetchall():
+                        by_status[status] = by_status.get(status, 0) + orders_count
+                    
+                    cursor.execute('SELECT TOTAL(revenue) FROM order_daily_stats')
+                    revenue += cursor.fetchone()[0]
+            
+            return {
+                "total_orders": sum(by_status.values()),
+                "orders_by_status": by_status,
+                "revenue": round(revenue, 2)
+            }
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error getting order stats: {e}")
+            return None
+
+    def get_daily_stats(self, date_from: str, date_to: str) -> Optional[List[dict]]:
+        try:
+            days = defaultdict(lambda: [0, 0.0])
+            
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT day, orders_count, revenue FROM order_daily_stats
+                        WHERE day BETWEEN ? AND ?
+                    ''', (date_from, date_to))
+                    
+                    for day, orders_count, revenue in cursor.fetchall():
+                        days[day][0] += orders_count
+                        days[day][1] += revenue
+            
+            return [
+                {"day": day, "orders": orders_count, "revenue": round(revenue, 2)}
+                for day, (orders_count, revenue) in sorted(days.items())
+            ]
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error getting daily order stats: {e}")
+            return None
+
+    def get_top_spenders(self, limit: int = 10) -> Optional[List[dict]]:
+        # пользователь целиком в одном шарде: общий топ - лучшие из топов шардов
+        try:
+            rows = []
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT user_id, orders_count, total_spent FROM user_spend_stats
+                        ORDER BY total_spent DESC
+                        LIMIT ?
+                    ''', (limit,))
+                    rows.extend(cursor.fetchall())
+            
+            return [
+                {"user_id": row[0], "orders": row[1], "total_spent": round(row[2], 2)}
+                for row in heapq.nlargest(limit, rows, key=lambda row: row[2])
+            ]
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error getting top spenders: {e}")
+            return None
+
+    def get_connection(self, shard: int = 0):
+        return sqlite3.connect(self.shard_paths[shard])
+
+    @property
+    def shards(self) -> range:
+        return range(len(self.shard_paths))
+
+    def shard_for_user(self, user_id: str) -> int:
+        return shard_of(user_id, len(self.shard_paths))
 
-    def _order_from_row(self, row) -> Order:
+    def new_order_id(self, user_id: str) -> str:
+        # id упорядочен по времени (UUIDv7) и несет подсказку шарда: crc32(id)
+        # попадает в шард владельца, поэтому поиск по id сразу идет в нужный файл.
+        # Перебираются только случайные биты, метка времени остается текущей
+        shard = self.shard_for_user(user_id)
+        while True:
+            order_id = new_id()
+            if shard_of(order_id, len(self.shard_paths)) == shard:
+                return order_id
+
+    def _order_shards(self, order_id: str) -> List[int]:
+        # сначала шард из подсказки, затем остальные - для id, созданных
+        # до шардирования или до смены числа шардов
+        hinted = shard_of(order_id, len(self.shard_paths))
+        return [hinted] + [shard for shard in self.shards if shard != hinted]
+
+    def _order_from_row(self, row, items: List[dict]) -> Order:
         if not row:
             return None
         
-        items_data = json.loads(row[2])
-        items = [OrderItem(**item) for item in items_data]
-        
         return Order(
             id=row[0],
             user_id=row[1],
-            items=items,
-            status=OrderStatus(row[3]),
-            total_amount=row[4],
-            created_at=datetime.fromisoformat(row[5]),
-            updated_at=datetime.fromisoformat(row[6])
+            items=[OrderItem(**item) for item in items],
+            status=OrderStatus(row[2]),
+            total_amount=row[3],
+            created_at=from_db_time(row[4]),
+            updated_at=from_db_time(row[5]),
+            version=row[6]
         )
 
+    def _order_dict(self, row, items: List[dict], fields: Optional[Set[str]] = None) -> dict:
+        # Быстрый путь для чтения: строка сразу в dict в формате OrderResponse, без
+        # моделей. Время - datetime, в ISO его переводит кодировщик ответа (updated_at
+        # вне fields читается как NULL)
+        order = {
+            "id": row[0],
+            "user_id": row[1],
+            "items": items,
+            "status": row[2],
+            "total_amount": row[3],
+            "created_at": from_db_time(row[4]),
+            "updated_at": from_db_time(row[5]) if row[5] is not None else None,
+            "version": row[6]
+        }
+        return pick_fields(order, fields)
+
+    def _load_items(self, cursor, order_ids: List[str], include_archived: bool = False) -> Dict[str, List[dict]]:
+        items = {order_id: [] for order_id in order_ids}
+        if not order_ids:
+            return items
+        
+        placeholders = ", ".join("?" for _ in order_ids)
+        cursor.execute(f'''
+            SELECT order_id, product_id, product_name, quantity, price
+            FROM {items_source(include_archived)}
+            WHERE order_id IN ({placeholders})
+            ORDER BY order_id, position
+        ''', list(order_ids))
+        
+        for row in cursor.fetchall():
+            items[row[0]].append({
+                "product_id": row[1],
+                "product_name": row[2],
+                "quantity": row[3],
+                "price": row[4]
+            })
+        
+        return items
+
+    def _orders_from_rows(self, cursor, rows, include_archived: bool = False, as_dicts: bool = False,
+                          fields: Optional[Set[str]] = None) -> list:
+        # позиции всей страницы загружаются одним запросом - если их вообще просили
+        items = defaultdict(list)
+        if not as_dicts or fields is None or "items" in fields:
+            items.update(self._load_items(cursor, [row[0] for row in rows], include_archived))
+        
+        if not as_dicts:
+            return [self._order_from_row(row, items[row[0]]) for row in rows if row]
+        return [self._order_dict(row, items[row[0]], fields) for row in rows if row]
+
+    def _orders_from_shard_rows(self, entries: List[Tuple[int, tuple]], include_archived: bool = False,
+                                as_dicts: bool = False, fields: Optional[Set[str]] = None) -> list:
+        # (shard, row) после слияния: позиции грузятся одним запросом на шард
+        items = defaultdict(list)
+        if not as_dicts or fields is None or "items" in fields:
+            for shard in sorted({shard for shard, _ in entries}):
+                with self.get_connection(shard) as conn:
+                    shard_ids = [row[0] for row_shard, row in entries if row_shard == shard]
+                    items.update(self._load_items(conn.cursor(), shard_ids, include_archived))
+        
+        if not as_dicts:
+            return [self._order_from_row(row, items[row[0]]) for _, row in entries]
+        return [self._order_dict(row, items[row[0]], fields) for _, row in entries]
+
+    def _invalidate(self, order_ids=(), user_ids=()):
+        # вызывается после коммита
+        self._cache_epoch += 1
+        for order_id in order_ids:
+            self.cache.invalidate(("id", order_id))
+        for user_id in user_ids:
+            self.cache.invalidate(("user", user_id))
+
+    def _order_row(self, order_data: dict) -> tuple:
+        return (
+            order_data['id'],
+            order_data['user_id'],
+            order_data['status'].value,
+            order_data['total_amount'],
+            to_db_time(order_data['created_at']),
+            to_db_time(order_data['updated_at'])
+        )
+
+    def _item_rows(self, order_data: dict) -> List[tuple]:
+        return [
+            (order_data['id'], position, item.product_id, item.product_name, item.quantity, item.price)
+            for position, item in enumerate(order_data['items'])
+        ]
+
+    def _insert_orders(self, cursor, orders_data: List[dict]):
+        cursor.executemany('''
+            INSERT INTO orders (id, user_id, status, total_amount, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [self._order_row(order_data) for order_data in orders_data])
+        cursor.executemany('''
+            INSERT INTO order_items (order_id, position, product_id, product_name, quantity, price)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [row for order_data in orders_data for row in self._item_rows(order_data)])
+        
+        # order_data['idempotency'] - {key, fingerprint, response (JSON)} запроса с Idempotency-Key
+        keys = [order_data for order_data in orders_data if order_data.get('idempotency')]
+        if keys:
+            cursor.executemany('''
+                INSERT INTO idempotency_keys (user_id, key, fingerprint, order_id, response, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    order_data['user_id'],
+                    order_data['idempotency']['key'],
+                    order_data['idempotency']['fingerprint'],
+                    order_data['id'],
+                    order_data['idempotency']['response'],
+                    to_db_time(order_data['created_at'])
+                )
+                for order_data in keys
+            ])
+
     def create_order(self, order_data: dict) -> Optional[Order]:
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(self.shard_for_user(order_data['user_id'])) as conn:
                 cursor = conn.cursor()
-                
-                items_json = json.dumps([item.dict() for item in order_data['items']])
-                created_at = order_data['created_at'].isoformat()
-                updated_at = order_data['updated_at'].isoformat()
-                
-                cursor.execute('''
-                    INSERT INTO orders (id, user_id, items, status, total_amount, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    order_data['id'],
-                    order_data['user_id'],
-                    items_json,
-                    order_data['status'].value,
-                    order_data['total_amount'],
-                    created_at,
-                    updated_at
-                ))
+                self._insert_orders(cursor, [order_data])
                 
                 conn.commit()
+                self._invalidate(user_ids=[order_data['user_id']])
                 logger.info(f"Order created: {order_data['id']} for user: {order_data['user_id']}")
                 
                 return Order(**order_data)
@@ -96,56 +714,239 @@ class OrderDB:
             logger.error(f"Error creating order: {e}")
             return None
 
-    def get_order_by_id(self, order_id: str) -> Optional[Order]:
+    def create_orders_bulk(self, orders_data: List[dict]) -> Optional[List[Order]]:
+        # заказы и их позиции - одной транзакцией на шард
+        if not orders_data:
+            return []
+        
+        by_shard = defaultdict(list)
+        for order_data in orders_data:
+            by_shard[self.shard_for_user(order_data['user_id'])].append(order_data)
+        
+        try:
+            for shard, shard_orders in by_shard.items():
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    self._insert_orders(cursor, shard_orders)
+                    conn.commit()
+                    self._invalidate(user_ids={order_data['user_id'] for order_data in shard_orders})
+            
+            logger.info(f"Orders created in bulk: {len(orders_data)}")
+            
+            return [Order(**order_data) for order_data in orders_data]
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error creating orders in bulk: {e}")
+            return None
+
+    def get_idempotency_key(self, user_id: str, key: str, not_before: datetime) -> Optional[dict]:
+        # Запись ключа не старше not_before; просроченная удаляется, чтобы ключ можно было занять снова
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(self.shard_for_user(user_id)) as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    'SELECT * FROM orders WHERE id = ?', 
-                    (order_id,)
+                    'SELECT fingerprint, order_id, response, created_at FROM idempotency_keys WHERE user_id = ? AND key = ?',
+                    (user_id, key)
                 )
                 row = cursor.fetchone()
-                return self._order_from_row(row)
+                if not row:
+                    return None
+                
+                if row[3] < to_db_time(not_before):
+                    cursor.execute(
+                        'DELETE FROM idempotency_keys WHERE user_id = ? AND key = ? AND created_at < ?',
+                        (user_id, key, to_db_time(not_before))
+                    )
+                    conn.commit()
+                    return None
+                
+                return {
+                    "fingerprint": row[0],
+                    "order_id": row[1],
+                    "response": json.loads(row[2]),
+                    "created_at": from_db_time(row[3])
+                }
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error getting idempotency key for user {user_id}: {e}")
+            return None
+
+    def purge_idempotency_keys(self, older_than: datetime) -> Optional[int]:
+        try:
+            purged = 0
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (to_db_time(older_than),))
+                    conn.commit()
+                    purged += cursor.rowcount
+            
+            if purged:
+                logger.info(f"Purged {purged} expired idempotency keys")
+            return purged
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error purging idempotency keys: {e}")
+            return None
+
+    def get_order_by_id(self, order_id: str, include_archived: bool = False, as_dicts: bool = False,
+                        fields: Optional[Set[str]] = None):
+        # as_dicts - вернуть dict в формате OrderResponse вместо Order;
+        # fields (только с as_dicts) - оставить в нем лишь эти поля.
+        # Кэшируются полные dict горячих заказов, fields выбираются из них
+        cacheable = as_dicts and not include_archived and self.cache.enabled
+        epoch = self._cache_epoch
+        if cacheable:
+            order = self.cache.get(("id", order_id))
+            if order is not MISSING:
+                return pick_fields(order, fields)
+        
+        try:
+            for shard in self._order_shards(order_id):
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        f'SELECT {order_columns(fields)} FROM {orders_source(include_archived)} WHERE id = ?', 
+                        (order_id,)
+                    )
+                    row = cursor.fetchone()
+                    if row:
+                        order = self._orders_from_rows(cursor, [row], include_archived, as_dicts, fields)[0]
+                        if cacheable and fields is None and epoch == self._cache_epoch:
+                            self.cache.set(("id", order_id), order)
+                        return order
+            
+            return None
                 
         except sqlite3.Error as e:
             logger.error(f"Error getting order by ID {order_id}: {e}")
             return None
 
-    def get_orders_by_user(self, user_id: str, skip: int = 0, limit: int = 100, status_filter: str = None) -> List[Order]:
+    def get_orders_status(self, order_ids: List[str], owner_id: str = None, updated_since: datetime = None,
+                          include_archived: bool = False) -> Optional[Tuple[List[dict], Set[str]]]:
+        # Опрос статусов: один IN-запрос по первичному ключу, без позиций и моделей.
+        # owner_id - только заказы владельца (чужие id неотличимы от несуществующих).
+        # Возвращает ({id, status, updated_at} изменившихся после updated_since, все найденные id)
+        if not order_ids:
+            return [], set()
+        
+        # без updated_since изменившимися считаются все: -1 меньше любого времени
+        since = to_db_time(updated_since) if updated_since else -1
+        query = f'''
+            SELECT id, status, updated_at, updated_at > ?
+            FROM {orders_source(include_archived)}
+            WHERE id IN ({", ".join("?" for _ in order_ids)})
+        '''
+        params = [since] + list(order_ids)
+        
+        if owner_id is not None:
+            query += " AND user_id = ?"
+            params.append(owner_id)
+        
+        # все заказы владельца лежат в его шарде
+        shards = [self.shard_for_user(owner_id)] if owner_id is not None else self.shards
+        
+        try:
+            changed = []
+            found = set()
+            for shard in shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(query, params)
+                    for order_id, status, updated_at, is_changed in cursor.fetchall():
+                        found.add(order_id)
+                        if is_changed:
+                            changed.append({"id": order_id, "status": status, "updated_at": from_db_time(updated_at)})
+            
+            return changed, found
+        
+        except sqlite3.Error as e:
+            logger.error(f"Error getting orders status: {e}")
+            return None
+
+    def get_orders_by_user(self, user_id: str, skip: int = 0, limit: int = 100, status_filter: List[str] = None,
+                           product_filter: str = None, after: Optional[Tuple[datetime, str]] = None,
+                           include_archived: bool = False, as_dicts: bool = False,
+                           fields: Optional[Set[str]] = None, created_from: datetime = None,
+                           created_to: datetime = None) -> list:
+        # after - (created_at, id) последнего заказа предыдущей страницы
+        
+        # первая страница без фильтров кэшируется вместе со своим limit:
+        # страница с большим limit (или весь список целиком) покрывает меньшую
+        cacheable = as_dicts and self.cache.enabled and not (
+            skip or status_filter or product_filter or after or include_archived or created_from or created_to
+        )
+        epoch = self._cache_epoch
+        if cacheable:
+            cached = self.cache.get(("user", user_id))
+            if cached is not MISSING:
+                cached_limit, orders = cached
+                if limit <= cached_limit or len(orders) < cached_limit:
+                    return [pick_fields(order, fields) for order in orders[:limit]]
+        
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(self.shard_for_user(user_id)) as conn:
                 cursor = conn.cursor()
                 
-                query = "SELECT * FROM orders WHERE user_id = ?"
-                params = [user_id]
+                conditions, params = listing_conditions(
+                    status_filter, created_from, created_to, product_filter, include_archived
+                )
+                query = f"SELECT {order_columns(fields)} FROM {orders_source(include_archived)} WHERE user_id = ?"
+                params = [user_id] + params
+                
+                for condition in conditions:
+                    query += f" AND {condition}"
                 
-                if status_filter:
-                    query += " AND status = ?"
-                    params.append(status_filter)
+                if after:
+                    query += " AND (created_at, id) < (?, ?)"
+                    params.extend([to_db_time(after[0]), after[1]])
                 
-                query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+                query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
                 params.extend([limit, skip])
                 
                 cursor.execute(query, params)
                 rows = cursor.fetchall()
                 
-                return [self._order_from_row(row) for row in rows if row]
+                orders = self._orders_from_rows(cursor, rows, include_archived, as_dicts, fields)
+                if cacheable and fields is None and epoch == self._cache_epoch:
+                    self.cache.set(("user", user_id), (limit, orders))
+                return orders
                 
         except sqlite3.Error as e:
             logger.error(f"Error getting orders for user {user_id}: {e}")
             return []
 
-    def get_user_orders_count(self, user_id: str, status_filter: str = None) -> int:
+    def _count_from_counters(self, cursor, user_key: str, status_filter: List[str] = None) -> int:
+        query = "SELECT COALESCE(SUM(count), 0) FROM order_counts WHERE user_id = ?"
+        params = [user_key]
+        
+        if status_filter:
+            condition, status_params = status_condition(status_filter)
+            query += f" AND {condition}"
+            params.extend(status_params)
+        
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+    def get_user_orders_count(self, user_id: str, status_filter: List[str] = None, product_filter: str = None,
+                              include_archived: bool = False, created_from: datetime = None,
+                              created_to: datetime = None) -> int:
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(self.shard_for_user(user_id)) as conn:
                 cursor = conn.cursor()
                 
-                query = "SELECT COUNT(*) FROM orders WHERE user_id = ?"
-                params = [user_id]
+                if not (product_filter or include_archived or created_from or created_to):
+                    return self._count_from_counters(cursor, user_id, status_filter)
+                
+                # по товару, по времени и по архиву счетчиков нет
+                conditions, params = listing_conditions(
+                    status_filter, created_from, created_to, product_filter, include_archived
+                )
+                query = f"SELECT COUNT(*) FROM {orders_source(include_archived)} WHERE user_id = ?"
+                params = [user_id] + params
                 
-                if status_filter:
-                    query += " AND status = ?"
-                    params.append(status_filter)
+                for condition in conditions:
+                    query += f" AND {condition}"
                 
                 cursor.execute(query, params)
                 result = cursor.fetchone()
@@ -156,62 +957,307 @@ class OrderDB:
             logger.error(f"Error getting orders count for user {user_id}: {e}")
             return 0
 
-    def update_order_status(self, order_id: str, new_status: OrderStatus) -> Optional[Order]:
+    def _transition_conditions(self, new_status: OrderStatus) -> Tuple[str, list]:
+        sources = [status.value for status in allowed_sources(new_status)]
+        if not sources:
+            return "0", []
+        return f"status IN ({', '.join('?' for _ in sources)})", sources
+
+    def update_order_status(self, order_id: str, new_status: OrderStatus, expected_version: int = None,
+                            owner_id: str = None) -> Optional[Order]:
+        # Один условный UPDATE: переход разрешен из текущего статуса, версия совпадает
+        # (если передана), заказ принадлежит owner_id (если передан).
+        # None - заказ не найден или одно из условий не выполнено
+        transition, params = self._transition_conditions(new_status)
+        query = f'''
+            UPDATE orders
+            SET status = ?, updated_at = ?, version = version + 1
+            WHERE id = ? AND {transition}
+        '''
+        params = [new_status.value, to_db_time(datetime.utcnow()), order_id] + params
+        
+        if expected_version is not None:
+            query += " AND version = ?"
+            params.append(expected_version)
+        
+        if owner_id is not None:
+            query += " AND user_id = ?"
+            params.append(owner_id)
+        
+        query += f" RETURNING {ORDER_COLUMNS}"
+        
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                updated_at = datetime.utcnow().isoformat()
-                
-                cursor.execute('''
-                    UPDATE orders 
-                    SET status = ?, updated_at = ? 
-                    WHERE id = ?
-                ''', (new_status.value, updated_at, order_id))
-                
-                conn.commit()
-                
-                if cursor.rowcount > 0:
-                    logger.info(f"Order status updated: {order_id} -> {new_status}")
-                    return self.get_order_by_id(order_id)
-                else:
-                    return None
+            for shard in self._order_shards(order_id):
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(query, params)
+                    rows = cursor.fetchall()
+                    conn.commit()
+                    
+                    if rows:
+                        self._invalidate([order_id], [rows[0][1]])
+                        logger.info(f"Order status updated: {order_id} -> {new_status}")
+                        return self._orders_from_rows(cursor, rows)[0]
+                    
+                    # заказ в этом шарде, но условие не выполнено - дальше не ищем
+                    cursor.execute('SELECT 1 FROM orders WHERE id = ?', (order_id,))
+                    if cursor.fetchone():
+                        return None
+            
+            return None
                     
         except sqlite3.Error as e:
             logger.error(f"Error updating order status {order_id}: {e}")
             return None
 
+    def update_orders_status_bulk(self, new_status: OrderStatus, order_ids: List[str] = None,
+                                  status_filter: str = None, user_filter: str = None,
+                                  created_to: datetime = None) -> Optional[List[Tuple[str, str, int, datetime]]]:
+        # Одна транзакция на шард, UPDATE по множеству строк; счетчики ведут триггеры.
+        # Возвращает (id, user_id, version, updated_at) измененных заказов
+        transition, params = self._transition_conditions(new_status)
+        conditions = [transition]
+        
+        if status_filter:
+            conditions.append("status = ?")
+            params.append(status_filter)
+        if user_filter:
+            conditions.append("user_id = ?")
+            params.append(user_filter)
+        if created_to:
+            conditions.append("created_at <= ?")
+            params.append(to_db_time(created_to))
+        
+        # список id делится на части, чтобы не упереться в лимит параметров SQLite
+        id_chunks = [order_ids[i:i + 500] for i in range(0, len(order_ids), 500)] if order_ids else [None]
+        
+        shards = [self.shard_for_user(user_filter)] if user_filter else self.shards
+        
+        try:
+            now = datetime.utcnow()
+            updated_at = to_db_time(now)
+            updated = []
+            
+            for shard in shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    
+                    shard_updated = []
+                    for chunk in id_chunks:
+                        chunk_conditions = list(conditions)
+                        chunk_params = list(params)
+                        if chunk is not None:
+                            chunk_conditions.append(f"id IN ({', '.join('?' for _ in chunk)})")
+                            chunk_params.extend(chunk)
+                        
+                        cursor.execute(f'''
+                            UPDATE orders
+                            SET status = ?, updated_at = ?, version = version + 1
+                            WHERE {' AND '.join(chunk_conditions)}
+                            RETURNING id, user_id, version, updated_at
+                        ''', [new_status.value, updated_at] + chunk_params)
+                        shard_updated.extend(cursor.fetchall())
+                    
+                    conn.commit()
+                    self._invalidate([row[0] for row in shard_updated], {row[1] for row in shard_updated})
+                    updated.extend((order_id, user_id, version, now) for order_id, user_id, version, _ in shard_updated)
+            
+            logger.info(f"Orders status updated in bulk: {len(updated)} -> {new_status}")
+            
+            return updated
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error updating orders status in bulk: {e}")
+            return None
+
+    def iter_orders_export(self, status_filter: str = None, created_from: datetime = None,
+                           created_to: datetime = None, batch_size: int = 1000,
+                           include_archived: bool = False) -> Iterator[dict]:
+        # Построчная выгрузка без моделей и без OFFSET: курсоры по JOIN с позициями,
+        # в памяти только текущая пачка. Генератор могут продолжать разные потоки
+        # (StreamingResponse), поэтому соединение без check_same_thread.
+        # Ошибка SQLite посреди выгрузки не глотается, а пробрасывается из генератора:
+        # молча оборванный поток выглядел бы как полная выгрузка
+        conditions = []
+        params = []
+        
+        if status_filter:
+            conditions.append("o.status = ?")
+            params.append(status_filter)
+        if created_from:
+            conditions.append("o.created_at >= ?")
+            params.append(to_db_time(created_from))
+        if created_to:
+            conditions.append("o.created_at <= ?")
+            params.append(to_db_time(created_to))
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        exports = [
+            self._iter_shard_export(path, where, params, batch_size, include_archived)
+            for path in self.shard_paths
+        ]
+        if len(exports) == 1:
+            return exports[0]
+        
+        # каждый шард отдает заказы по (created_at, id), общий порядок - слиянием
+        return heapq.merge(*exports, key=lambda order: (order["created_at"], order["id"]))
+
+    def _iter_shard_export(self, path: str, where: str, params: list, batch_size: int,
+                           include_archived: bool) -> Iterator[dict]:
+        # Горячие и архивные заказы - отдельные курсоры, каждый в порядке своего индекса
+        # (created_at, id), общий порядок - слиянием. ORDER BY поверх UNION ALL
+        # сортировал бы всю выгрузку до первой строки
+        sources = [("orders", "order_items")]
+        if include_archived:
+            sources.append(("orders_archive", "order_items_archive"))
+        
+        conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            exports = [
+                self._iter_source_export(conn, orders_table, items_table, where, params, batch_size)
+                for orders_table, items_table in sources
+            ]
+            if len(exports) == 1:
+                yield from exports[0]
+            else:
+                yield from heapq.merge(*exports, key=lambda order: (order["created_at"], order["id"]))
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error exporting orders: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def _iter_source_export(self, conn, orders_table: str, items_table: str, where: str, params: list,
+                            batch_size: int) -> Iterator[dict]:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT o.id, o.user_id, o.status, o.total_amount, o.created_at, o.updated_at, o.version,
+                   i.product_id, i.product_name, i.quantity, i.price
+            FROM {orders_table} o
+            LEFT JOIN {items_table} i ON i.order_id = o.id
+            {where}
+            ORDER BY o.created_at, o.id, i.position
+        ''', params)
+        
+        order = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            
+            for row in rows:
+                if order is None or order["id"] != row[0]:
+                    if order is not None:
+                        yield order
+                    order = {
+                        "id": row[0],
+                        "user_id": row[1],
+                        "status": row[2],
+                        "total_amount": row[3],
+                        "created_at": from_db_time(row[4]).isoformat(),
+                        "updated_at": from_db_time(row[5]).isoformat(),
+                        "version": row[6],
+                        "items": []
+                    }
+                if row[7] is not None:
+                    order["items"].append({
+                        "product_id": row[7],
+                        "product_name": row[8],
+                        "quantity": row[9],
+                        "price": row[10]
+                    })
+        
+        if order is not None:
+            yield order
+
     def can_user_access_order(self, order: Order, user: dict) -> bool:
         return order.user_id == user.get("user_id") or "admin" in user.get("roles", [])
 
     def calculate_total_amount(self, items: List[OrderItem]) -> float:
         return sum(item.quantity * item.price for item in items)
 
-    def get_all_orders(self, skip: int = 0, limit: int = 100) -> List[Order]:
+    def get_all_orders(self, skip: int = 0, limit: int = 100, product_filter: str = None,
+                       after: Optional[Tuple[datetime, str]] = None, include_archived: bool = False,
+                       as_dicts: bool = False, fields: Optional[Set[str]] = None,
+                       status_filter: List[str] = None, created_from: datetime = None,
+                       created_to: datetime = None) -> list:
+        query = f"SELECT {order_columns(fields)} FROM {orders_source(include_archived)}"
+        conditions, params = listing_conditions(
+            status_filter, created_from, created_to, product_filter, include_archived
+        )
+        
+        if after:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend([to_db_time(after[0]), after[1]])
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+        
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute(
-                    'SELECT * FROM orders ORDER BY created_at DESC LIMIT ? OFFSET ?',
-                    (limit, skip)
-                )
-                rows = cursor.fetchall()
-                
-                return [self._order_from_row(row) for row in rows if row]
+            if len(self.shard_paths) == 1:
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(query, params + [limit, skip])
+                    return self._orders_from_rows(cursor, cursor.fetchall(), include_archived, as_dicts, fields)
+            
+            # k-way merge: каждый шард отдает первые skip + limit строк в общем порядке,
+            # страница вырезается из слияния
+            shard_rows = []
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(query, params + [skip + limit, 0])
+                    shard_rows.append([(shard, row) for row in cursor.fetchall()])
+            
+            merged = heapq.merge(*shard_rows, key=lambda entry: (entry[1][4], entry[1][0]), reverse=True)
+            return self._orders_from_shard_rows(list(islice(merged, skip, skip + limit)), include_archived, as_dicts, fields)
                 
         except sqlite3.Error as e:
             logger.error(f"Error getting all orders: {e}")
             return []
 
-    def get_total_orders_count(self) -> int:
+    def get_total_orders_count(self, product_filter: str = None, include_archived: bool = False,
+                               status_filter: List[str] = None, created_from: datetime = None,
+                               created_to: datetime = None) -> int:
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM orders')
-                result = cursor.fetchone()
-                
-                return result[0] if result else 0
+            total = 0
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    
+                    if product_filter and not (status_filter or created_from or created_to):
+                        cursor.execute(
+                            f'SELECT COUNT(DISTINCT order_id) FROM {items_source(include_archived)} WHERE product_id = ?',
+                            (product_filter,)
+                        )
+                        total += cursor.fetchone()[0]
+                        continue
+                    
+                    if product_filter or created_from or created_to:
+                        # по времени счетчиков нет: COUNT по диапазону индекса
+                        conditions, params = listing_conditions(
+                            status_filter, created_from, created_to, product_filter, include_archived
+                        )
+                        cursor.execute(
+                            f'SELECT COUNT(*) FROM {orders_source(include_archived)} WHERE {" AND ".join(conditions)}',
+                            params
+                        )
+                        total += cursor.fetchone()[0]
+                        continue
+                    
+                    total += self._count_from_counters(cursor, ALL_USERS, status_filter)
+                    if include_archived:
+                        conditions, params = listing_conditions(status_filter)
+                        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+                        cursor.execute(f'SELECT COALESCE(SUM(count), 0) FROM archive_counts{where}', params)
+                        total += cursor.fetchone()[0]
+            
+            return total
                 
         except sqlite3.Error as e:
             logger.error(f"Error getting total orders count: {e}")
@@ -219,19 +1265,194 @@ class OrderDB:
 
     def delete_order(self, order_id: str) -> bool:
         try:
-            with self.get_connection() as conn:
+            for shard in self._order_shards(order_id):
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('DELETE FROM order_items WHERE order_id = ?', (order_id,))
+                    cursor.execute('DELETE FROM orders WHERE id = ? RETURNING user_id', (order_id,))
+                    row = cursor.fetchone()
+                    conn.commit()
+                    
+                    if row:
+                        self._invalidate([order_id], [row[0]])
+                        logger.info(f"Order deleted: {order_id}")
+                        return True
+            
+            return False
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting order {order_id}: {e}")
+            return False
+
+    def archive_orders(self, older_than: datetime, batch_size: int = 500) -> Optional[int]:
+        # Переносит заказы в конечных статусах, не менявшиеся с older_than, в архивные
+        # таблицы. Каждая пачка - своя короткая транзакция, между пачками запись свободна.
+        # Счетчики горячих заказов уменьшает триггер удаления, архивные увеличивает
+        # триггер вставки в архив, сводки остаются как были
+        cutoff = to_db_time(older_than)
+        archived = 0
+        
+        for shard in self.shards:
+            while True:
+                moved = self._archive_batch(shard, cutoff, batch_size)
+                if moved is None:
+                    return None
+                archived += moved
+                if moved < batch_size:
+                    break
+        
+        if archived:
+            logger.info(f"Orders archived: {archived}")
+        return archived
+
+    def _archive_batch(self, shard: int, cutoff: int, batch_size: int) -> Optional[int]:
+        statuses = [status.value for status in TERMINAL_STATUSES]
+        
+        try:
+            with self.get_connection(shard) as conn:
                 cursor = conn.cursor()
-                cursor.execute('DELETE FROM orders WHERE id = ?', (order_id,))
+                cursor.execute("BEGIN IMMEDIATE")
+                
+                # created_at <= updated_at: условие по created_at ограничивает диапазон
+                # индекса (status, created_at, id)
+                cursor.execute(f'''
+                    SELECT id, user_id FROM orders
+                    WHERE status IN ({', '.join('?' for _ in statuses)}) AND created_at < ? AND updated_at < ?
+                    LIMIT ?
+                ''', statuses + [cutoff, cutoff, batch_size])
+                rows = cursor.fetchall()
+                ids = [row[0] for row in rows]
+                if not ids:
+                    return 0
+                
+                placeholders = ", ".join("?" for _ in ids)
+                cursor.execute(f'''
+                    INSERT INTO orders_archive ({ORDER_COLUMNS})
+                    SELECT {ORDER_COLUMNS} FROM orders WHERE id IN ({placeholders})
+                ''', ids)
+                cursor.execute(f'''
+                    INSERT INTO order_items_archive ({ITEM_COLUMNS})
+                    SELECT {ITEM_COLUMNS} FROM order_items WHERE order_id IN ({placeholders})
+                ''', ids)
+                cursor.execute(f'DELETE FROM order_items WHERE order_id IN ({placeholders})', ids)
+                cursor.execute(f'DELETE FROM orders WHERE id IN ({placeholders})', ids)
                 conn.commit()
                 
-                deleted = cursor.rowcount > 0
-                if deleted:
-                    logger.info(f"Order deleted: {order_id}")
+                # без include_archived архивный заказ не должен находиться
+                self._invalidate(ids, {row[1] for row in rows})
                 
-                return deleted
+                return len(ids)
                 
         except sqlite3.Error as e:
-            logger.error(f"Error deleting order {order_id}: {e}")
-            return False
+            logger.error(f"Error archiving orders: {e}")
+            return None
+
+    def count_stored_orders(self) -> Optional[int]:
+        # Все заказы во всех шардах, горячие и архивные, по самим таблицам, а не по
+        # счетчикам; None - ошибка чтения
+        try:
+            total = 0
+            for shard in self.shards:
+                with self.get_connection(shard) as conn:
+                    cursor = conn.cursor()
+                    for table in ("orders", "orders_archive"):
+                        cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                        total += cursor.fetchone()[0]
+            
+            return total
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error counting stored orders: {e}")
+            return None
+
+    def copy_from(self, source_path: str, batch_size: int = 1000) -> Optional[int]:
+        # Перенос заказов из другого файла в шарды этой базы (reshard), горячих и архивных.
+        # Строки копируются как есть, счетчики ведут триггеры, сводки после переноса
+        # нужно пересчитать (rebuild_stats) - архив их не заполняет. Шарды-получатели
+        # должны быть пустыми (count_stored_orders): заказ, который уже есть в получателе,
+        # - ошибка, а не пропуск, иначе старый файл той же раскладки отдал бы устаревшие
+        # статусы. Прерванный перенос повторяют, удалив файлы получателя.
+        # Время источника старого формата (ISO-строки) переводится при копировании
+        source = sqlite3.connect(source_path)
+        source.create_function("epoch_us", 1, epoch_us, deterministic=True)
+        targets = [self.get_connection(shard) for shard in self.shards]
+        copied = 0
+        source_columns = ", ".join(
+            f"epoch_us({column})" if column in ("created_at", "updated_at") else column
+            for column in ORDER_COLUMN_NAMES
+        )
+        
+        try:
+            for orders_table, items_table in (("orders", "order_items"), ("orders_archive", "order_items_archive")):
+                orders_cursor = source.cursor()
+                items_cursor = source.cursor()
+                orders_cursor.execute(f'SELECT {source_columns} FROM {orders_table} ORDER BY created_at, id')
+                
+                while True:
+                    rows = orders_cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    
+                    placeholders = ", ".join("?" for _ in rows)
+                    items_cursor.execute(f'''
+                        SELECT {ITEM_COLUMNS} FROM {items_table} WHERE order_id IN ({placeholders})
+                    ''', [row[0] for row in rows])
+                    
+                    shard_by_order = {row[0]: self.shard_for_user(row[1]) for row in rows}
+                    orders_by_shard = defaultdict(list)
+                    items_by_shard = defaultdict(list)
+                    for row in rows:
+                        orders_by_shard[shard_by_order[row[0]]].append(row)
+                    for item in items_cursor.fetchall():
+                        items_by_shard[shard_by_order[item[0]]].append(item)
+                    
+                    for shard, shard_orders in orders_by_shard.items():
+                        cursor = targets[shard].cursor()
+                        cursor.executemany(f'''
+                            INSERT INTO {orders_table} ({ORDER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ''', shard_orders)
+                        copied += cursor.rowcount
+                        cursor.executemany(f'''
+                            INSERT INTO {items_table} ({ITEM_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)
+                        ''', items_by_shard[shard])
+                    
+                    for target in targets:
+                        target.commit()
+            
+            # ключи идемпотентности переезжают в шард своего пользователя вместе с заказами
+            # (в базах, созданных до их появления, таблицы нет)
+            keys_cursor = source.cursor()
+            keys_cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'idempotency_keys'")
+            if keys_cursor.fetchone():
+                keys_cursor.execute(
+                    'SELECT user_id, key, fingerprint, order_id, response, epoch_us(created_at) FROM idempotency_keys'
+                )
+            while True:
+                rows = keys_cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                keys_by_shard = defaultdict(list)
+                for row in rows:
+                    keys_by_shard[self.shard_for_user(row[0])].append(row)
+                for shard, shard_keys in keys_by_shard.items():
+                    targets[shard].executemany('''
+                        INSERT INTO idempotency_keys (user_id, key, fingerprint, order_id, response, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', shard_keys)
+                
+                for target in targets:
+                    target.commit()
+            
+            logger.info(f"Copied {copied} orders from {source_path}")
+            return copied
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error copying orders from {source_path}: {e}")
+            return None
+        finally:
+            source.close()
+            for target in targets:
+                target.close()
 
 order_db = OrderDB()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+# Маркер в очереди подписчика: события потеряны, клиенту нужно перечитать заказы
+RESET = object()
+
+class OrderEventBus:
+    # In-process pub/sub изменений статусов заказов с коротким журналом для
+    # возобновления по Last-Event-ID. Вызывается только из event loop.
+    # id события - "<epoch>-<seq>": после рестарта процесса старые id не совпадут
+    # по epoch, и клиент получит reset вместо молча пропущенных событий
+    def __init__(self, log_size: int = 1000, queue_size: int = 100):
+        self.epoch = str(int(time.time() * 1000))
+        self.queue_size = queue_size
+        self._seq = 0
+        self._log: deque = deque(maxlen=log_size)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def publish(self, user_id: str, event: dict) -> str:
+        self._seq += 1
+        self._log.append((self._seq, user_id, event))
+
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait((self._seq, event))
+            except asyncio.QueueFull:
+                # медленный клиент: сбрасываем очередь и просим его начать заново
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((self._seq, RESET))
+
+        return self.event_id(self._seq)
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def replay(self, user_id: str, last_event_id: Optional[str]) -> Optional[List[Tuple[int, dict]]]:
+        # События пользователя после last_event_id; None - продолжить нельзя
+        # (чужой epoch или событие уже вытеснено из журнала)
+        if not last_event_id:
+            return []
+
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+
+        seq = int(seq)
+        if self._log and seq < self._log[0][0] - 1:
+            return None
+
+        return [(event_seq, event) for event_seq, owner, event in self._log if event_seq > seq and owner == user_id]
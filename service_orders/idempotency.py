@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyStore:
+    # Idempotency-Key для POST /v1/orders. Запись ключа - {fingerprint, order_id, response,
+    # created_at}: отпечаток запроса и исходный ответ. Записи живут ttl секунд в таблице
+    # idempotency_keys шарда пользователя (пишутся в одной транзакции с заказом), перед
+    # ней - кэш в памяти процесса. Повтор ключа, пока первый запрос еще создает заказ,
+    # ждет его, а не создает второй заказ
+    def __init__(self, db, ttl: float = 86400, cache_size: int = 10000):
+        self.db = db
+        self.ttl = ttl
+        self.cache = TTLCache(cache_size, ttl)
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def lookup(self, user_id: str, key: str) -> Optional[dict]:
+        record = self.cache.get((user_id, key))
+        if record is not MISSING:
+            return record
+
+        not_before = datetime.utcnow() - timedelta(seconds=self.ttl)
+        record = self.db.get_idempotency_key(user_id, key, not_before)
+        if record is not None:
+            self.remember(user_id, key, record)
+        return record
+
+    def remember(self, user_id: str, key: str, record: dict):
+        # в кэше запись живет не дольше, чем в таблице
+        expires_in = self.ttl - (datetime.utcnow() - record["created_at"]).total_seconds()
+        if expires_in > 0:
+            self.cache.set((user_id, key), record, ttl=expires_in)
+
+    async def run(
+        self, user_id: str, key: str, create: Callable[[], Awaitable[Optional[dict]]]
+    ) -> Tuple[Optional[dict], bool]:
+        # -> (запись ключа, повтор ли это). create создает заказ вместе с ключом и
+        # возвращает его запись; None - заказ не создан. Ключ мог занять параллельный
+        # запрос другого воркера: тогда его запись отдается как повтор
+        scope = (user_id, key)
+        while scope in self._in_flight:
+            await asyncio.shield(self._in_flight[scope])
+
+        record = self.lookup(user_id, key)
+        if record is not None:
+            logger.info(f"Replaying idempotent order {record['order_id']} for user {user_id}")
+            return record, True
+
+        # между проверкой и регистрацией нет await: второй запрос с тем же ключом увидит future
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[scope] = future
+        try:
+            record = await create()
+            if record is not None:
+                self.remember(user_id, key, record)
+                return record, False
+
+            record = self.lookup(user_id, key)
+            if record is not None:
+                logger.info(f"Replaying idempotent order {record['order_id']} created concurrently for user {user_id}")
+            return record, record is not None
+        finally:
+            del self._in_flight[scope]
+            future.set_result(None)
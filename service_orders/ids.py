@@ -0,0 +1,15 @@
+import os
+import time
+import uuid
+
+def uuid7() -> uuid.UUID:
+    # UUIDv7 (RFC 9562): 48 бит unix-времени в мс, версия, 74 случайных бита.
+    # Строковая форма растет со временем: новые ключи дописываются в конец
+    # B-дерева первичного ключа, а не в случайную страницу, как uuid4
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
+
+def new_id() -> str:
+    return str(uuid7())
@@ -1,14 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, Query
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from jose import jwt
+from pydantic import ValidationError
+import asyncio
+import csv
+import hashlib
+import io
+import json
 import uuid
 import logging
-from datetime import datetime
-from typing import Optional
+import os
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Set
 
-from models import OrderCreate, OrderResponse, StandardResponse, OrderStatus, OrderUpdate
+from models import (
+    OrderCreate, OrderBulkCreate, OrderResponse, StandardResponse, OrderStatus, OrderUpdate,
+    OrderBulkStatusUpdate, ALLOWED_TRANSITIONS
+)
 from database import order_db
+from pagination import encode_cursor, decode_cursor
+from events import OrderEventBus, RESET
+from responses import FastJSONResponse, dumps
+from batching import OrderWriteBatcher
+from idempotency import IdempotencyStore
 
 
 logging.basicConfig(
@@ -18,6 +34,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
+    default_response_class=FastJSONResponse,
     title="Order Service",
     version="1.0.0",
     description="Order management service"
@@ -35,6 +52,35 @@ JWT_SECRET = "your-secret-key"
 ALGORITHM = "HS256"
 security = HTTPBearer()
 
+# Опрос статусов: id за один запрос
+STATUS_POLL_MAX_IDS = int(os.getenv("ORDER_STATUS_POLL_MAX_IDS", "200"))
+
+# SSE
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("ORDER_EVENTS_KEEPALIVE", "15"))
+order_events = OrderEventBus(log_size=int(os.getenv("ORDER_EVENTS_LOG_SIZE", "1000")))
+
+# Архивация заказов в конечных статусах (0 дней - выключена)
+ARCHIVE_AFTER_DAYS = float(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ORDER_ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "500"))
+
+# Group commit для создания заказов (выключен по умолчанию)
+ORDER_WRITE_BATCHING = os.getenv("ORDER_WRITE_BATCHING", "0") == "1"
+order_writer = OrderWriteBatcher(
+    order_db,
+    window_ms=float(os.getenv("ORDER_WRITE_BATCH_MS", "0")),
+    max_rows=int(os.getenv("ORDER_WRITE_BATCH_ROWS", "200"))
+) if ORDER_WRITE_BATCHING else None
+
+# Idempotency-Key для создания заказов: ключ живет TTL секунд, просроченные удаляются раз в интервал
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+order_idempotency = IdempotencyStore(
+    order_db,
+    ttl=float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400")),
+    cache_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+)
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
@@ -60,6 +106,205 @@ async def add_request_id(request: Request, call_next):
     response.headers["X-Request-ID"] = request_id
     return response
 
+def new_order_data(user_id: str, order_data: OrderCreate, now: datetime) -> dict:
+    return {
+        "id": order_db.new_order_id(user_id),
+        "user_id": user_id,
+        "items": order_data.items,
+        "status": OrderStatus.CREATED,
+        "total_amount": order_db.calculate_total_amount(order_data.items),
+        "created_at": now,
+        "updated_at": now
+    }
+
+def parse_cursor(cursor: Optional[str]):
+    # None - курсора нет; ValueError - курсор испорчен
+    return decode_cursor(cursor) if cursor else None
+
+def invalid_cursor_response() -> StandardResponse:
+    return StandardResponse(
+        success=False,
+        error={"code": "INVALID_CURSOR", "message": "Invalid pagination cursor"}
+    )
+
+def parse_statuses(values: Optional[List[str]]) -> Optional[List[str]]:
+    # ?status=created&status=in_progress или ?status=created,in_progress;
+    # ValueError - неизвестный статус
+    statuses = [status.strip() for value in values or [] for status in value.split(",") if status.strip()]
+    return list(dict.fromkeys(OrderStatus(status).value for status in statuses)) or None
+
+def invalid_status_filter_response() -> StandardResponse:
+    return StandardResponse(
+        success=False,
+        error={
+            "code": "INVALID_STATUS",
+            "message": f"status must be one or more of: {', '.join(status.value for status in OrderStatus)}"
+        }
+    )
+
+# ключи курсора: читаются всегда, даже если их нет в ?fields=
+PAGE_FIELDS = {"id", "created_at"}
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    # ?fields=id,status,total_amount; None - все поля, ValueError - неизвестное поле
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested or not requested <= set(OrderResponse.model_fields):
+        raise ValueError(fields)
+    return requested
+
+def invalid_fields_response() -> StandardResponse:
+    return StandardResponse(
+        success=False,
+        error={
+            "code": "INVALID_FIELDS",
+            "message": f"fields must be a comma-separated subset of: {', '.join(OrderResponse.model_fields)}"
+        }
+    )
+
+def select_fields(orders: list, fields: Optional[Set[str]]) -> list:
+    # убирает ключи, которые читались только для курсора или проверки доступа
+    if fields is None:
+        return orders
+    return [{name: value for name, value in order.items() if name in fields} for order in orders]
+
+def json_response(data: dict) -> Response:
+    # Быстрый путь чтения: data уже JSON-совместим (dict из строк БД), повторная
+    # валидация через StandardResponse/OrderResponse не нужна
+    return FastJSONResponse({"success": True, "data": data, "error": None})
+
+def build_page(orders: list, limit: int, page: int, total: int, keyset: bool):
+    # orders (dict) запрошены с limit + 1: лишний заказ означает, что есть следующая страница
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = encode_cursor(orders[-1]["created_at"], orders[-1]["id"]) if has_more else None
+    
+    if keyset:
+        pagination = {"limit": limit, "total": total, "next_cursor": next_cursor}
+    else:
+        pagination = {
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "pages": (total + limit - 1) // limit if total > 0 else 1,
+            "next_cursor": next_cursor
+        }
+    
+    return orders, pagination
+
+def publish_status_change(order) -> str:
+    return order_events.publish(order.user_id, {
+        "order_id": order.id,
+        "status": order.status.value,
+        "version": order.version,
+        "updated_at": order.updated_at.isoformat()
+    })
+
+def format_sse(event_id: str, event: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    # If-Match: "3", W/"3" или 3 - ожидаемая версия заказа; * - любая
+    if not if_match or if_match.strip() == "*":
+        return None
+    
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    return int(value.strip('"'))
+
+def failed_transition_response(order_id: str, new_status: OrderStatus, expected_version: Optional[int],
+                               current_user: dict, owner_only: bool, failure_code: str) -> StandardResponse:
+    # условный UPDATE не изменил строку - перечитываем заказ только чтобы объяснить причину
+    order = order_db.get_order_by_id(order_id)
+    if not order:
+        return StandardResponse(
+            success=False,
+            error={"code": "ORDER_NOT_FOUND", "message": "Order not found"}
+        )
+    
+    if owner_only and order.user_id != current_user["user_id"]:
+        logger.warning(f"Unauthorized cancel attempt for order {order_id} by user {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Can only cancel your own orders")
+    
+    if not order_db.can_user_access_order(order, current_user):
+        logger.warning(f"Unauthorized status update attempt for order {order_id} by user {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    if expected_version is not None and order.version != expected_version:
+        return StandardResponse(
+            success=False,
+            error={
+                "code": "VERSION_CONFLICT",
+                "message": f"Order was modified, current version is {order.version}"
+            }
+        )
+    
+    if new_status == OrderStatus.CANCELLED and order.status == OrderStatus.CANCELLED:
+        return StandardResponse(
+            success=False,
+            error={"code": "ALREADY_CANCELLED", "message": "Order already cancelled"}
+        )
+    
+    if new_status not in ALLOWED_TRANSITIONS[order.status]:
+        return StandardResponse(
+            success=False,
+            error={
+                "code": "INVALID_TRANSITION",
+                "message": f"Cannot change status from {order.status.value} to {new_status.value}"
+            }
+        )
+    
+    # заказ изменился между UPDATE и чтением
+    return StandardResponse(
+        success=False,
+        error={"code": failure_code, "message": "Order was modified concurrently, retry the request"}
+    )
+
+async def archive_orders_periodically():
+    while True:
+        cutoff = datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+        # пачки идут в потоке, event loop и запись между пачками не блокируются
+        await asyncio.to_thread(order_db.archive_orders, cutoff, ARCHIVE_BATCH_SIZE)
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+archive_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_archiver():
+    global archive_task
+    if ARCHIVE_AFTER_DAYS > 0:
+        archive_task = asyncio.create_task(archive_orders_periodically())
+
+@app.on_event("shutdown")
+async def stop_archiver():
+    if archive_task is not None:
+        archive_task.cancel()
+
+async def purge_idempotency_keys_periodically():
+    while True:
+        cutoff = datetime.utcnow() - timedelta(seconds=order_idempotency.ttl)
+        await asyncio.to_thread(order_db.purge_idempotency_keys, cutoff)
+        await asyncio.sleep(IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
+
+idempotency_purge_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_idempotency_purge():
+    global idempotency_purge_task
+    idempotency_purge_task = asyncio.create_task(purge_idempotency_keys_periodically())
+
+@app.on_event("shutdown")
+async def stop_idempotency_purge():
+    if idempotency_purge_task is not None:
+        idempotency_purge_task.cancel()
+
+@app.on_event("shutdown")
+async def flush_order_writer():
+    if order_writer is not None:
+        await order_writer.close()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "order-service"}
@@ -68,7 +313,8 @@ async def health_check():
 async def create_order(
     order_data: OrderCreate,
     request: Request,
-    current_user: dict = Depends(verify_token)
+    current_user: dict = Depends(verify_token),
+    idempotency_key: Optional[str] = Header(None)
 ):
     logger.info(f"Creating order for user: {current_user['user_id']}")
     
@@ -78,20 +324,19 @@ async def create_order(
             error={"code": "INVALID_ORDER", "message": "Order must contain at least one item"}
         )
     
-    total_amount = order_db.calculate_total_amount(order_data.items)
-    
-    order_id = str(uuid.uuid4())
-    now = datetime.utcnow()
+    if idempotency_key is not None:
+        if not idempotency_key.strip() or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return StandardResponse(
+                success=False,
+                error={
+                    "code": "INVALID_IDEMPOTENCY_KEY",
+                    "message": f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+                }
+            )
+        return await create_order_idempotent(current_user["user_id"], idempotency_key, order_data)
     
-    order = order_db.create_order({
-        "id": order_id,
-        "user_id": current_user["user_id"],
-        "items": order_data.items,
-        "status": OrderStatus.CREATED,
-        "total_amount": total_amount,
-        "created_at": now,
-        "updated_at": now
-    })
+    new_order = new_order_data(current_user["user_id"], order_data, datetime.utcnow())
+    order = await insert_order(new_order)
     
     if not order:
         return StandardResponse(
@@ -99,34 +344,220 @@ async def create_order(
             error={"code": "CREATION_FAILED", "message": "Failed to create order"}
         )
     
-    logger.info(f"Order created successfully: {order_id} - Total: {total_amount}")
+    logger.info(f"Order created successfully: {order.id} - Total: {order.total_amount}")
     
     return StandardResponse(
         success=True,
         data=OrderResponse(**order.dict()).dict()
     )
 
+async def insert_order(new_order: dict):
+    if order_writer is not None:
+        return await order_writer.create_order(new_order)
+    return order_db.create_order(new_order)
+
+async def create_order_idempotent(user_id: str, key: str, order_data: OrderCreate):
+    # Повтор ключа возвращает исходный ответ, заказ не создается заново; тот же ключ
+    # с другим телом запроса - ошибка
+    fingerprint = hashlib.sha256(dumps(order_data.dict())).hexdigest()
+    
+    async def create() -> Optional[dict]:
+        new_order = new_order_data(user_id, order_data, datetime.utcnow())
+        response = OrderResponse(**new_order, version=1).dict()
+        new_order["idempotency"] = {"key": key, "fingerprint": fingerprint, "response": dumps(response).decode()}
+        
+        order = await insert_order(new_order)
+        if not order:
+            return None
+        
+        logger.info(f"Order created successfully: {order.id} - Total: {order.total_amount}")
+        return {"fingerprint": fingerprint, "order_id": order.id, "response": response, "created_at": order.created_at}
+    
+    record, replayed = await order_idempotency.run(user_id, key, create)
+    if record is None:
+        return StandardResponse(
+            success=False,
+            error={"code": "CREATION_FAILED", "message": "Failed to create order"}
+        )
+    
+    if record["fingerprint"] != fingerprint:
+        return StandardResponse(
+            success=False,
+            error={
+                "code": "IDEMPOTENCY_KEY_REUSED",
+                "message": "Idempotency-Key was already used with a different request"
+            }
+        )
+    
+    result = json_response(record["response"])
+    if replayed:
+        result.headers["Idempotent-Replayed"] = "true"
+    return result
+
+@app.post("/v1/orders/bulk", response_model=StandardResponse)
+async def create_orders_bulk(
+    bulk_data: OrderBulkCreate,
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    logger.info(f"Creating {len(bulk_data.orders)} orders in bulk for user: {current_user['user_id']}")
+    
+    now = datetime.utcnow()
+    results = []
+    orders_data = []
+    
+    for index, raw_order in enumerate(bulk_data.orders):
+        try:
+            order_create = OrderCreate(**raw_order)
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+            results.append({
+                "index": index,
+                "error": {"code": "INVALID_ORDER", "message": message}
+            })
+            continue
+        
+        order = new_order_data(current_user["user_id"], order_create, now)
+        orders_data.append(order)
+        results.append({"index": index, "id": order["id"], "total_amount": order["total_amount"]})
+    
+    created = order_db.create_orders_bulk(orders_data)
+    
+    if created is None:
+        results = [
+            result if "error" in result else {
+                "index": result["index"],
+                "error": {"code": "CREATION_FAILED", "message": "Failed to create order"}
+            }
+            for result in results
+        ]
+    
+    created_count = len(created or [])
+    logger.info(f"Bulk orders created: {created_count} of {len(bulk_data.orders)} for user: {current_user['user_id']}")
+    
+    return StandardResponse(
+        success=created_count > 0,
+        data={
+            "created": created_count,
+            "failed": len(bulk_data.orders) - created_count,
+            "results": results
+        }
+    )
+
+@app.get("/v1/orders/events")
+async def stream_order_events(
+    request: Request,
+    current_user: dict = Depends(verify_token),
+    last_event_id: Optional[str] = Header(None)
+):
+    # SSE-поток изменений статусов заказов текущего пользователя
+    user_id = current_user["user_id"]
+    
+    # подписка до чтения журнала, чтобы не потерять события между ними
+    queue = order_events.subscribe(user_id)
+    backlog = order_events.replay(user_id, last_event_id)
+    
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            
+            last_seq = 0
+            if backlog is None:
+                yield format_sse(order_events.event_id(0), "reset", {"reason": "history unavailable"})
+            else:
+                for seq, event in backlog:
+                    last_seq = seq
+                    yield format_sse(order_events.event_id(seq), "status", event)
+            
+            while not await request.is_disconnected():
+                try:
+                    seq, event = await asyncio.wait_for(queue.get(), timeout=EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                if seq <= last_seq:
+                    continue
+                last_seq = seq
+                
+                if event is RESET:
+                    yield format_sse(order_events.event_id(seq), "reset", {"reason": "client too slow"})
+                else:
+                    yield format_sse(order_events.event_id(seq), "status", event)
+        finally:
+            order_events.unsubscribe(user_id, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/v1/orders/status", response_model=StandardResponse)
+async def get_orders_status(
+    request: Request,
+    current_user: dict = Depends(verify_token),
+    ids: List[str] = Query(..., description="Order ids, repeated or comma-separated"),
+    updated_since: Optional[datetime] = Query(None, description="Only orders updated after this time"),
+    include_archived: bool = Query(False, description="Also look up archived orders")
+):
+    # Легкий опрос статусов вместо GET /v1/orders/{id} на каждый заказ
+    order_ids = list(dict.fromkeys(order_id.strip() for value in ids for order_id in value.split(",") if order_id.strip()))
+    if not order_ids or len(order_ids) > STATUS_POLL_MAX_IDS:
+        return StandardResponse(
+            success=False,
+            error={"code": "INVALID_IDS", "message": f"Provide from 1 to {STATUS_POLL_MAX_IDS} order ids"}
+        )
+    
+    # чужие заказы отфильтровывает сам запрос и они попадают в missing
+    owner_id = None if "admin" in current_user.get("roles", []) else current_user["user_id"]
+    result = order_db.get_orders_status(order_ids, owner_id, updated_since, include_archived)
+    if result is None:
+        return StandardResponse(
+            success=False,
+            error={"code": "STATUS_FAILED", "message": "Failed to load orders status"}
+        )
+    
+    changed, found = result
+    
+    return json_response({
+        "orders": changed,
+        "missing": [order_id for order_id in order_ids if order_id not in found]
+    })
+
 @app.get("/v1/orders/{order_id}", response_model=StandardResponse)
 async def get_order(
     order_id: str,
     request: Request,
-    current_user: dict = Depends(verify_token)
+    current_user: dict = Depends(verify_token),
+    include_archived: bool = Query(False, description="Also look up archived orders"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
 ):
-    order = order_db.get_order_by_id(order_id)
+    try:
+        fields = parse_fields(fields)
+    except ValueError:
+        return invalid_fields_response()
+    
+    # владелец и версия нужны для проверки доступа и ETag, даже если их не просили
+    order = order_db.get_order_by_id(
+        order_id, include_archived, as_dicts=True, fields=fields and fields | {"user_id", "version"}
+    )
     if not order:
         return StandardResponse(
             success=False,
             error={"code": "ORDER_NOT_FOUND", "message": "Order not found"}
         )
     
-    if not order_db.can_user_access_order(order, current_user):
+    if order["user_id"] != current_user["user_id"] and "admin" not in current_user.get("roles", []):
         logger.warning(f"Unauthorized access attempt to order {order_id} by user {current_user['user_id']}")
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return StandardResponse(
-        success=True,
-        data=OrderResponse(**order.dict()).dict()
-    )
+    result = json_response(select_fields([order], fields)[0])
+    result.headers["ETag"] = f'"{order["version"]}"'
+    
+    return result
 
 @app.get("/v1/orders", response_model=StandardResponse)
 async def get_orders(
@@ -134,71 +565,96 @@ async def get_orders(
     current_user: dict = Depends(verify_token),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(10, ge=1, le=100, description="Items per page"),
-    status: Optional[OrderStatus] = Query(None, description="Filter by status")
+    status: Optional[List[str]] = Query(None, description="Filter by status, repeated or comma-separated"),
+    product_id: Optional[str] = Query(None, description="Only orders containing this product"),
+    cursor: Optional[str] = Query(None, description="Cursor from previous page (next_cursor)"),
+    include_archived: bool = Query(False, description="Include archived orders"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    created_from: Optional[datetime] = Query(None, description="Created at or after"),
+    created_to: Optional[datetime] = Query(None, description="Created at or before")
 ):
-    skip = (page - 1) * limit
+    try:
+        after = parse_cursor(cursor)
+    except ValueError:
+        return invalid_cursor_response()
+    
+    try:
+        statuses = parse_statuses(status)
+    except ValueError:
+        return invalid_status_filter_response()
+    
+    try:
+        fields = parse_fields(fields)
+    except ValueError:
+        return invalid_fields_response()
+    
+    skip = 0 if after else (page - 1) * limit
     
     user_orders = order_db.get_orders_by_user(
         current_user["user_id"], 
         skip, 
-        limit, 
-        status.value if status else None
+        limit + 1, 
+        statuses,
+        product_id,
+        after,
+        include_archived,
+        as_dicts=True,
+        fields=fields and fields | PAGE_FIELDS,
+        created_from=created_from,
+        created_to=created_to
     )
     
     total_orders = order_db.get_user_orders_count(
         current_user["user_id"], 
-        status.value if status else None
+        statuses,
+        product_id,
+        include_archived,
+        created_from,
+        created_to
     )
     
-    total_pages = (total_orders + limit - 1) // limit if total_orders > 0 else 1
+    user_orders, pagination = build_page(user_orders, limit, page, total_orders, bool(after))
+    user_orders = select_fields(user_orders, fields)
     
     logger.info(f"Orders list accessed by user: {current_user['user_id']} - Total: {total_orders}")
     
-    return StandardResponse(
-        success=True,
-        data={
-            "orders": [OrderResponse(**order.dict()).dict() for order in user_orders],
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_orders,
-                "pages": total_pages
-            }
-        }
-    )
+    return json_response({"orders": user_orders, "pagination": pagination})
 
 @app.put("/v1/orders/{order_id}/status", response_model=StandardResponse)
 async def update_order_status(
     order_id: str,
     status_update: OrderUpdate,
     request: Request,
-    current_user: dict = Depends(verify_token)
+    response: Response,
+    current_user: dict = Depends(verify_token),
+    if_match: Optional[str] = Header(None)
 ):
-    order = order_db.get_order_by_id(order_id)
-    if not order:
+    if not status_update.status:
         return StandardResponse(
             success=False,
-            error={"code": "ORDER_NOT_FOUND", "message": "Order not found"}
+            error={"code": "INVALID_STATUS", "message": "Status is required"}
         )
     
-    if not order_db.can_user_access_order(order, current_user):
-        logger.warning(f"Unauthorized status update attempt for order {order_id} by user {current_user['user_id']}")
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    if not status_update.status:
+    try:
+        expected_version = parse_if_match(if_match)
+    except ValueError:
         return StandardResponse(
             success=False,
-            error={"code": "INVALID_STATUS", "message": "Status is required"}
+            error={"code": "INVALID_IF_MATCH", "message": "If-Match must contain the order version"}
         )
     
-    updated_order = order_db.update_order_status(order_id, status_update.status)
+    # доступ проверяется в самом UPDATE: владелец или администратор
+    owner_id = None if "admin" in current_user.get("roles", []) else current_user["user_id"]
+    updated_order = order_db.update_order_status(order_id, status_update.status, expected_version, owner_id)
     
     if not updated_order:
-        return StandardResponse(
-            success=False,
-            error={"code": "UPDATE_FAILED", "message": "Failed to update order status"}
+        return failed_transition_response(
+            order_id, status_update.status, expected_version, current_user, False, "UPDATE_FAILED"
         )
     
+    response.headers["ETag"] = f'"{updated_order.version}"'
+    publish_status_change(updated_order)
+    
     logger.info(f"Order status updated: {order_id} -> {status_update.status} by user: {current_user['user_id']}")
     
     return StandardResponse(
@@ -210,33 +666,31 @@ async def update_order_status(
 async def cancel_order(
     order_id: str,
     request: Request,
-    current_user: dict = Depends(verify_token)
+    response: Response,
+    current_user: dict = Depends(verify_token),
+    if_match: Optional[str] = Header(None)
 ):
-    order = order_db.get_order_by_id(order_id)
-    if not order:
-        return StandardResponse(
-            success=False,
-            error={"code": "ORDER_NOT_FOUND", "message": "Order not found"}
-        )
-    
-    if order.user_id != current_user["user_id"]:
-        logger.warning(f"Unauthorized cancel attempt for order {order_id} by user {current_user['user_id']}")
-        raise HTTPException(status_code=403, detail="Can only cancel your own orders")
-    
-    if order.status == OrderStatus.CANCELLED:
+    try:
+        expected_version = parse_if_match(if_match)
+    except ValueError:
         return StandardResponse(
             success=False,
-            error={"code": "ALREADY_CANCELLED", "message": "Order already cancelled"}
+            error={"code": "INVALID_IF_MATCH", "message": "If-Match must contain the order version"}
         )
     
-    updated_order = order_db.update_order_status(order_id, OrderStatus.CANCELLED)
+    # отменить можно только свой заказ
+    updated_order = order_db.update_order_status(
+        order_id, OrderStatus.CANCELLED, expected_version, current_user["user_id"]
+    )
     
     if not updated_order:
-        return StandardResponse(
-            success=False,
-            error={"code": "CANCEL_FAILED", "message": "Failed to cancel order"}
+        return failed_transition_response(
+            order_id, OrderStatus.CANCELLED, expected_version, current_user, True, "CANCEL_FAILED"
         )
     
+    response.headers["ETag"] = f'"{updated_order.version}"'
+    publish_status_change(updated_order)
+    
     logger.info(f"Order cancelled: {order_id} by user: {current_user['user_id']}")
     
     return StandardResponse(
@@ -249,33 +703,245 @@ async def get_all_orders(
     request: Request,
     current_user: dict = Depends(verify_token),
     page: int = Query(1, ge=1, description="Page number"),
-    limit: int = Query(10, ge=1, le=100, description="Items per page")
+    limit: int = Query(10, ge=1, le=100, description="Items per page"),
+    product_id: Optional[str] = Query(None, description="Only orders containing this product"),
+    cursor: Optional[str] = Query(None, description="Cursor from previous page (next_cursor)"),
+    include_archived: bool = Query(False, description="Include archived orders"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    status: Optional[List[str]] = Query(None, description="Filter by status, repeated or comma-separated"),
+    created_from: Optional[datetime] = Query(None, description="Created at or after"),
+    created_to: Optional[datetime] = Query(None, description="Created at or before")
 ):
     if "admin" not in current_user.get("roles", []):
         logger.warning(f"Unauthorized access to admin orders by: {current_user['user_id']}")
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    skip = (page - 1) * limit
+    try:
+        after = parse_cursor(cursor)
+    except ValueError:
+        return invalid_cursor_response()
+    
+    try:
+        statuses = parse_statuses(status)
+    except ValueError:
+        return invalid_status_filter_response()
+    
+    try:
+        fields = parse_fields(fields)
+    except ValueError:
+        return invalid_fields_response()
     
-    all_orders = order_db.get_all_orders(skip, limit)
-    total_orders = order_db.get_total_orders_count()
-    total_pages = (total_orders + limit - 1) // limit if total_orders > 0 else 1
+    skip = 0 if after else (page - 1) * limit
+    
+    all_orders = order_db.get_all_orders(
+        skip, limit + 1, product_id, after, include_archived, as_dicts=True, fields=fields and fields | PAGE_FIELDS,
+        status_filter=statuses, created_from=created_from, created_to=created_to
+    )
+    total_orders = order_db.get_total_orders_count(product_id, include_archived, statuses, created_from, created_to)
+    all_orders, pagination = build_page(all_orders, limit, page, total_orders, bool(after))
+    all_orders = select_fields(all_orders, fields)
     
     logger.info(f"All orders accessed by admin: {current_user['user_id']} - Total: {total_orders}")
     
+    return json_response({"orders": all_orders, "pagination": pagination})
+
+@app.put("/v1/admin/orders/status", response_model=StandardResponse)
+async def update_orders_status_bulk(
+    bulk_update: OrderBulkStatusUpdate,
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    if "admin" not in current_user.get("roles", []):
+        logger.warning(f"Unauthorized bulk status update by: {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    order_filter = bulk_update.filter
+    has_filter = order_filter is not None and any(
+        value is not None for value in order_filter.dict().values()
+    )
+    
+    if bool(bulk_update.ids) == has_filter:
+        return StandardResponse(
+            success=False,
+            error={"code": "INVALID_SELECTION", "message": "Provide either ids or a non-empty filter"}
+        )
+    
+    updated = order_db.update_orders_status_bulk(
+        bulk_update.status,
+        order_ids=list(dict.fromkeys(bulk_update.ids)) if bulk_update.ids else None,
+        status_filter=order_filter.status.value if has_filter and order_filter.status else None,
+        user_filter=order_filter.user_id if has_filter else None,
+        created_to=order_filter.created_to if has_filter else None
+    )
+    
+    if updated is None:
+        return StandardResponse(
+            success=False,
+            error={"code": "UPDATE_FAILED", "message": "Failed to update orders status"}
+        )
+    
+    for order_id, user_id, version, updated_at in updated:
+        order_events.publish(user_id, {
+            "order_id": order_id,
+            "status": bulk_update.status.value,
+            "version": version,
+            "updated_at": updated_at.isoformat()
+        })
+    
+    updated_ids = {order_id for order_id, _, _, _ in updated}
+    # не найдены или переход из текущего статуса недопустим
+    failed = [order_id for order_id in dict.fromkeys(bulk_update.ids or []) if order_id not in updated_ids]
+    
+    logger.info(f"Bulk status update by admin {current_user['user_id']}: {len(updated)} -> {bulk_update.status}")
+    
     return StandardResponse(
         success=True,
         data={
-            "orders": [OrderResponse(**order.dict()).dict() for order in all_orders],
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_orders,
-                "pages": total_pages
-            }
+            "status": bulk_update.status.value,
+            "updated": len(updated),
+            "failed": failed
         }
     )
 
+EXPORT_CSV_COLUMNS = ["id", "user_id", "status", "total_amount", "created_at", "updated_at", "version", "items"]
+
+def export_ndjson(orders: Iterator[dict], chunk_size: int = 500) -> Iterator[bytes]:
+    lines = []
+    for order in orders:
+        lines.append(dumps(order))
+        if len(lines) >= chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+def export_csv(orders: Iterator[dict], chunk_size: int = 500) -> Iterator[str]:
+    # позиции заказа - JSON в колонке items
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    
+    for index, order in enumerate(orders, start=1):
+        writer.writerow([order[column] for column in EXPORT_CSV_COLUMNS[:-1]] + [dumps(order["items"]).decode()])
+        if index % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
+
+@app.get("/v1/admin/orders/export")
+async def export_orders(
+    request: Request,
+    current_user: dict = Depends(verify_token),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    status: Optional[OrderStatus] = Query(None, description="Filter by status"),
+    created_from: Optional[datetime] = Query(None, description="Created at or after"),
+    created_to: Optional[datetime] = Query(None, description="Created at or before"),
+    include_archived: bool = Query(False, description="Include archived orders")
+):
+    if "admin" not in current_user.get("roles", []):
+        logger.warning(f"Unauthorized orders export by: {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    # Ошибка БД после начала ответа не превращается в ответ с ошибкой: статус 200 уже
+    # отправлен. Исключение обрывает chunked-ответ без завершающего чанка, и клиент
+    # получает незавершенную передачу вместо обрезанного файла, похожего на полный
+    orders = order_db.iter_orders_export(
+        status.value if status else None, created_from, created_to, include_archived=include_archived
+    )
+    
+    logger.info(f"Orders export ({format}) started by admin: {current_user['user_id']}")
+    
+    if format == "csv":
+        return StreamingResponse(
+            export_csv(orders),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="orders.csv"'}
+        )
+    
+    return StreamingResponse(
+        export_ndjson(orders),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="orders.ndjson"'}
+    )
+
+@app.get("/v1/admin/orders/stats", response_model=StandardResponse)
+async def get_orders_stats(
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    if "admin" not in current_user.get("roles", []):
+        logger.warning(f"Unauthorized access to order stats by: {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    stats = order_db.get_stats_overview()
+    if stats is None:
+        return StandardResponse(
+            success=False,
+            error={"code": "STATS_FAILED", "message": "Failed to load order stats"}
+        )
+    
+    return StandardResponse(success=True, data=stats)
+
+@app.get("/v1/admin/orders/stats/daily", response_model=StandardResponse)
+async def get_orders_daily_stats(
+    request: Request,
+    current_user: dict = Depends(verify_token),
+    date_from: Optional[date] = Query(None, description="First day, default 30 days ago"),
+    date_to: Optional[date] = Query(None, description="Last day, default today")
+):
+    if "admin" not in current_user.get("roles", []):
+        logger.warning(f"Unauthorized access to order stats by: {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=30)
+    
+    days = order_db.get_daily_stats(date_from.isoformat(), date_to.isoformat())
+    if days is None:
+        return StandardResponse(
+            success=False,
+            error={"code": "STATS_FAILED", "message": "Failed to load order stats"}
+        )
+    
+    return StandardResponse(
+        success=True,
+        data={"date_from": date_from.isoformat(), "date_to": date_to.isoformat(), "days": days}
+    )
+
+@app.get("/v1/admin/orders/stats/top-spenders", response_model=StandardResponse)
+async def get_top_spenders(
+    request: Request,
+    current_user: dict = Depends(verify_token),
+    limit: int = Query(10, ge=1, le=100, description="Number of users")
+):
+    if "admin" not in current_user.get("roles", []):
+        logger.warning(f"Unauthorized access to order stats by: {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    spenders = order_db.get_top_spenders(limit)
+    if spenders is None:
+        return StandardResponse(
+            success=False,
+            error={"code": "STATS_FAILED", "message": "Failed to load order stats"}
+        )
+    
+    return StandardResponse(success=True, data={"users": spenders})
+
+@app.get("/v1/admin/orders/cache/stats", response_model=StandardResponse)
+async def get_cache_stats(
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    if "admin" not in current_user.get("roles", []):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    return StandardResponse(
+        success=True,
+        data=order_db.cache.stats()
+    )
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     request_id = request.headers.get("X-Request-ID", "unknown")
@@ -0,0 +1,95 @@
+import argparse
+import logging
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from database import OrderDB, order_db
+
+# Служебные команды: python manage.py <command>
+
+logger = logging.getLogger("manage")
+
+def rebuild_stats(args) -> int:
+    return 0 if order_db.rebuild_stats() else 1
+
+def reshard(args) -> int:
+    # Переносит заказы из текущей раскладки (ORDER_SHARDS) в --shards файлов.
+    # Сервис на время переноса должен быть остановлен; исходные файлы не удаляются,
+    # после переноса достаточно выставить ORDER_SHARDS=<shards>. Файлы получателя
+    # должны быть пустыми: после обратного переноса (1 -> 2 -> 1) на месте лежит
+    # старая база со старыми статусами - ее нужно удалить или переименовать
+    if args.shards < 1 or args.shards == len(order_db.shard_paths):
+        logger.error(f"Target shard count must differ from the current one ({len(order_db.shard_paths)})")
+        return 1
+    
+    target = OrderDB(db_path=order_db.db_path, shards=args.shards)
+    stored = target.count_stored_orders()
+    if stored is None:
+        return 1
+    if stored:
+        logger.error(
+            f"Target shards already contain {stored} orders, remove them first: {', '.join(target.shard_paths)}"
+        )
+        return 1
+    
+    total = 0
+    for path in order_db.shard_paths:
+        copied = target.copy_from(path, args.batch_size)
+        if copied is None:
+            return 1
+        total += copied
+    
+    if not target.rebuild_stats():
+        return 1
+    
+    logger.info(f"Resharded {total} orders into: {', '.join(target.shard_paths)}")
+    return 0
+
+def archive(args) -> int:
+    archived = order_db.archive_orders(datetime.utcnow() - timedelta(days=args.older_than_days), args.batch_size)
+    if archived is None:
+        return 1
+    
+    logger.info(f"Archived {archived} orders")
+    return 0
+
+def migrate_times(args) -> int:
+    # Переводит время заказов из ISO-строк в микросекунды эпохи. Сервис делает это сам
+    # при открытии базы (для текущих шардов - уже при запуске команды); --path - другие
+    # файлы: копии, бэкапы, база до выкладки новой версии
+    for path in args.path or order_db.shard_paths:
+        try:
+            OrderDB(db_path=path, shards=1)
+        except sqlite3.Error:
+            return 1
+    
+    return 0
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description="Order service maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser("rebuild-stats", help="Recompute analytics summaries from orders").set_defaults(handler=rebuild_stats)
+    
+    reshard_parser = commands.add_parser("reshard", help="Copy orders into a new number of shard files")
+    reshard_parser.add_argument("--shards", type=int, required=True)
+    reshard_parser.add_argument("--batch-size", type=int, default=1000)
+    reshard_parser.set_defaults(handler=reshard)
+    
+    archive_parser = commands.add_parser("archive", help="Move old completed/cancelled orders to the archive tables")
+    archive_parser.add_argument("--older-than-days", type=float, required=True)
+    archive_parser.add_argument("--batch-size", type=int, default=500)
+    archive_parser.set_defaults(handler=archive)
+    
+    migrate_parser = commands.add_parser("migrate-times", help="Convert ISO timestamps to epoch microseconds")
+    migrate_parser.add_argument("--path", action="append", help="Database file (repeatable); default - current shards")
+    migrate_parser.set_defaults(handler=migrate_times)
+    
+    args = parser.parse_args()
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,20 @@ class OrderStatus(str, Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+# Допустимые переходы статусов; completed и cancelled - конечные
+ALLOWED_TRANSITIONS = {
+    OrderStatus.CREATED: {OrderStatus.IN_PROGRESS, OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.IN_PROGRESS: {OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.COMPLETED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+def allowed_sources(target: OrderStatus) -> List[OrderStatus]:
+    return [status for status, targets in ALLOWED_TRANSITIONS.items() if target in targets]
+
+# из конечных статусов переходов нет
+TERMINAL_STATUSES = [status for status, targets in ALLOWED_TRANSITIONS.items() if not targets]
+
 class OrderItem(BaseModel):
     product_id: str = Field(..., description="ID продукта")
     product_name: str = Field(..., description="Название продукта")
@@ -24,10 +38,15 @@ class Order(BaseModel):
     total_amount: float
     created_at: datetime
     updated_at: datetime
+    version: int = 1
 
 class OrderCreate(BaseModel):
     items: List[OrderItem] = Field(..., min_items=1, description="Список товаров")
 
+class OrderBulkCreate(BaseModel):
+    # заказы проверяются по одному, чтобы ошибка в одном не отклоняла весь запрос
+    orders: List[dict] = Field(..., min_length=1, max_length=500, description="Список заказов")
+
 class OrderResponse(BaseModel):
     id: str
     user_id: str
@@ -36,10 +55,22 @@ class OrderResponse(BaseModel):
     total_amount: float
     created_at: datetime
     updated_at: datetime
+    version: int
 
 class OrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
 
+class OrderStatusFilter(BaseModel):
+    status: Optional[OrderStatus] = None
+    user_id: Optional[str] = None
+    created_to: Optional[datetime] = Field(None, description="Созданные не позже")
+
+class OrderBulkStatusUpdate(BaseModel):
+    # либо ids, либо filter
+    ids: Optional[List[str]] = Field(None, min_length=1, max_length=10000)
+    filter: Optional[OrderStatusFilter] = None
+    status: OrderStatus
+
 class StandardResponse(BaseModel):
     success: bool
     data: Optional[dict] = None
@@ -1,17 +1,61 @@
 import logging
 import sqlite3
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, timedelta, timezone
 from schemas import User
+from cache import TTLCache, MISSING
 import os
 
 logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL", "users.db")
 
+USER_COLUMN_NAMES = ["id", "email", "password_hash", "name", "roles", "created_at", "updated_at"]
+
+# Кэш профилей; в каждом процессе свой, поэтому изменения из других
+# процессов видны не позже чем через USER_CACHE_TTL секунд
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+# негативный кэш неизвестных email для register/login
+USER_CACHE_NEGATIVE = os.getenv("USER_CACHE_NEGATIVE", "false").lower() in ("1", "true", "yes")
+USER_CACHE_NEGATIVE_TTL = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "5"))
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+def to_db_time(value: datetime) -> int:
+    # время хранится целым числом микросекунд от эпохи UTC; naive datetime - это UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // MICROSECOND
+
+def from_db_time(value: int) -> datetime:
+    # naive UTC; в ISO-строку время переводит только кодировщик ответа.
+    # Целочисленная арифметика timedelta - точно для любой даты, без float
+    return EPOCH + MICROSECOND * value
+
+def epoch_us(value):
+    # SQL-функция миграции: ISO-строка старого формата -> микросекунды, числа как есть
+    if isinstance(value, str):
+        return to_db_time(datetime.fromisoformat(value))
+    return value
+
+def user_columns(fields: Optional[Set[str]] = None) -> str:
+    # Столбцы вне fields (и password_hash) читаются как NULL, позиции в строке
+    # не меняются. id и created_at нужны всегда - курсор страницы
+    if fields is None:
+        return "*"
+    return ", ".join(
+        column if column in fields or column in ("id", "created_at") else "NULL"
+        for column in USER_COLUMN_NAMES
+    )
+
 class UserDB:
-    def __init__(self):
-        self.db_path = DATABASE_URL
+    def __init__(self, db_path: str = DATABASE_URL):
+        self.db_path = db_path
+        self.search_enabled = False
+        # ("id", user_id) -> User, ("email", email) -> user_id или None (негативная запись)
+        self.cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
         self.init_database()
 
     def init_database(self):
@@ -27,14 +71,20 @@ class UserDB:
                         password_hash TEXT NOT NULL,
                         name TEXT NOT NULL,
                         roles TEXT NOT NULL,
-                        created_at TIMESTAMP NOT NULL,
-                        updated_at TIMESTAMP NOT NULL
+                        created_at INTEGER NOT NULL,
+                        updated_at INTEGER NOT NULL
                     )
                 ''')
                 
+                self._migrate_epoch_times(cursor)
+                
                 # index
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)')
+                # (created_at, id) - keyset-пагинация без OFFSET
+                cursor.execute('DROP INDEX IF EXISTS idx_users_created_at')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created_at_id ON users(created_at, id)')
+                
+                self.search_enabled = self._init_search_index(cursor)
                 
                 conn.commit()
                 logger.info("Database initialized successfully")
@@ -43,9 +93,90 @@ class UserDB:
             logger.error(f"Database initialization error: {e}")
             raise
 
+    def _migrate_epoch_times(self, cursor):
+        # старая схема хранила время ISO-строками
+        cursor.connection.create_function("epoch_us", 1, epoch_us, deterministic=True)
+        cursor.execute('''
+            UPDATE users SET created_at = epoch_us(created_at), updated_at = epoch_us(updated_at)
+            WHERE typeof(created_at) = 'text' OR typeof(updated_at) = 'text'
+        ''')
+        if cursor.rowcount:
+            logger.info(f"Migrated {cursor.rowcount} users to epoch timestamps: {self.db_path}")
+
+    def _init_search_index(self, cursor) -> bool:
+        # LIKE '%x%' не использует B-tree индекс, поэтому поиск подстроки идет
+        # через FTS5 trigram-таблицу, которую синхронизируют триггеры
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_search'")
+            exists = cursor.fetchone() is not None
+            
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+                    email, name,
+                    content='users', content_rowid='rowid', tokenize='trigram'
+                )
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+                    INSERT INTO users_search(rowid, email, name) VALUES (new.rowid, new.email, new.name);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+                    INSERT INTO users_search(users_search, rowid, email, name)
+                    VALUES ('delete', old.rowid, old.email, old.name);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF email, name ON users BEGIN
+                    INSERT INTO users_search(users_search, rowid, email, name)
+                    VALUES ('delete', old.rowid, old.email, old.name);
+                    INSERT INTO users_search(rowid, email, name) VALUES (new.rowid, new.email, new.name);
+                END
+            ''')
+            
+            if not exists:
+                # индекс для уже существующих пользователей
+                cursor.execute("INSERT INTO users_search(users_search) VALUES ('rebuild')")
+            
+            return True
+            
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram search unavailable, falling back to LIKE: {e}")
+            return False
+
+    def rebuild_search_index(self) -> bool:
+        # нужен после VACUUM: он может перенумеровать rowid таблицы users
+        # (python manage.py rebuild-search-index)
+        try:
+            with self.get_connection() as conn:
+                conn.execute("INSERT INTO users_search(users_search) VALUES ('rebuild')")
+                conn.commit()
+                logger.info("Users search index rebuilt")
+                return True
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error rebuilding users search index: {e}")
+            return False
+
     def get_connection(self):
         return sqlite3.connect(self.db_path)
 
+    def _search_conditions(self, email_filter: str = None, name_filter: str = None):
+        filters = [(column, value) for column, value in (("email", email_filter), ("name", name_filter)) if value]
+        if not filters:
+            return [], []
+        
+        params = [f"%{value}%" for _, value in filters]
+        
+        # trigram-индекс сам обслуживает LIKE по своим столбцам, но только
+        # для шаблонов от трех символов - короче дешевле обычный LIKE
+        if self.search_enabled and all(len(value) >= 3 for _, value in filters):
+            match = " AND ".join(f"{column} LIKE ?" for column, _ in filters)
+            return [f"rowid IN (SELECT rowid FROM users_search WHERE {match})"], params
+        
+        return [f"{column} LIKE ?" for column, _ in filters], params
+
     def _user_from_row(self, row) -> User:
         if not row:
             return None
@@ -56,11 +187,38 @@ class UserDB:
             password_hash=row[2],
             name=row[3],
             roles=row[4].split(','), 
-            created_at=datetime.fromisoformat(row[5]),
-            updated_at=datetime.fromisoformat(row[6])
+            created_at=from_db_time(row[5]),
+            updated_at=from_db_time(row[6])
         )
 
+    def _user_dict(self, row, fields: Optional[Set[str]] = None) -> dict:
+        # Быстрый путь для чтения: строка сразу в dict в формате UserResponse
+        # (без password_hash); время - datetime, в ISO его переводит кодировщик ответа
+        user = {
+            "id": row[0],
+            "email": row[1],
+            "name": row[3],
+            "roles": row[4],
+            "created_at": from_db_time(row[5]),
+            "updated_at": from_db_time(row[6]) if row[6] is not None else None
+        }
+        if fields is not None:
+            user = {name: value for name, value in user.items() if name in fields}
+        if "roles" in user:
+            user["roles"] = user["roles"].split(',')
+        return user
+
     def get_user_by_email(self, email: str) -> Optional[User]:
+        cached_id = self.cache.get(("email", email))
+        if cached_id is None:
+            return None
+        if cached_id is not MISSING:
+            user = self.get_user_by_id(cached_id)
+            # email мог смениться после того, как попал в кэш
+            if user and user.email == email:
+                return user
+            self.cache.invalidate(("email", email))
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -69,13 +227,26 @@ class UserDB:
                     (email,)
                 )
                 row = cursor.fetchone()
-                return self._user_from_row(row)
+                user = self._user_from_row(row)
+                
+                if user:
+                    self.cache.set(("id", user.id), user)
+                    self.cache.set(("email", email), user.id)
+                elif USER_CACHE_NEGATIVE:
+                    self.cache.set(("email", email), None, ttl=USER_CACHE_NEGATIVE_TTL)
+                
+                return user
                 
         except sqlite3.Error as e:
             logger.error(f"Error getting user by email {email}: {e}")
             return None
 
     def get_user_by_id(self, user_id: str) -> Optional[User]:
+        # закэшированный User общий для всех вызовов - не изменять на месте
+        user = self.cache.get(("id", user_id))
+        if user is not MISSING:
+            return user
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -84,20 +255,44 @@ class UserDB:
                     (user_id,)
                 )
                 row = cursor.fetchone()
-                return self._user_from_row(row)
+                user = self._user_from_row(row)
+                
+                if user:
+                    self.cache.set(("id", user_id), user)
+                
+                return user
                 
         except sqlite3.Error as e:
             logger.error(f"Error getting user by ID {user_id}: {e}")
             return None
 
+    def get_user_profiles(self, user_ids: List[str]) -> Dict[str, dict]:
+        # краткие профили для обогащения ответов других сервисов, один запрос на пачку
+        if not user_ids:
+            return {}
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                placeholders = ", ".join("?" for _ in user_ids)
+                cursor.execute(
+                    f"SELECT id, email, name FROM users WHERE id IN ({placeholders})",
+                    list(user_ids)
+                )
+                return {row[0]: {"email": row[1], "name": row[2]} for row in cursor.fetchall()}
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error getting user profiles: {e}")
+            return {}
+
     def create_user(self, user_data: dict) -> Optional[User]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
                 roles_str = ','.join(user_data['roles'])
-                created_at = user_data['created_at'].isoformat()
-                updated_at = user_data['updated_at'].isoformat()
+                created_at = to_db_time(user_data['created_at'])
+                updated_at = to_db_time(user_data['updated_at'])
                 
                 cursor.execute('''
                     INSERT INTO users (id, email, password_hash, name, roles, created_at, updated_at)
@@ -113,6 +308,7 @@ class UserDB:
                 ))
                 
                 conn.commit()
+                self.cache.invalidate(("email", user_data['email']))
                 logger.info(f"User created: {user_data['id']}")
                 
                 return User(**user_data)
@@ -124,6 +320,67 @@ class UserDB:
             logger.error(f"Error creating user: {e}")
             return None
 
+    def get_existing_emails(self, emails: List[str]) -> Set[str]:
+        if not emails:
+            return set()
+        
+        try:
+            with self.get_connection() as conn:
+                return self._existing_emails(conn.cursor(), emails)
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error checking existing emails: {e}")
+            return set()
+
+    def _existing_emails(self, cursor, emails: List[str]) -> Set[str]:
+        placeholders = ", ".join("?" for _ in emails)
+        cursor.execute(f"SELECT email FROM users WHERE email IN ({placeholders})", list(emails))
+        return {row[0] for row in cursor.fetchall()}
+
+    def create_users_bulk(self, users_data: List[dict]) -> Optional[List[str]]:
+        # одна транзакция на пачку: дубликаты email отсекаются заранее,
+        # чтобы IntegrityError не откатывал всю пачку; возвращает id созданных
+        if not users_data:
+            return []
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                
+                taken = self._existing_emails(cursor, [user['email'] for user in users_data])
+                rows = []
+                
+                for user in users_data:
+                    if user['email'] in taken:
+                        continue
+                    taken.add(user['email'])
+                    rows.append((
+                        user['id'],
+                        user['email'],
+                        user['password_hash'],
+                        user['name'],
+                        ','.join(user['roles']),
+                        to_db_time(user['created_at']),
+                        to_db_time(user['updated_at'])
+                    ))
+                
+                cursor.executemany('''
+                    INSERT INTO users (id, email, password_hash, name, roles, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                
+                conn.commit()
+                for row in rows:
+                    self.cache.invalidate(("email", row[1]))
+                logger.info(f"Users imported: {len(rows)} of {len(users_data)}")
+                
+                return [row[0] for row in rows]
+                
+        except sqlite3.Error as e:
+            logger.error(f"Error importing users: {e}")
+            return None
+
     def update_user(self, user_id: str, update_data: dict) -> Optional[User]:
         try:
             with self.get_connection() as conn:
@@ -143,7 +400,7 @@ class UserDB:
                     return self.get_user_by_id(user_id)
                 
                 set_clauses.append("updated_at = ?")
-                params.append(datetime.utcnow().isoformat())
+                params.append(to_db_time(datetime.utcnow()))
                 
                 params.append(user_id)
                 
@@ -151,6 +408,9 @@ class UserDB:
                 cursor.execute(query, params)
                 
                 conn.commit()
+                self.cache.invalidate(("id", user_id))
+                if update_data.get('email'):
+                    self.cache.invalidate(("email", update_data['email']))
                 logger.info(f"User updated: {user_id}")
                 
                 return self.get_user_by_id(user_id)
@@ -159,41 +419,50 @@ class UserDB:
             logger.error(f"Error updating user {user_id}: {e}")
             return None
 
-    def get_all_users(self, skip: int = 0, limit: int = 100, email_filter: str = None) -> List[User]:
+    def get_all_users(self, skip: int = 0, limit: int = 100, email_filter: str = None,
+                      after: Optional[Tuple[datetime, str]] = None, name_filter: str = None,
+                      as_dicts: bool = False, fields: Optional[Set[str]] = None) -> list:
+        # after - (created_at, id) последней записи предыдущей страницы;
+        # as_dicts - вернуть dict в формате UserResponse вместо User,
+        # fields (только с as_dicts) - оставить в нем лишь эти поля
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                query = "SELECT * FROM users"
-                params = []
+                query = f"SELECT {user_columns(fields)} FROM users"
+                conditions, params = self._search_conditions(email_filter, name_filter)
                 
-                if email_filter:
-                    query += " WHERE email LIKE ?"
-                    params.append(f"%{email_filter}%")
+                if after:
+                    conditions.append("(created_at, id) < (?, ?)")
+                    params.extend([to_db_time(after[0]), after[1]])
                 
-                query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+                if conditions:
+                    query += " WHERE " + " AND ".join(conditions)
+                
+                query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
                 params.extend([limit, skip])
                 
                 cursor.execute(query, params)
                 rows = cursor.fetchall()
                 
+                if as_dicts:
+                    return [self._user_dict(row, fields) for row in rows if row]
                 return [self._user_from_row(row) for row in rows if row]
                 
         except sqlite3.Error as e:
             logger.error(f"Error getting all users: {e}")
             return []
 
-    def get_users_count(self, email_filter: str = None) -> int:
+    def get_users_count(self, email_filter: str = None, name_filter: str = None) -> int:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
                 query = "SELECT COUNT(*) FROM users"
-                params = []
+                conditions, params = self._search_conditions(email_filter, name_filter)
                 
-                if email_filter:
-                    query += " WHERE email LIKE ?"
-                    params.append(f"%{email_filter}%")
+                if conditions:
+                    query += " WHERE " + " AND ".join(conditions)
                 
                 cursor.execute(query, params)
                 result = cursor.fetchone()
@@ -210,6 +479,7 @@ class UserDB:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
                 conn.commit()
+                self.cache.invalidate(("id", user_id))
                 
                 deleted = cursor.rowcount > 0
                 if deleted:
@@ -1,17 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, Query
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel, EmailStr
-import uuid
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import json
+import os
 from datetime import datetime
 from jose import jwt
 from passlib.context import CryptContext
-from typing import List, Optional
+from typing import List, Optional, Set
 import logging
 
-from schemas import UserCreate, UserLogin, UserResponse, UserUpdate, StandardResponse
+from schemas import UserCreate, UserLogin, UserResponse, UserUpdate, UserBatchRequest, StandardResponse
 from database import user_db 
 from auth import verify_password, get_password_hash, create_access_token
+from pagination import encode_cursor, decode_cursor
 from dependencies import verify_token
+from responses import FastJSONResponse
+from ids import new_id
 
 # Configure
 logging.basicConfig(
@@ -21,6 +27,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
+    default_response_class=FastJSONResponse,
     title="User Service",
     version="1.0.0",
     description="User management and authentication service"
@@ -32,6 +39,51 @@ JWT_SECRET = "your-secret-key"
 ALGORITHM = "HS256"
 security = HTTPBearer()
 
+BATCH_MAX_IDS = 500
+
+# Bulk import
+IMPORT_CHUNK_SIZE = int(os.getenv("USER_IMPORT_CHUNK_SIZE", "500"))
+IMPORT_HASH_WORKERS = int(os.getenv("USER_IMPORT_HASH_WORKERS", "0")) or None
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    # bcrypt нагружает CPU, поэтому хэши пачки считаются в отдельных процессах
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=IMPORT_HASH_WORKERS)
+    return _hash_pool
+
+@app.on_event("shutdown")
+def shutdown_hash_pool():
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+
+# ключи курсора: читаются всегда, даже если их нет в ?fields=
+PAGE_FIELDS = {"id", "created_at"}
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    # ?fields=id,email,name; None - все поля, ValueError - неизвестное поле
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested or not requested <= set(UserResponse.model_fields):
+        raise ValueError(fields)
+    return requested
+
+def invalid_fields_response() -> StandardResponse:
+    return StandardResponse(
+        success=False,
+        error={
+            "code": "INVALID_FIELDS",
+            "message": f"fields must be a comma-separated subset of: {', '.join(UserResponse.model_fields)}"
+        }
+    )
+
+def json_response(data: dict) -> Response:
+    # Быстрый путь чтения: data уже JSON-совместим (dict из строк БД), повторная
+    # валидация через StandardResponse/UserResponse не нужна
+    return FastJSONResponse({"success": True, "data": data, "error": None})
+
 
 @app.post("/v1/auth/register", response_model=StandardResponse)
 async def register(user_data: UserCreate, request: Request):
@@ -45,7 +97,7 @@ async def register(user_data: UserCreate, request: Request):
             error={"code": "USER_EXISTS", "message": "User with this email already exists"}
         )
     
-    user_id = str(uuid.uuid4())
+    user_id = new_id()
     now = datetime.utcnow()
     
     user = user_db.create_user({
@@ -101,15 +153,22 @@ async def login(login_data: UserLogin, request: Request):
 @app.get("/v1/users/me", response_model=StandardResponse)
 async def get_current_user(
     request: Request, 
-    current_user: dict = Depends(verify_token)
+    current_user: dict = Depends(verify_token),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
 ):
+    try:
+        fields = parse_fields(fields)
+    except ValueError:
+        return invalid_fields_response()
+    
     user = user_db.get_user_by_id(current_user["user_id"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # профиль берется из кэша целиком, fields сокращают только ответ
     return StandardResponse(
         success=True,
-        data=UserResponse(**user.dict()).dict()
+        data=UserResponse(**user.dict()).dict(include=fields)
     )
 
 @app.put("/v1/users/me", response_model=StandardResponse)
@@ -141,29 +200,235 @@ async def get_users(
     current_user: dict = Depends(verify_token),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(10, ge=1, le=100, description="Items per page"),
-    email: Optional[str] = Query(None, description="Filter by email")
+    email: Optional[str] = Query(None, description="Filter by email"),
+    name: Optional[str] = Query(None, description="Filter by name"),
+    cursor: Optional[str] = Query(None, description="Cursor from previous page (next_cursor)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
 ):
     if "admin" not in current_user.get("roles", []):
         logger.warning(f"Unauthorized access to users list by: {current_user['user_id']}")
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    skip = (page - 1) * limit
+    try:
+        fields = parse_fields(fields)
+    except ValueError:
+        return invalid_fields_response()
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return StandardResponse(
+                success=False,
+                error={"code": "INVALID_CURSOR", "message": "Invalid pagination cursor"}
+            )
     
-    users = user_db.get_all_users(skip, limit, email)
-    total_users = user_db.get_users_count(email)
-    total_pages = (total_users + limit - 1) // limit if total_users > 0 else 1
+    # курсор заменяет OFFSET; страница запрашивается только без курсора
+    skip = 0 if after else (page - 1) * limit
+    
+    # лишняя запись показывает, есть ли следующая страница
+    users = user_db.get_all_users(skip, limit + 1, email, after, name, as_dicts=True,
+                                  fields=fields and fields | PAGE_FIELDS)
+    has_more = len(users) > limit
+    users = users[:limit]
+    next_cursor = encode_cursor(users[-1]["created_at"], users[-1]["id"]) if has_more else None
+    
+    if fields is not None and not PAGE_FIELDS <= fields:
+        users = [{name: value for name, value in user.items() if name in fields} for user in users]
     
     logger.info(f"Users list accessed by admin: {current_user['user_id']}")
     
+    if after:
+        pagination = {
+            "limit": limit,
+            "next_cursor": next_cursor
+        }
+    else:
+        total_users = user_db.get_users_count(email, name)
+        total_pages = (total_users + limit - 1) // limit if total_users > 0 else 1
+        pagination = {
+            "page": page,
+            "limit": limit,
+            "total": total_users,
+            "pages": total_pages,
+            "next_cursor": next_cursor
+        }
+    
+    return json_response({"users": users, "pagination": pagination})
+
+def lookup_user_profiles(user_ids: List[str], current_user: dict) -> StandardResponse:
+    if "admin" not in current_user.get("roles", []):
+        logger.warning(f"Unauthorized batch user lookup by: {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+    if not ids or len(ids) > BATCH_MAX_IDS:
+        return StandardResponse(
+            success=False,
+            error={"code": "INVALID_IDS", "message": f"Provide from 1 to {BATCH_MAX_IDS} user ids"}
+        )
+    
+    profiles = user_db.get_user_profiles(ids)
+    
+    return StandardResponse(
+        success=True,
+        data={
+            "users": profiles,
+            "missing": [user_id for user_id in ids if user_id not in profiles]
+        }
+    )
+
+@app.get("/v1/users/batch", response_model=StandardResponse)
+async def get_users_batch(
+    request: Request,
+    current_user: dict = Depends(verify_token),
+    ids: List[str] = Query(..., description="User ids, repeated or comma-separated")
+):
+    user_ids = [user_id.strip() for value in ids for user_id in value.split(",")]
+    return lookup_user_profiles(user_ids, current_user)
+
+@app.post("/v1/users/batch", response_model=StandardResponse)
+async def post_users_batch(
+    batch: UserBatchRequest,
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    return lookup_user_profiles(batch.ids, current_user)
+
+@app.get("/v1/users/cache/stats", response_model=StandardResponse)
+async def get_cache_stats(
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    if "admin" not in current_user.get("roles", []):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    return StandardResponse(
+        success=True,
+        data=user_db.cache.stats()
+    )
+
+async def iter_ndjson_lines(request: Request):
+    buffer = b""
+    line_no = 0
+    
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+    
+    if buffer:
+        yield line_no + 1, buffer
+
+async def import_users_chunk(chunk: list, errors: list) -> int:
+    # chunk - список (номер строки, UserCreate)
+    existing = user_db.get_existing_emails([user.email for _, user in chunk])
+    accepted = []
+    
+    for line_no, user in chunk:
+        if user.email in existing:
+            errors.append({
+                "line": line_no,
+                "email": user.email,
+                "code": "USER_EXISTS",
+                "message": "User with this email already exists"
+            })
+            continue
+        existing.add(user.email)
+        accepted.append((line_no, user))
+    
+    if not accepted:
+        return 0
+    
+    loop = asyncio.get_running_loop()
+    pool = get_hash_pool()
+    hashes = await asyncio.gather(*[
+        loop.run_in_executor(pool, get_password_hash, user.password) for _, user in accepted
+    ])
+    
+    now = datetime.utcnow()
+    users = [
+        {
+            "id": new_id(),
+            "email": user.email,
+            "password_hash": password_hash,
+            "name": user.name,
+            "roles": ["user"],
+            "created_at": now,
+            "updated_at": now
+        }
+        for (_, user), password_hash in zip(accepted, hashes)
+    ]
+    
+    created_ids = user_db.create_users_bulk(users)
+    if created_ids is None:
+        for line_no, user in accepted:
+            errors.append({
+                "line": line_no,
+                "email": user.email,
+                "code": "CREATION_FAILED",
+                "message": "Failed to create user"
+            })
+        return 0
+    
+    # email мог быть занят между проверкой и вставкой
+    created = set(created_ids)
+    for (line_no, user), user_row in zip(accepted, users):
+        if user_row["id"] not in created:
+            errors.append({
+                "line": line_no,
+                "email": user.email,
+                "code": "USER_EXISTS",
+                "message": "User with this email already exists"
+            })
+    
+    return len(created)
+
+@app.post("/v1/users/import", response_model=StandardResponse)
+async def import_users(
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    # тело - NDJSON, по одному UserCreate на строку
+    if "admin" not in current_user.get("roles", []):
+        logger.warning(f"Unauthorized users import attempt by: {current_user['user_id']}")
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    created = 0
+    errors = []
+    chunk = []
+    
+    async for line_no, line in iter_ndjson_lines(request):
+        if not line.strip():
+            continue
+        
+        try:
+            chunk.append((line_no, UserCreate(**json.loads(line))))
+        except (ValueError, TypeError) as e:
+            errors.append({
+                "line": line_no,
+                "code": "INVALID_ROW",
+                "message": str(e)
+            })
+            continue
+        
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            created += await import_users_chunk(chunk, errors)
+            chunk = []
+    
+    if chunk:
+        created += await import_users_chunk(chunk, errors)
+    
+    logger.info(f"Users import by admin {current_user['user_id']}: created {created}, failed {len(errors)}")
+    
     return StandardResponse(
         success=True,
         data={
-            "users": [UserResponse(**user.dict()).dict() for user in users],
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_users,
-                "pages": total_pages
-            }
+            "created": created,
+            "failed": len(errors),
+            "errors": errors
         }
     )
\ No newline at end of file
@@ -0,0 +1,51 @@
+import argparse
+import logging
+import sqlite3
+import sys
+
+from database import UserDB, user_db
+
+# Служебные команды: python manage.py <command>
+
+logger = logging.getLogger("manage")
+
+def rebuild_search_index(args) -> int:
+    # Пересобирает FTS5-индекс поиска по email и имени. Нужен после VACUUM: он может
+    # перенумеровать rowid таблицы users, и индекс начнет указывать не на те строки
+    if not user_db.search_enabled:
+        logger.error("FTS5 trigram search is not available in this SQLite build")
+        return 1
+    
+    return 0 if user_db.rebuild_search_index() else 1
+
+def migrate_times(args) -> int:
+    # Переводит время пользователей из ISO-строк в микросекунды эпохи. Сервис делает
+    # это сам при открытии базы (для DATABASE_URL - уже при запуске команды); --path -
+    # другие файлы: копии, бэкапы, база до выкладки новой версии
+    for path in args.path or [user_db.db_path]:
+        try:
+            UserDB(db_path=path)
+        except sqlite3.Error:
+            return 1
+    
+    return 0
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description="User service maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser(
+        "rebuild-search-index", help="Rebuild the email/name search index (run after VACUUM)"
+    ).set_defaults(handler=rebuild_search_index)
+    
+    migrate_parser = commands.add_parser("migrate-times", help="Convert ISO timestamps to epoch microseconds")
+    migrate_parser.add_argument("--path", action="append", help="Database file (repeatable); default - DATABASE_URL")
+    migrate_parser.set_defaults(handler=migrate_times)
+    
+    args = parser.parse_args()
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON_ENCODER: auto - orjson, если установлен; json - всегда stdlib
+JSON_ENCODER = os.getenv("JSON_ENCODER", "auto")
+USE_ORJSON = orjson is not None and JSON_ENCODER != "json"
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    # Вывод совпадает у обоих кодировщиков: компактный, UTF-8 без \u-экранирования,
+    # datetime в isoformat, Enum - его значение
+    if USE_ORJSON:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    # default_response_class приложения
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -33,6 +33,10 @@ class UserUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
 
+class UserBatchRequest(BaseModel):
+    # число id проверяет lookup_user_profiles (BATCH_MAX_IDS) - та же ошибка, что у GET
+    ids: List[str]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
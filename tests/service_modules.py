@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+# Юнит-тесты работают с модулями сервиса напрямую, без запущенных контейнеров.
+# Модули сервисов называются одинаково (database, main, schemas), поэтому каждый
+# каталог юнит-тестов подключает свой сервис через isolate_service в conftest.py
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVICE_DIRS = {os.path.join(ROOT, name) for name in ("api_gateway", "service_orders", "service_users")}
+# модули, убранные из sys.modules, по каталогам сервисов: при возврате к сервису
+# восстанавливаются те же объекты, что уже импортировали conftest.py и тесты
+STASHED_MODULES = {service_dir: {} for service_dir in SERVICE_DIRS}
+
+def isolate_service(service: str, **environ):
+    # Хук pytest_collectstart для conftest.py: перед импортом тестового модуля убирает
+    # из sys.modules модули других сервисов, возвращает ранее импортированные модули
+    # service, ставит его каталог первым в sys.path и выставляет environ (DATABASE_URL
+    # читается модулем database при импорте). Сразу же применяется и к самому
+    # conftest.py - после вызова он может импортировать модули сервиса для фикстур
+    service_dir = os.path.join(ROOT, service)
+    
+    def activate():
+        for name, module in list(sys.modules.items()):
+            module_dir = os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or ""))
+            if module_dir in SERVICE_DIRS and module_dir != service_dir:
+                STASHED_MODULES[module_dir][name] = sys.modules.pop(name)
+        sys.modules.update(STASHED_MODULES[service_dir])
+        STASHED_MODULES[service_dir].clear()
+        
+        if service_dir in sys.path:
+            sys.path.remove(service_dir)
+        sys.path.insert(0, service_dir)
+        os.environ.update(environ)
+    
+    def pytest_collectstart(collector):
+        if isinstance(collector, pytest.Module):
+            activate()
+    
+    activate()
+    return pytest_collectstart
@@ -165,4 +165,38 @@ class TestOrderService:
             assert "status" in order
             assert "total_amount" in order
         
-        print(f"Корректная пагинация - страница {pagination['page']}, всего {pagination['total']} заказов")
\ No newline at end of file
+        print(f"Корректная пагинация - страница {pagination['page']}, всего {pagination['total']} заказов")
+    
+    def test_4_create_order_idempotency_key(self):
+        print("\n=== Тест 4: Повтор создания заказа с Idempotency-Key ===")
+        
+        order_data = {
+            "items": [
+                {
+                    "product_id": "prod_1",
+                    "product_name": "Test Product 1",
+                    "quantity": 1,
+                    "price": 10.00
+                }
+            ]
+        }
+        headers = {**self._get_headers(), "Idempotency-Key": uuid.uuid4().hex}
+        
+        first = requests.post(f"{BASE_URL}/v1/orders", json=order_data, headers=headers)
+        repeat = requests.post(f"{BASE_URL}/v1/orders", json=order_data, headers=headers)
+        
+        assert first.status_code == 200
+        assert repeat.status_code == 200
+        assert first.json()["success"] == True
+        assert repeat.json() == first.json()
+        assert repeat.headers.get("Idempotent-Replayed") == "true"
+        
+        # тот же ключ с другим телом запроса
+        order_data["items"][0]["quantity"] = 2
+        reused = requests.post(f"{BASE_URL}/v1/orders", json=order_data, headers=headers)
+        
+        assert reused.json()["success"] == False
+        assert reused.json()["error"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+        
+        self.order_ids.append(first.json()["data"]["id"])
+        print(f"Повтор вернул исходный заказ - ID: {first.json()['data']['id']}")
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# общий хук лежит в tests/: при запуске из этого каталога pytest не добавляет его в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service_modules import isolate_service  # noqa: E402
+
+# DATABASE_URL задается до импорта database: модуль создает order_db при импорте
+pytest_collectstart = isolate_service(
+    "service_orders", DATABASE_URL=os.path.join(tempfile.mkdtemp(), "orders.db")
+)
+
+from database import OrderDB  # noqa: E402
+
+@pytest.fixture
+def order_shards() -> int:
+    # файлы могут переопределить фикстуру, чтобы прогнать тесты и на шардах
+    return 1
+
+@pytest.fixture
+def order_db(tmp_path, order_shards):
+    # пустая база заказов; тестовые данные добавляет seed_orders из order_factory.py
+    return OrderDB(db_path=str(tmp_path / "orders.db"), shards=order_shards)
+
+@pytest.fixture(scope="session", autouse=True)
+def check_services():
+    """Сервисы для юнит-тестов не нужны"""
+    yield
@@ -0,0 +1,68 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from models import OrderItem, OrderStatus
+
+# Общие данные юнит-тестов заказов. Фикстура order_db - в conftest.py; хелперы
+# лежат здесь, потому что тестовые модули не могут импортировать conftest
+# (под этим именем в sys.modules оказывается conftest другого каталога)
+START = datetime(2024, 1, 1)
+ITEMS = [OrderItem(product_id="prod_1", product_name="Product 1", quantity=1, price=10.0)]
+# таблица orders исходной схемы: позиции JSON-строкой в items, время ISO-строками
+LEGACY_COLUMNS = {
+    "id": "TEXT PRIMARY KEY",
+    "user_id": "TEXT NOT NULL",
+    "items": "TEXT NOT NULL",
+    "status": "TEXT NOT NULL",
+    "total_amount": "REAL NOT NULL",
+    "created_at": "TIMESTAMP NOT NULL",
+    "updated_at": "TIMESTAMP NOT NULL"
+}
+
+def order_data(order_id: str, user_id: str = "user_1", created_at: datetime = START,
+               status: OrderStatus = OrderStatus.CREATED, items: List[OrderItem] = ITEMS,
+               total_amount: float = 10.0) -> dict:
+    return {
+        "id": order_id,
+        "user_id": user_id,
+        "items": items,
+        "status": status,
+        "total_amount": total_amount,
+        "created_at": created_at,
+        "updated_at": created_at
+    }
+
+def seed_orders(db, total: int, users: int = 1, start: datetime = START, step: timedelta = timedelta(hours=1),
+                **fields) -> List[dict]:
+    # заказы order_00, order_01, ... раз в step от start у пользователей user_{i % users};
+    # fields - status, items, total_amount: значение для всех заказов или функция номера
+    orders = [
+        order_data(
+            f"order_{i:02d}", f"user_{i % users}", start + step * i,
+            **{name: value(i) if callable(value) else value for name, value in fields.items()}
+        )
+        for i in range(total)
+    ]
+    db.create_orders_bulk(orders)
+    return orders
+
+def legacy_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def legacy_db(path: str, orders: List[dict], columns: Dict[str, str] = LEGACY_COLUMNS) -> str:
+    # база в старом формате, который OrderDB переводит при открытии: таблица orders
+    # только с колонками columns, без order_items, счетчиков и сводок
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"CREATE TABLE orders ({', '.join(f'{name} {type_}' for name, type_ in columns.items())})")
+        conn.execute('CREATE INDEX idx_orders_user_id ON orders(user_id)')
+        conn.executemany(
+            f"INSERT INTO orders ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(legacy_value(order[name]) for name in columns) for order in orders]
+        )
+    return path
@@ -0,0 +1,54 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from database import OrderDB, from_db_time, to_db_time
+from order_factory import LEGACY_COLUMNS, legacy_db, order_data
+
+CREATED_AT = datetime(2024, 3, 1, 23, 59, 59, 999000)
+# схема после переноса позиций в order_items, но со временем ISO-строками
+COLUMNS = {name: type_ for name, type_ in LEGACY_COLUMNS.items() if name != "items"}
+
+def iso_db(path: str) -> str:
+    # три заказа с разницей в микросекунду и триггер сводок с date(created_at)
+    orders = [order_data(f"order_{i}", created_at=CREATED_AT + timedelta(microseconds=i)) for i in range(3)]
+    legacy_db(path, orders, COLUMNS)
+    with sqlite3.connect(path) as conn:
+        conn.execute('''
+            CREATE TRIGGER order_stats_ai AFTER INSERT ON orders BEGIN
+                INSERT INTO order_daily_stats (day, orders_count, revenue)
+                VALUES (date(new.created_at), 1, iif(new.status = 'cancelled', 0, new.total_amount))
+                ON CONFLICT (day) DO UPDATE SET
+                    orders_count = orders_count + 1,
+                    revenue = revenue + excluded.revenue;
+            END
+        ''')
+    return path
+
+class TestEpochTimes:
+    
+    def test_1_round_trip(self):
+        for value in (CREATED_AT, datetime(2024, 1, 1), datetime(2099, 12, 31, 23, 59, 59, 999999)):
+            assert from_db_time(to_db_time(value)) == value
+    
+    def test_2_legacy_database_is_migrated_on_open(self, tmp_path):
+        path = iso_db(str(tmp_path / "orders.db"))
+        order_db = OrderDB(db_path=path)
+        
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT DISTINCT typeof(created_at), typeof(updated_at) FROM orders").fetchall() == [
+                ("integer", "integer")
+            ]
+        
+        order = order_db.get_order_by_id("order_2")
+        assert order.created_at == CREATED_AT + timedelta(microseconds=2)
+        assert [order["id"] for order in order_db.get_orders_by_user("user_1", as_dicts=True)] == [
+            "order_2", "order_1", "order_0"
+        ]
+        
+        # пересозданный триггер кладет заказ в день по UTC
+        with sqlite3.connect(path) as conn:
+            assert "unixepoch" in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'order_stats_ai'").fetchone()[0]
+        order_db.create_order(order_data("order_3", created_at=CREATED_AT))
+        assert order_db.get_daily_stats("2024-03-01", "2024-03-02") == [
+            {"day": "2024-03-01", "orders": 4, "revenue": 40.0}
+        ]
@@ -0,0 +1,30 @@
+import time
+import uuid
+
+from database import OrderDB, shard_of
+from ids import new_id, uuid7
+
+class TestTimeOrderedIds:
+    
+    def test_1_uuid7_layout(self):
+        value = uuid7()
+        
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+        assert abs((value.int >> 80) - time.time_ns() // 1_000_000) < 1000
+    
+    def test_2_ids_sort_by_creation_time(self):
+        ids = []
+        for _ in range(5):
+            ids.append(new_id())
+            time.sleep(0.002)
+        
+        assert ids == sorted(ids)
+    
+    def test_3_order_id_keeps_shard_hint(self, tmp_path):
+        order_db = OrderDB(db_path=str(tmp_path / "orders.db"), shards=4)
+        
+        for user_id in ("user_1", "user_2", "user_3"):
+            order_id = order_db.new_order_id(user_id)
+            assert uuid.UUID(order_id).version == 7
+            assert shard_of(order_id, 4) == order_db.shard_for_user(user_id)
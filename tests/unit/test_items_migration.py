@@ -0,0 +1,56 @@
+import sqlite3
+
+from database import OrderDB
+from order_factory import legacy_db
+
+# данные до переноса позиций в order_items: позиции - JSON в orders.items
+LEGACY_ORDERS = [
+    {"id": "order_1", "user_id": "user_1", "items": [
+        {"product_id": "prod_1", "product_name": "Product 1", "quantity": 2, "price": 25.5},
+        {"product_id": "prod_2", "product_name": "Product 2", "quantity": 1, "price": 10.0}
+    ], "status": "created", "total_amount": 61.0, "created_at": "2024-01-01T10:00:00"},
+    {"id": "order_2", "user_id": "user_1", "items": [
+        {"product_id": "prod_2", "product_name": "Product 2", "quantity": 3, "price": 10.0}
+    ], "status": "completed", "total_amount": 30.0, "created_at": "2024-01-02T10:00:00"},
+    {"id": "order_3", "user_id": "user_2", "items": [], "status": "cancelled", "total_amount": 0.0,
+     "created_at": "2024-01-03T10:00:00"}
+]
+for order in LEGACY_ORDERS:
+    order["updated_at"] = order["created_at"]
+
+class TestItemsMigration:
+    
+    def test_1_items_move_to_order_items(self, tmp_path):
+        path = legacy_db(str(tmp_path / "orders.db"), LEGACY_ORDERS)
+        order_db = OrderDB(db_path=path, shards=1)
+        
+        with sqlite3.connect(path) as conn:
+            columns = [column[1] for column in conn.execute("PRAGMA table_info(orders)")]
+            items = conn.execute("SELECT order_id, position, product_id, quantity FROM order_items ORDER BY 1, 2").fetchall()
+        
+        assert "items" not in columns
+        assert items == [("order_1", 0, "prod_1", 2), ("order_1", 1, "prod_2", 1), ("order_2", 0, "prod_2", 3)]
+        
+        for legacy in LEGACY_ORDERS:
+            order = order_db.get_order_by_id(legacy["id"])
+            assert [item.dict() for item in order.items] == legacy["items"]
+            assert order_db.get_order_by_id(legacy["id"], as_dicts=True)["items"] == legacy["items"]
+    
+    def test_2_migrated_orders_are_counted_and_filterable(self, tmp_path):
+        order_db = OrderDB(db_path=legacy_db(str(tmp_path / "orders.db"), LEGACY_ORDERS), shards=1)
+        
+        assert [order.id for order in order_db.get_orders_by_user("user_1", product_filter="prod_2")] == [
+            "order_2", "order_1"
+        ]
+        assert order_db.get_user_orders_count("user_1") == 2
+        assert order_db.get_total_orders_count(status_filter=["created", "completed"]) == 2
+        assert order_db.get_stats_overview()["revenue"] == 91.0
+    
+    def test_3_second_open_is_a_no_op(self, tmp_path):
+        path = legacy_db(str(tmp_path / "orders.db"), LEGACY_ORDERS)
+        OrderDB(db_path=path, shards=1)
+        order_db = OrderDB(db_path=path, shards=1)
+        
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0] == 3
+        assert len(order_db.get_order_by_id("order_1").items) == 2
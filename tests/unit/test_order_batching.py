@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from batching import OrderWriteBatcher
+from order_factory import order_data
+
+def create_concurrently(batcher: OrderWriteBatcher, orders: list) -> list:
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.create_order(order) for order in orders))
+        finally:
+            await batcher.close()
+    
+    return asyncio.run(run())
+
+def count_calls(monkeypatch, order_db, name: str) -> list:
+    calls = []
+    method = getattr(order_db, name)
+    
+    def wrapper(*args):
+        calls.append(args)
+        return method(*args)
+    
+    monkeypatch.setattr(order_db, name, wrapper)
+    return calls
+
+class TestOrderWriteBatcher:
+    
+    def test_1_concurrent_orders_share_one_commit(self, order_db, monkeypatch):
+        bulk_calls = count_calls(monkeypatch, order_db, "create_orders_bulk")
+        batcher = OrderWriteBatcher(order_db, window_ms=50, max_rows=100)
+        orders = [order_data(f"order_{i}") for i in range(10)]
+        
+        created = create_concurrently(batcher, orders)
+        
+        assert [order.id for order in created] == [order["id"] for order in orders]
+        assert len(bulk_calls) == 1
+        assert batcher.stats()["batches"] == 1
+        assert batcher.stats()["rows"] == 10
+        assert order_db.get_user_orders_count("user_1") == 10
+    
+    def test_2_batch_is_limited_by_max_rows(self, order_db, monkeypatch):
+        bulk_calls = count_calls(monkeypatch, order_db, "create_orders_bulk")
+        batcher = OrderWriteBatcher(order_db, window_ms=50, max_rows=4)
+        
+        created = create_concurrently(batcher, [order_data(f"order_{i}") for i in range(10)])
+        
+        assert all(created)
+        assert [len(args[0]) for args in bulk_calls] == [4, 4, 2]
+        assert batcher.stats()["avg_batch"] == round(10 / 3, 2)
+    
+    def test_3_failed_batch_falls_back_to_single_rows(self, order_db, monkeypatch):
+        order_db.create_order(order_data("order_taken"))
+        single_calls = count_calls(monkeypatch, order_db, "create_order")
+        batcher = OrderWriteBatcher(order_db, window_ms=50, max_rows=100)
+        
+        # заказ с занятым id валит транзакцию пачки целиком
+        created = create_concurrently(batcher, [
+            order_data("order_1"), order_data("order_taken"), order_data("order_2")
+        ])
+        
+        assert len(single_calls) == 3
+        assert created[0].id == "order_1"
+        assert created[1] is None
+        assert created[2].id == "order_2"
+        assert order_db.get_user_orders_count("user_1") == 3
+        assert batcher.stats()["batches"] == 1
+    
+    def test_4_writer_error_reaches_every_request(self, order_db, monkeypatch):
+        def broken_bulk(orders_data):
+            raise RuntimeError("writer crashed")
+        
+        monkeypatch.setattr(order_db, "create_orders_bulk", broken_bulk)
+        batcher = OrderWriteBatcher(order_db, window_ms=50, max_rows=100)
+        
+        async def run():
+            try:
+                return await asyncio.gather(
+                    *(batcher.create_order(order_data(f"order_{i}")) for i in range(3)),
+                    return_exceptions=True
+                )
+            finally:
+                await batcher.close()
+        
+        results = asyncio.run(run())
+        
+        assert [str(result) for result in results] == ["writer crashed"] * 3
+        assert batcher.stats()["batches"] == 0
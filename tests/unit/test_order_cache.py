@@ -0,0 +1,81 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import OrderStatus
+from order_factory import START, order_data, seed_orders
+
+@pytest.fixture
+def order_db(order_db):
+    assert order_db.cache.enabled
+    seed_orders(order_db, 3, status=lambda i: OrderStatus.IN_PROGRESS if i == 0 else OrderStatus.CREATED)
+    return order_db
+
+def read(order_db, order_id: str = "order_00") -> tuple:
+    # оба кэшируемых чтения: заказ по id и первая страница владельца
+    order = order_db.get_order_by_id(order_id, as_dicts=True)
+    page = {order["id"]: order["status"] for order in order_db.get_orders_by_user("user_0", 0, 10, as_dicts=True)}
+    return order and order["status"], page
+
+class TestOrderCacheInvalidation:
+    
+    def test_1_reads_are_cached(self, order_db):
+        read(order_db)
+        
+        # запись в обход OrderDB не сбрасывает кэш: чтение отдает сохраненный dict
+        with sqlite3.connect(order_db.db_path) as conn:
+            conn.execute("UPDATE orders SET status = 'completed' WHERE id = 'order_00'")
+        
+        assert read(order_db) == ("in_progress", {"order_02": "created", "order_01": "created", "order_00": "in_progress"})
+    
+    def test_2_status_change(self, order_db):
+        read(order_db)
+        
+        assert order_db.update_order_status("order_00", OrderStatus.COMPLETED)
+        
+        status, page = read(order_db)
+        assert status == page["order_00"] == "completed"
+    
+    def test_3_cancel(self, order_db):
+        read(order_db)
+        
+        assert order_db.update_order_status("order_00", OrderStatus.CANCELLED, 1, "user_0")
+        
+        status, page = read(order_db)
+        assert status == page["order_00"] == "cancelled"
+    
+    def test_4_bulk_status(self, order_db):
+        read(order_db)
+        
+        assert len(order_db.update_orders_status_bulk(OrderStatus.CANCELLED, user_filter="user_0")) == 3
+        
+        status, page = read(order_db)
+        assert status == "cancelled"
+        assert set(page.values()) == {"cancelled"}
+    
+    def test_5_archive(self, order_db):
+        order_db.update_order_status("order_00", OrderStatus.COMPLETED)
+        read(order_db)
+        
+        assert order_db.archive_orders(datetime.utcnow() + timedelta(days=1)) == 1
+        
+        status, page = read(order_db)
+        assert status is None
+        assert "order_00" not in page
+    
+    def test_6_delete(self, order_db):
+        read(order_db)
+        
+        assert order_db.delete_order("order_00")
+        
+        status, page = read(order_db)
+        assert status is None
+        assert sorted(page) == ["order_01", "order_02"]
+    
+    def test_7_create(self, order_db):
+        read(order_db)
+        
+        order_db.create_order(order_data("order_new", "user_0", created_at=START + timedelta(days=1)))
+        
+        assert "order_new" in read(order_db)[1]
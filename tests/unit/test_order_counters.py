@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import ALL_USERS, OrderDB
+from models import OrderStatus
+from order_factory import seed_orders
+
+@pytest.fixture
+def order_db(order_db):
+    seed_orders(order_db, 30, users=3, status=lambda i: OrderStatus.CREATED if i % 4 else OrderStatus.IN_PROGRESS)
+    return order_db
+
+def assert_counters_match(order_db):
+    # счетчики (без нулевых строк) совпадают с COUNT(*) по горячей таблице и архиву
+    with sqlite3.connect(order_db.db_path) as conn:
+        counters = set(conn.execute("SELECT user_id, status, count FROM order_counts WHERE count != 0").fetchall())
+        actual = set(conn.execute("SELECT user_id, status, COUNT(*) FROM orders GROUP BY 1, 2").fetchall())
+        actual |= set(conn.execute(f"SELECT '{ALL_USERS}', status, COUNT(*) FROM orders GROUP BY 2").fetchall())
+        assert counters == actual
+        
+        archived = set(conn.execute("SELECT status, count FROM archive_counts WHERE count != 0").fetchall())
+        assert archived == set(conn.execute("SELECT status, COUNT(*) FROM orders_archive GROUP BY 1").fetchall())
+        
+        for status in OrderStatus:
+            total = conn.execute("SELECT COUNT(*) FROM orders WHERE status = ?", (status.value,)).fetchone()[0]
+            assert order_db.get_total_orders_count(status_filter=[status.value]) == total
+        for user_id in ("user_0", "user_1", "user_2"):
+            total = conn.execute("SELECT COUNT(*) FROM orders WHERE user_id = ?", (user_id,)).fetchone()[0]
+            assert order_db.get_user_orders_count(user_id) == total
+    
+    assert order_db.get_total_orders_count() == sum(count for user_id, _, count in counters if user_id == ALL_USERS)
+
+class TestOrderCounters:
+    
+    def test_1_insert(self, order_db):
+        assert_counters_match(order_db)
+        assert order_db.get_total_orders_count() == 30
+        assert order_db.get_user_orders_count("user_0", ["created", "in_progress"]) == 10
+    
+    def test_2_status_changes(self, order_db):
+        order_db.update_order_status("order_01", OrderStatus.COMPLETED)
+        order_db.update_order_status("order_04", OrderStatus.CANCELLED)
+        # недопустимый переход счетчики не трогает
+        order_db.update_order_status("order_01", OrderStatus.CANCELLED)
+        order_db.update_orders_status_bulk(OrderStatus.COMPLETED, status_filter="in_progress", user_filter="user_2")
+        
+        assert_counters_match(order_db)
+        assert order_db.get_total_orders_count(status_filter=["completed"]) == 1 + 2
+    
+    def test_3_delete(self, order_db):
+        order_db.update_order_status("order_05", OrderStatus.COMPLETED)
+        assert order_db.delete_order("order_05")
+        assert order_db.delete_order("order_06")
+        
+        assert_counters_match(order_db)
+        assert order_db.get_total_orders_count() == 28
+    
+    def test_4_archive(self, order_db):
+        order_db.update_orders_status_bulk(OrderStatus.COMPLETED, order_ids=[f"order_{i:02d}" for i in range(10)])
+        
+        assert order_db.archive_orders(datetime.utcnow() + timedelta(days=1)) == 10
+        
+        assert_counters_match(order_db)
+        assert order_db.get_total_orders_count() == 20
+        assert order_db.get_total_orders_count(include_archived=True) == 30
+        assert order_db.get_total_orders_count(status_filter=["completed"], include_archived=True) == 10
+    
+    def test_5_archive_counts_are_filled_for_existing_archive(self, order_db):
+        order_db.update_orders_status_bulk(OrderStatus.CANCELLED, order_ids=["order_01", "order_02", "order_03"])
+        order_db.archive_orders(datetime.utcnow() + timedelta(days=1))
+        # база, архивированная до появления archive_counts
+        with sqlite3.connect(order_db.db_path) as conn:
+            conn.execute("DROP TABLE archive_counts")
+        
+        reopened = OrderDB(db_path=order_db.db_path, shards=1)
+        
+        assert_counters_match(reopened)
+        assert reopened.get_total_orders_count(status_filter=["cancelled"], include_archived=True) == 3
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from models import OrderItem, OrderResponse, OrderStatus
+from order_factory import seed_orders
+
+START = datetime(2024, 1, 1, 9, 30, 15, 123456)
+
+@pytest.fixture(params=[1, 3], ids=["single", "sharded"])
+def order_shards(request) -> int:
+    return request.param
+
+@pytest.fixture
+def order_db(order_db, order_shards):
+    # order_shards в сигнатуре: иначе pytest не видит параметры за переопределенной order_db
+    seed_orders(
+        order_db, 12, users=4, start=START, step=timedelta(minutes=1),
+        items=lambda i: [
+            OrderItem(product_id=f"prod_{j}", product_name=f"Product {j}", quantity=j + 1, price=9.99 + j)
+            for j in range(i % 3 + 1)
+        ],
+        total_amount=lambda i: 9.99 * (i + 1)
+    )
+    order_db.update_order_status("order_05", OrderStatus.CANCELLED)
+    return order_db
+
+def as_response(order) -> dict:
+    return OrderResponse(**order.dict()).dict()
+
+def assert_same_orders(dicts: list, orders: list):
+    # dict без моделей совпадает с ответом через OrderResponse и в JSON
+    assert dicts == [as_response(order) for order in orders]
+    assert jsonable_encoder(dicts) == jsonable_encoder([OrderResponse(**order.dict()) for order in orders])
+
+class TestOrderDicts:
+    
+    def test_1_get_order_by_id(self, order_db):
+        for order_id in ("order_00", "order_05", "order_11"):
+            order = order_db.get_order_by_id(order_id, as_dicts=True)
+            assert_same_orders([order], [order_db.get_order_by_id(order_id)])
+        
+        assert order_db.get_order_by_id("order_05", as_dicts=True)["updated_at"] > START + timedelta(minutes=5)
+    
+    def test_2_get_orders_by_user(self, order_db):
+        for user_id in ("user_0", "user_1"):
+            assert_same_orders(
+                order_db.get_orders_by_user(user_id, as_dicts=True),
+                order_db.get_orders_by_user(user_id)
+            )
+    
+    def test_3_get_all_orders(self, order_db):
+        assert_same_orders(order_db.get_all_orders(0, 5, as_dicts=True), order_db.get_all_orders(0, 5))
+        assert_same_orders(order_db.get_all_orders(5, 20, as_dicts=True), order_db.get_all_orders(5, 20))
+    
+    def test_4_archived_orders(self, order_db):
+        order_db.update_orders_status_bulk(OrderStatus.IN_PROGRESS, order_ids=["order_01", "order_02"])
+        order_db.update_orders_status_bulk(OrderStatus.COMPLETED, order_ids=["order_01", "order_02"])
+        assert order_db.archive_orders(datetime.utcnow() + timedelta(days=1)) == 3
+        
+        assert_same_orders(
+            [order_db.get_order_by_id("order_02", include_archived=True, as_dicts=True)],
+            [order_db.get_order_by_id("order_02", include_archived=True)]
+        )
+        assert_same_orders(
+            order_db.get_all_orders(0, 20, include_archived=True, as_dicts=True),
+            order_db.get_all_orders(0, 20, include_archived=True)
+        )
+    
+    def test_5_fields_are_subset_of_full_dict(self, order_db):
+        full = order_db.get_order_by_id("order_04", as_dicts=True)
+        
+        assert order_db.get_order_by_id("order_04", as_dicts=True, fields={"id", "status"}) == {
+            "id": full["id"], "status": full["status"]
+        }
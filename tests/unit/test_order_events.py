@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import main
+from events import OrderEventBus, RESET
+
+USER = {"user_id": "user_1", "roles": ["user"]}
+
+class DisconnectedRequest:
+    # клиент отключается сразу после журнала: поток отдает только backlog
+    async def is_disconnected(self) -> bool:
+        return True
+
+def read_stream(bus: OrderEventBus, last_event_id=None) -> list:
+    async def collect():
+        response = await main.stream_order_events(DisconnectedRequest(), USER, last_event_id)
+        return [chunk async for chunk in response.body_iterator]
+    
+    original = main.order_events
+    main.order_events = bus
+    try:
+        chunks = asyncio.run(collect())
+    finally:
+        main.order_events = original
+    
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n") if ": " in line)
+        if "event" in fields:
+            events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+    return events
+
+def publish(bus: OrderEventBus, user_id: str, order_id: str) -> str:
+    return bus.publish(user_id, {"order_id": order_id, "status": "confirmed"})
+
+class TestOrderEventReplay:
+    
+    def test_1_replay_after_last_event_id(self):
+        bus = OrderEventBus()
+        first = publish(bus, "user_1", "order_1")
+        publish(bus, "user_2", "order_2")
+        publish(bus, "user_1", "order_3")
+        
+        assert bus.replay("user_1", None) == []
+        # чужие события в журнале не попадают в replay
+        assert [event["order_id"] for _, event in bus.replay("user_1", first)] == ["order_3"]
+        assert [event["order_id"] for _, event in bus.replay("user_1", bus.event_id(0))] == ["order_1", "order_3"]
+    
+    def test_2_foreign_epoch_cannot_be_replayed(self):
+        bus = OrderEventBus()
+        publish(bus, "user_1", "order_1")
+        
+        assert bus.replay("user_1", "1-1") is None
+        assert bus.replay("user_1", f"{bus.epoch}-abc") is None
+    
+    def test_3_evicted_event_cannot_be_replayed(self):
+        bus = OrderEventBus(log_size=2)
+        first = publish(bus, "user_1", "order_1")
+        second = publish(bus, "user_1", "order_2")
+        publish(bus, "user_1", "order_3")
+        publish(bus, "user_1", "order_4")
+        
+        # order_1 уже вытеснено из журнала: продолжить с него нельзя
+        assert bus.replay("user_1", first) is None
+        assert [event["order_id"] for _, event in bus.replay("user_1", second)] == ["order_3", "order_4"]
+    
+    def test_4_queue_overflow_resets_subscriber(self):
+        bus = OrderEventBus(queue_size=2)
+        queue = bus.subscribe("user_1")
+        other = bus.subscribe("user_2")
+        for i in range(3):
+            publish(bus, "user_1", f"order_{i}")
+        
+        # переполненная очередь сбрасывается до одного RESET с последним seq
+        assert queue.qsize() == 1
+        assert queue.get_nowait() == (3, RESET)
+        assert other.empty()
+        
+        bus.unsubscribe("user_1", queue)
+        publish(bus, "user_1", "order_4")
+        assert queue.empty()
+
+class TestOrderEventStream:
+    
+    def test_1_stream_replays_backlog(self):
+        bus = OrderEventBus()
+        first = publish(bus, "user_1", "order_1")
+        publish(bus, "user_1", "order_2")
+        third = publish(bus, "user_1", "order_3")
+        
+        events = read_stream(bus, first)
+        
+        assert [(event_id, name) for event_id, name, _ in events] == [
+            (bus.event_id(2), "status"), (third, "status")
+        ]
+        assert [data["order_id"] for _, _, data in events] == ["order_2", "order_3"]
+        # отключившийся клиент отписывается
+        assert "user_1" not in bus._subscribers
+    
+    def test_2_stream_resets_unknown_history(self):
+        bus = OrderEventBus()
+        publish(bus, "user_1", "order_1")
+        
+        events = read_stream(bus, "1-1")
+        
+        assert events == [(bus.event_id(0), "reset", {"reason": "history unavailable"})]
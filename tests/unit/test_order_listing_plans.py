@@ -0,0 +1,130 @@
+import sqlite3
+from datetime import timedelta
+
+import pytest
+
+from database import OrderDB
+from models import OrderStatus
+from order_factory import START, seed_orders
+
+STATUSES = list(OrderStatus)
+
+@pytest.fixture(scope="module")
+def order_db(tmp_path_factory):
+    db = OrderDB(db_path=str(tmp_path_factory.mktemp("plans") / "orders.db"))
+    seed_orders(db, 2000, users=20, status=lambda i: STATUSES[i % len(STATUSES)])
+    return db
+
+@pytest.fixture
+def statements(order_db, monkeypatch):
+    # SQL с подставленными параметрами - ровно то, что выполнил метод
+    executed = []
+    get_connection = order_db.get_connection
+    
+    def traced_connection(shard: int = 0):
+        conn = get_connection(shard)
+        conn.set_trace_callback(executed.append)
+        return conn
+    
+    monkeypatch.setattr(order_db, "get_connection", traced_connection)
+    return executed
+
+def query_plan(order_db, statements, table: str = "orders") -> list:
+    # план первого SELECT по table из выполненных методом запросов
+    sql = next(sql for sql in statements if sql.lstrip().startswith("SELECT") and f"FROM {table}" in sql)
+    with sqlite3.connect(order_db.db_path) as conn:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+def assert_index_range(plan: list, index: str):
+    assert any(step.startswith("SEARCH") and index in step and "created_at>" in step for step in plan), plan
+    assert not any(step.startswith("SCAN orders") for step in plan), plan
+
+class TestOrderListingFilters:
+    
+    def test_1_user_multi_status_and_range(self, order_db, statements):
+        created_from, created_to = START + timedelta(days=10), START + timedelta(days=20)
+        orders = order_db.get_orders_by_user(
+            "user_1", 0, 100, ["created", "in_progress"],
+            created_from=created_from, created_to=created_to, as_dicts=True
+        )
+        
+        assert orders
+        assert {order["status"] for order in orders} <= {"created", "in_progress"}
+        assert all(created_from <= order["created_at"] <= created_to for order in orders)
+        assert_index_range(query_plan(order_db, statements), "idx_orders_user_")
+    
+    def test_2_user_single_status_uses_status_index(self, order_db, statements):
+        order_db.get_orders_by_user(
+            "user_1", 0, 10, ["completed"], created_from=START + timedelta(days=5), as_dicts=True
+        )
+        
+        assert_index_range(query_plan(order_db, statements), "idx_orders_user_status_created")
+    
+    def test_3_admin_multi_status_and_range(self, order_db, statements):
+        created_from, created_to = START + timedelta(days=10), START + timedelta(days=12)
+        orders = order_db.get_all_orders(
+            0, 100, status_filter=["created", "cancelled"],
+            created_from=created_from, created_to=created_to, as_dicts=True
+        )
+        
+        expected = [
+            order for order in order_db.get_all_orders(0, 2000, as_dicts=True)
+            if order["status"] in ("created", "cancelled")
+            and created_from <= order["created_at"] <= created_to
+        ]
+        assert [order["id"] for order in orders] == [order["id"] for order in expected]
+        assert_index_range(query_plan(order_db, statements), "idx_orders_")
+    
+    def test_4_admin_range_only(self, order_db, statements):
+        order_db.get_all_orders(0, 10, created_from=START + timedelta(days=30), as_dicts=True)
+        
+        assert_index_range(query_plan(order_db, statements), "idx_orders_created")
+    
+    def test_5_archived_listing_searches_both_tables(self, order_db, statements):
+        order_db.get_orders_by_user(
+            "user_2", 0, 10, ["completed", "cancelled"], include_archived=True,
+            created_from=START + timedelta(days=10), as_dicts=True
+        )
+        
+        plan = query_plan(order_db, statements)
+        assert_index_range(plan, "idx_orders_user_")
+        assert_index_range(plan, "idx_orders_archive_user_created")
+        assert not any(step.startswith("SCAN orders_archive") for step in plan), plan
+    
+    def test_6_counts_with_range(self, order_db, statements):
+        created_from = START + timedelta(days=40)
+        total = order_db.get_total_orders_count(status_filter=["created", "in_progress"], created_from=created_from)
+        
+        assert_index_range(query_plan(order_db, statements), "idx_orders_")
+        assert total == len([
+            order for order in order_db.get_all_orders(0, 2000, as_dicts=True)
+            if order["status"] in ("created", "in_progress") and order["created_at"] >= created_from
+        ])
+        assert order_db.get_user_orders_count("user_3", ["created", "in_progress"], created_from=created_from) == len(
+            order_db.get_orders_by_user("user_3", 0, 2000, ["created", "in_progress"], created_from=created_from)
+        )
+    
+    def test_7_keyset_pages_keep_filters(self, order_db):
+        filters = {"status_filter": ["created", "in_progress"], "created_from": START + timedelta(days=15)}
+        expected = order_db.get_all_orders(0, 2000, as_dicts=True, **filters)
+        
+        pages = []
+        after = None
+        while True:
+            page = order_db.get_all_orders(0, 50, after=after, as_dicts=True, **filters)
+            if not page:
+                break
+            pages.extend(page)
+            after = (page[-1]["created_at"], page[-1]["id"])
+        
+        assert [order["id"] for order in pages] == [order["id"] for order in expected]
+    
+    def test_8_archived_counts(self, order_db, statements):
+        # только по статусу архив считают счетчики, с диапазоном - индекс по статусу
+        order_db.get_total_orders_count(include_archived=True, status_filter=["completed", "cancelled"])
+        assert not any("orders_archive" in sql for sql in statements), statements
+        
+        order_db.get_total_orders_count(
+            include_archived=True, status_filter=["completed"], created_from=START + timedelta(days=10)
+        )
+        assert_index_range(query_plan(order_db, statements, "orders_archive"), "idx_orders_archive_status_created")
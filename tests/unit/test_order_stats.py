@@ -0,0 +1,132 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import OrderDB
+from models import OrderStatus
+from order_factory import order_data, seed_orders
+
+START = datetime(2024, 3, 1)
+
+@pytest.fixture
+def order_db(order_db):
+    # 12 заказов, 4 в день; у user_i сумма заказа 10 * (i + 1)
+    seed_orders(order_db, 12, users=3, start=START, step=timedelta(hours=6), total_amount=lambda i: 10.0 * (i % 3 + 1))
+    return order_db
+
+def snapshot(order_db) -> tuple:
+    return (
+        order_db.get_stats_overview(),
+        order_db.get_daily_stats("2024-01-01", "2024-12-31"),
+        order_db.get_top_spenders(10)
+    )
+
+class TestOrderStats:
+    
+    def test_1_summaries_after_insert(self, order_db):
+        overview, days, spenders = snapshot(order_db)
+        
+        assert overview == {
+            "total_orders": 12,
+            "orders_by_status": {"created": 12, "in_progress": 0, "completed": 0, "cancelled": 0},
+            "revenue": 240.0
+        }
+        assert days == [
+            {"day": "2024-03-01", "orders": 4, "revenue": 70.0},
+            {"day": "2024-03-02", "orders": 4, "revenue": 80.0},
+            {"day": "2024-03-03", "orders": 4, "revenue": 90.0}
+        ]
+        assert spenders[0] == {"user_id": "user_2", "orders": 4, "total_spent": 120.0}
+    
+    def test_2_status_change_and_cancel(self, order_db):
+        order_db.update_order_status("order_00", OrderStatus.COMPLETED)
+        order_db.update_order_status("order_02", OrderStatus.IN_PROGRESS)
+        order_db.update_order_status("order_02", OrderStatus.CANCELLED)
+        order_db.update_orders_status_bulk(OrderStatus.CANCELLED, order_ids=["order_05"])
+        
+        overview, days, spenders = snapshot(order_db)
+        
+        assert overview["orders_by_status"] == {"created": 9, "in_progress": 0, "completed": 1, "cancelled": 2}
+        assert overview["total_orders"] == 12
+        # отмененные заказы (30.0 и 30.0) не входят в выручку и траты
+        assert overview["revenue"] == 180.0
+        assert days[0] == {"day": "2024-03-01", "orders": 4, "revenue": 40.0}
+        assert days[1] == {"day": "2024-03-02", "orders": 4, "revenue": 50.0}
+        assert spenders[0] == {"user_id": "user_1", "orders": 4, "total_spent": 80.0}
+        assert {"user_id": "user_2", "orders": 2, "total_spent": 60.0} in spenders
+    
+    def test_3_archive_keeps_totals(self, order_db):
+        order_db.update_orders_status_bulk(OrderStatus.COMPLETED, order_ids=["order_00", "order_01"])
+        order_db.update_order_status("order_02", OrderStatus.CANCELLED)
+        before = snapshot(order_db)
+        
+        assert order_db.archive_orders(datetime.utcnow() + timedelta(days=1)) == 3
+        
+        assert snapshot(order_db) == before
+    
+    def test_4_rebuild_matches_triggers(self, order_db):
+        order_db.update_order_status("order_03", OrderStatus.CANCELLED)
+        order_db.update_order_status("order_04", OrderStatus.COMPLETED)
+        order_db.archive_orders(datetime.utcnow() + timedelta(days=1))
+        expected = snapshot(order_db)
+        
+        with sqlite3.connect(order_db.db_path) as conn:
+            conn.execute("UPDATE order_daily_stats SET orders_count = 0, revenue = 0")
+            conn.execute("DELETE FROM user_spend_stats")
+        assert snapshot(order_db) != expected
+        
+        assert order_db.rebuild_stats()
+        assert snapshot(order_db) == expected
+    
+    def test_5_rebuild_after_delete(self, order_db):
+        order_db.delete_order("order_00")
+        # удаление меняет счетчики по статусам сразу, выручку - после пересчета
+        assert order_db.get_stats_overview()["total_orders"] == 11
+        assert order_db.get_stats_overview()["revenue"] == 240.0
+        
+        order_db.rebuild_stats()
+        
+        assert order_db.get_stats_overview()["revenue"] == 230.0
+        assert order_db.get_daily_stats("2024-03-01", "2024-03-01") == [{"day": "2024-03-01", "orders": 3, "revenue": 60.0}]
+    
+    def test_6_status_stats_table_is_dropped(self, tmp_path):
+        # база с прежней копией счетчиков по статусам в order_status_stats
+        path = str(tmp_path / "legacy.db")
+        OrderDB(db_path=path, shards=1)
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE order_status_stats (status TEXT PRIMARY KEY, orders_count INTEGER NOT NULL) WITHOUT ROWID")
+            trigger = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'order_stats_ai'").fetchone()[0]
+            conn.execute("DROP TRIGGER order_stats_ai")
+            conn.execute(trigger.replace("BEGIN", "BEGIN INSERT INTO order_status_stats (status, orders_count) VALUES (new.status, 1) ON CONFLICT (status) DO UPDATE SET orders_count = orders_count + 1;", 1))
+            conn.execute("CREATE TRIGGER order_stats_au AFTER UPDATE OF status ON orders BEGIN UPDATE order_status_stats SET orders_count = orders_count - 1 WHERE status = old.status; END")
+        
+        order_db = OrderDB(db_path=path, shards=1)
+        order_db.create_order(order_data("order_1", created_at=START))
+        order_db.update_order_status("order_1", OrderStatus.COMPLETED)
+        
+        with sqlite3.connect(path) as conn:
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+        assert "order_status_stats" not in names and "order_stats_au" not in names
+        assert "order_stats_ai" in names
+        assert order_db.get_stats_overview()["orders_by_status"]["completed"] == 1
+        assert order_db.get_daily_stats("2024-03-01", "2024-03-01") == [{"day": "2024-03-01", "orders": 1, "revenue": 10.0}]
+    
+    def test_7_overview_reads_only_counters(self, order_db, monkeypatch):
+        order_db.update_orders_status_bulk(OrderStatus.CANCELLED, order_ids=["order_00", "order_01"])
+        order_db.archive_orders(datetime.utcnow() + timedelta(days=1))
+        
+        executed = []
+        get_connection = order_db.get_connection
+        
+        def traced_connection(shard: int = 0):
+            conn = get_connection(shard)
+            conn.set_trace_callback(executed.append)
+            return conn
+        
+        monkeypatch.setattr(order_db, "get_connection", traced_connection)
+        overview = order_db.get_stats_overview()
+        
+        assert overview["orders_by_status"] == {"created": 10, "in_progress": 0, "completed": 0, "cancelled": 2}
+        assert overview["total_orders"] == 12
+        assert not any("FROM orders" in sql for sql in executed), executed
@@ -0,0 +1,422 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from idempotency import IdempotencyStore
+from models import OrderStatus
+from order_factory import ITEMS, seed_orders
+from responses import dumps
+
+USER = {"user_id": "user_1", "roles": ["user"]}
+OTHER_USER = {"user_id": "user_2", "roles": ["user"]}
+ADMIN = {"user_id": "admin_1", "roles": ["admin"]}
+
+@pytest.fixture
+def order_db(order_db, monkeypatch):
+    monkeypatch.setattr(main, "order_db", order_db)
+    monkeypatch.setattr(main, "order_idempotency", IdempotencyStore(order_db))
+    return order_db
+
+@pytest.fixture
+def client(order_db):
+    login(USER)
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+def login(user: dict):
+    main.app.dependency_overrides[main.verify_token] = lambda: user
+
+def item(product_id: str = "prod_1", quantity: int = 1, price: float = 10.0) -> dict:
+    return {"product_id": product_id, "product_name": f"Product {product_id}", "quantity": quantity, "price": price}
+
+def create_order(client, *items) -> dict:
+    response = client.post("/v1/orders", json={"items": list(items) or [item()]})
+    return response.json()["data"]
+
+class TestOrdersBulkCreate:
+    
+    def test_1_valid_orders_are_created_invalid_reported(self, client, order_db):
+        response = client.post("/v1/orders/bulk", json={"orders": [
+            {"items": [item("prod_1", 2, 25.5)]},
+            {"items": []},
+            {"items": [item("prod_2", 0)]},
+            {"items": [item("prod_2", 1, 10.0), item("prod_3", 3, 1.0)]}
+        ]})
+        
+        body = response.json()
+        assert body["success"] == True
+        assert body["data"]["created"] == 2
+        assert body["data"]["failed"] == 2
+        
+        results = body["data"]["results"]
+        assert [result["index"] for result in results] == [0, 1, 2, 3]
+        assert results[1]["error"]["code"] == results[2]["error"]["code"] == "INVALID_ORDER"
+        assert "quantity" in results[2]["error"]["message"]
+        assert [results[0]["total_amount"], results[3]["total_amount"]] == [51.0, 13.0]
+        
+        orders = order_db.get_orders_by_user("user_1")
+        assert sorted(order.id for order in orders) == sorted([results[0]["id"], results[3]["id"]])
+        assert len(order_db.get_order_by_id(results[3]["id"]).items) == 2
+        assert order_db.get_user_orders_count("user_1") == 2
+    
+    def test_2_nothing_valid(self, client, order_db):
+        body = client.post("/v1/orders/bulk", json={"orders": [{"items": []}, {"foo": 1}]}).json()
+        
+        assert body["success"] == False
+        assert body["data"]["created"] == 0
+        assert body["data"]["failed"] == 2
+        assert order_db.get_user_orders_count("user_1") == 0
+    
+    def test_3_batch_size_limit(self, client):
+        response = client.post("/v1/orders/bulk", json={"orders": [{"items": [item()]}] * 501})
+        
+        assert response.status_code == 422
+
+class TestOrdersIdempotentCreate:
+    
+    def test_1_repeated_key_is_replayed(self, client, order_db):
+        request = {"json": {"items": [item()]}, "headers": {"Idempotency-Key": "key_1"}}
+        
+        first = client.post("/v1/orders", **request)
+        second = client.post("/v1/orders", **request)
+        
+        assert "idempotent-replayed" not in first.headers
+        assert second.headers["idempotent-replayed"] == "true"
+        assert second.json() == first.json()
+        assert order_db.get_user_orders_count("user_1") == 1
+    
+    def test_2_key_taken_by_another_worker(self, client, order_db, monkeypatch):
+        # другой воркер занимает ключ между проверкой ключа и вставкой заказа этим воркером
+        insert_order = main.insert_order
+        
+        async def racing_insert(new_order: dict):
+            response = {**json.loads(new_order["idempotency"]["response"]), "id": "order_other"}
+            order_db.create_order({
+                **new_order, "id": "order_other",
+                "idempotency": {**new_order["idempotency"], "response": json.dumps(response)}
+            })
+            return await insert_order(new_order)
+        
+        monkeypatch.setattr(main, "insert_order", racing_insert)
+        
+        response = client.post("/v1/orders", json={"items": [item()]}, headers={"Idempotency-Key": "key_1"})
+        
+        assert response.headers["idempotent-replayed"] == "true"
+        assert response.json()["data"]["id"] == "order_other"
+        assert order_db.get_user_orders_count("user_1") == 1
+
+class TestOrdersBulkStatus:
+    
+    def test_1_by_ids(self, client, order_db):
+        created = [create_order(client)["id"] for _ in range(3)]
+        order_db.update_order_status(created[2], OrderStatus.CANCELLED)
+        events = main.order_events.subscribe("user_1")
+        
+        login(ADMIN)
+        body = client.put("/v1/admin/orders/status", json={
+            "ids": created + ["order_missing"], "status": "completed"
+        }).json()
+        
+        # отмененный заказ завершить нельзя, несуществующий не найден
+        assert body["success"] == True
+        assert body["data"]["updated"] == 2
+        assert body["data"]["failed"] == [created[2], "order_missing"]
+        assert [order_db.get_order_by_id(order_id).status for order_id in created] == ["completed", "completed", "cancelled"]
+        assert order_db.get_order_by_id(created[0]).version == 2
+        
+        published = [events.get_nowait()[1] for _ in range(events.qsize())]
+        main.order_events.unsubscribe("user_1", events)
+        assert sorted(event["order_id"] for event in published) == sorted(created[:2])
+        assert {event["status"] for event in published} == {"completed"}
+    
+    def test_2_by_filter(self, client, order_db):
+        mine = [create_order(client)["id"] for _ in range(2)]
+        login(OTHER_USER)
+        other = create_order(client)["id"]
+        order_db.update_order_status(mine[0], OrderStatus.IN_PROGRESS)
+        
+        login(ADMIN)
+        body = client.put("/v1/admin/orders/status", json={
+            "filter": {"user_id": "user_1", "status": "created"}, "status": "cancelled"
+        }).json()
+        
+        assert body["data"]["updated"] == 1
+        assert order_db.get_order_by_id(mine[1]).status == "cancelled"
+        assert order_db.get_order_by_id(mine[0]).status == "in_progress"
+        assert order_db.get_order_by_id(other).status == "created"
+    
+    def test_3_ids_or_filter_required(self, client):
+        login(ADMIN)
+        
+        for selection in ({}, {"filter": {}}, {"ids": ["order_1"], "filter": {"status": "created"}}):
+            body = client.put("/v1/admin/orders/status", json={**selection, "status": "completed"}).json()
+            assert body["error"]["code"] == "INVALID_SELECTION"
+
+class TestOrderStatusTransitions:
+    
+    def test_1_version_increments_on_success(self, client):
+        order = create_order(client)
+        assert order["version"] == 1
+        
+        response = client.put(f"/v1/orders/{order['id']}/status", json={"status": "in_progress"}, headers={"If-Match": '"1"'})
+        assert response.json()["data"]["version"] == 2
+        assert response.headers["ETag"] == '"2"'
+        
+        response = client.put(f"/v1/orders/{order['id']}/status", json={"status": "completed"}, headers={"If-Match": 'W/"2"'})
+        assert response.json()["data"]["status"] == "completed"
+        assert response.json()["data"]["version"] == 3
+        assert client.get(f"/v1/orders/{order['id']}").headers["ETag"] == '"3"'
+    
+    def test_2_stale_if_match_is_version_conflict(self, client, order_db):
+        order = create_order(client)
+        client.put(f"/v1/orders/{order['id']}/status", json={"status": "in_progress"})
+        
+        body = client.put(f"/v1/orders/{order['id']}/status", json={"status": "completed"}, headers={"If-Match": '"1"'}).json()
+        
+        assert body["success"] == False
+        assert body["error"]["code"] == "VERSION_CONFLICT"
+        assert order_db.get_order_by_id(order["id"]).status == "in_progress"
+        
+        body = client.delete(f"/v1/orders/{order['id']}", headers={"If-Match": '"1"'}).json()
+        assert body["error"]["code"] == "VERSION_CONFLICT"
+    
+    def test_3_bad_if_match(self, client, order_db):
+        order = create_order(client)
+        
+        for if_match in ('"abc"', "W/", "1.5"):
+            body = client.put(f"/v1/orders/{order['id']}/status", json={"status": "completed"}, headers={"If-Match": if_match}).json()
+            assert body["error"]["code"] == "INVALID_IF_MATCH"
+        
+        assert client.delete(f"/v1/orders/{order['id']}", headers={"If-Match": "x"}).json()["error"]["code"] == "INVALID_IF_MATCH"
+        assert order_db.get_order_by_id(order["id"]).version == 1
+    
+    def test_4_any_version(self, client):
+        order = create_order(client)
+        
+        body = client.put(f"/v1/orders/{order['id']}/status", json={"status": "completed"}, headers={"If-Match": "*"}).json()
+        
+        assert body["data"]["version"] == 2
+    
+    def test_5_disallowed_transition(self, client, order_db):
+        order = create_order(client)
+        client.put(f"/v1/orders/{order['id']}/status", json={"status": "completed"})
+        
+        body = client.put(f"/v1/orders/{order['id']}/status", json={"status": "in_progress"}, headers={"If-Match": '"2"'}).json()
+        
+        assert body["error"]["code"] == "INVALID_TRANSITION"
+        assert order_db.get_order_by_id(order["id"]).version == 2
+    
+    def test_6_cancel_twice(self, client):
+        order = create_order(client)
+        
+        assert client.delete(f"/v1/orders/{order['id']}").json()["data"]["status"] == "cancelled"
+        assert client.delete(f"/v1/orders/{order['id']}").json()["error"]["code"] == "ALREADY_CANCELLED"
+    
+    def test_7_conditional_update_checks_owner(self, client, order_db):
+        order = create_order(client)
+        
+        assert order_db.update_order_status(order["id"], OrderStatus.COMPLETED, owner_id="user_2") is None
+        assert order_db.update_order_status(order["id"], OrderStatus.COMPLETED, expected_version=2) is None
+        assert order_db.update_order_status(order["id"], OrderStatus.COMPLETED, 1, "user_1").version == 2
+        assert order_db.update_order_status("order_missing", OrderStatus.COMPLETED) is None
+
+class TestOrdersExport:
+    
+    def test_1_ndjson(self, client):
+        created = [create_order(client, item("prod_1", 2, 5.0))["id"] for _ in range(3)]
+        login(ADMIN)
+        
+        response = client.get("/v1/admin/orders/export")
+        
+        orders = [json.loads(line) for line in response.text.splitlines()]
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert [order["id"] for order in orders] == created
+        assert orders[0]["items"] == [item("prod_1", 2, 5.0)]
+    
+    def test_2_database_error_aborts_stream(self, client, order_db, monkeypatch):
+        create_order(client)
+        login(ADMIN)
+        
+        export = order_db.iter_orders_export
+        
+        def failing_export(*args, **kwargs):
+            yield from export(*args, **kwargs)
+            raise sqlite3.OperationalError("disk I/O error")
+        
+        monkeypatch.setattr(order_db, "iter_orders_export", failing_export)
+        
+        # ошибка не глотается: ответ обрывается, а не завершается как полный
+        with pytest.raises(sqlite3.OperationalError):
+            client.get("/v1/admin/orders/export")
+    
+    def test_3_shard_error_is_raised(self, client, order_db):
+        create_order(client)
+        with sqlite3.connect(order_db.db_path) as conn:
+            conn.execute("DROP TABLE order_items")
+        
+        with pytest.raises(sqlite3.OperationalError):
+            list(order_db.iter_orders_export())
+    
+    def test_4_csv(self, client):
+        created = create_order(client, item("prod_1", 2, 5.0), item("prod_2"))
+        login(ADMIN)
+        
+        response = client.get("/v1/admin/orders/export", params={"format": "csv"})
+        
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert response.headers["content-type"].startswith("text/csv")
+        assert [row["id"] for row in rows] == [created["id"]]
+        # позиции - компактный JSON общего кодировщика ответов
+        assert rows[0]["items"] == dumps([item("prod_1", 2, 5.0), item("prod_2")]).decode()
+    
+    def test_5_archived_orders_are_merged_in_order(self, order_db):
+        seed_orders(order_db, 6, status=lambda i: OrderStatus.COMPLETED if i % 2 else OrderStatus.CREATED)
+        assert order_db.archive_orders(datetime.utcnow() + timedelta(days=1)) == 3
+        
+        orders = list(order_db.iter_orders_export(batch_size=2, include_archived=True))
+        
+        assert [order["id"] for order in orders] == [f"order_{i:02d}" for i in range(6)]
+        assert all(order["items"] == [item.dict() for item in ITEMS] for order in orders)
+        assert [order["id"] for order in order_db.iter_orders_export("completed", include_archived=True)] == [
+            "order_01", "order_03", "order_05"
+        ]
+
+def archive_completed(client, order_db) -> tuple:
+    orders = [create_order(client) for _ in range(3)]
+    archived = orders[0]
+    client.put(f"/v1/orders/{archived['id']}/status", json={"status": "in_progress"})
+    client.put(f"/v1/orders/{archived['id']}/status", json={"status": "completed"})
+    
+    assert order_db.archive_orders(datetime.utcnow() + timedelta(days=1)) == 1
+    return archived, [order["id"] for order in orders[1:]]
+
+class TestOrdersArchive:
+    
+    def test_1_archived_order_leaves_live_listing_and_counters(self, client, order_db):
+        archived, live_ids = archive_completed(client, order_db)
+        
+        data = client.get("/v1/orders").json()["data"]
+        assert sorted(order["id"] for order in data["orders"]) == sorted(live_ids)
+        assert data["pagination"]["total"] == 2
+        assert order_db.get_user_orders_count("user_1") == 2
+        assert order_db.get_user_orders_count("user_1", [OrderStatus.COMPLETED.value]) == 0
+        assert order_db.get_total_orders_count() == 2
+        
+        body = client.get(f"/v1/orders/{archived['id']}").json()
+        assert body["error"]["code"] == "ORDER_NOT_FOUND"
+    
+    def test_2_include_archived_returns_archived_order(self, client, order_db):
+        archived, live_ids = archive_completed(client, order_db)
+        
+        data = client.get("/v1/orders?include_archived=true").json()["data"]
+        assert sorted(order["id"] for order in data["orders"]) == sorted(live_ids + [archived["id"]])
+        assert data["pagination"]["total"] == 3
+        
+        data = client.get("/v1/orders", params={"include_archived": "true", "status": "completed"}).json()["data"]
+        assert [order["id"] for order in data["orders"]] == [archived["id"]]
+        assert data["pagination"]["total"] == 1
+        
+        order = client.get(f"/v1/orders/{archived['id']}?include_archived=true").json()["data"]
+        assert order["status"] == "completed"
+        assert order["items"][0]["product_id"] == "prod_1"
+        
+        login(ADMIN)
+        data = client.get("/v1/admin/orders?include_archived=true").json()["data"]
+        assert data["pagination"]["total"] == 3
+        assert client.get("/v1/admin/orders").json()["data"]["pagination"]["total"] == 2
+
+class TestOrdersFields:
+    
+    def test_1_order_projection(self, client):
+        order = create_order(client, item("prod_1", 2, 5.0))
+        
+        response = client.get(f"/v1/orders/{order['id']}", params={"fields": "id,status"})
+        
+        # версия читается для ETag, но в ответ не попадает
+        assert response.json()["data"] == {"id": order["id"], "status": "created"}
+        assert response.headers["ETag"] == '"1"'
+    
+    def test_2_listing_projection_keeps_cursor(self, client):
+        ids = [create_order(client)["id"] for _ in range(3)]
+        
+        data = client.get("/v1/orders", params={"fields": "status,total_amount", "limit": 2}).json()["data"]
+        assert data["orders"] == [{"status": "created", "total_amount": 10.0}] * 2
+        
+        # курсор строится по created_at и id, которых нет в ответе
+        cursor = data["pagination"]["next_cursor"]
+        data = client.get("/v1/orders", params={"fields": "id", "limit": 2, "cursor": cursor}).json()["data"]
+        assert len(data["orders"]) == 1
+        assert data["orders"][0]["id"] in ids
+        
+        login(ADMIN)
+        data = client.get("/v1/admin/orders", params={"fields": "user_id"}).json()["data"]
+        assert data["orders"] == [{"user_id": "user_1"}] * 3
+    
+    def test_3_unknown_fields_are_rejected(self, client):
+        order = create_order(client)
+        
+        for fields in ("id,password", ",", "items,Status"):
+            body = client.get("/v1/orders", params={"fields": fields}).json()
+            assert body["success"] == False
+            assert body["error"]["code"] == "INVALID_FIELDS"
+        
+        body = client.get(f"/v1/orders/{order['id']}", params={"fields": "owner"}).json()
+        assert body["error"]["code"] == "INVALID_FIELDS"
+
+class TestOrdersStatusPoll:
+    
+    def test_1_statuses_and_missing_ids(self, client):
+        first, second = create_order(client), create_order(client)
+        client.put(f"/v1/orders/{second['id']}/status", json={"status": "in_progress"})
+        
+        data = client.get("/v1/orders/status", params={"ids": [first["id"], f"{second['id']},order_unknown"]}).json()["data"]
+        
+        assert {order["id"]: order["status"] for order in data["orders"]} == {
+            first["id"]: "created", second["id"]: "in_progress"
+        }
+        assert data["missing"] == ["order_unknown"]
+    
+    def test_2_updated_since_returns_only_changed(self, client):
+        first, second = create_order(client), create_order(client)
+        response = client.put(f"/v1/orders/{first['id']}/status", json={"status": "in_progress"})
+        updated_at = response.json()["data"]["updated_at"]
+        
+        data = client.get("/v1/orders/status", params={"ids": [first["id"], second["id"]], "updated_since": second["updated_at"]}).json()["data"]
+        assert data["orders"] == [{"id": first["id"], "status": "in_progress", "updated_at": updated_at}]
+        assert data["missing"] == []
+        
+        # заказ без изменений найден, но не возвращается и не считается пропавшим
+        data = client.get("/v1/orders/status", params={"ids": [first["id"], second["id"]], "updated_since": updated_at}).json()["data"]
+        assert data == {"orders": [], "missing": []}
+    
+    def test_3_foreign_orders_are_missing(self, client):
+        own = create_order(client)
+        login(OTHER_USER)
+        foreign = create_order(client)
+        
+        login(USER)
+        data = client.get("/v1/orders/status", params={"ids": f"{own['id']},{foreign['id']}"}).json()["data"]
+        assert [order["id"] for order in data["orders"]] == [own["id"]]
+        assert data["missing"] == [foreign["id"]]
+        
+        login(ADMIN)
+        data = client.get("/v1/orders/status", params={"ids": f"{own['id']},{foreign['id']}"}).json()["data"]
+        assert sorted(order["id"] for order in data["orders"]) == sorted([own["id"], foreign["id"]])
+    
+    def test_4_invalid_ids(self, client, monkeypatch):
+        monkeypatch.setattr(main, "STATUS_POLL_MAX_IDS", 2)
+        
+        for ids in (",", "order_1,order_2,order_3"):
+            body = client.get("/v1/orders/status", params={"ids": ids}).json()
+            assert body["success"] == False
+            assert body["error"]["code"] == "INVALID_IDS"
+        
+        # повторы не считаются дважды
+        body = client.get("/v1/orders/status", params={"ids": "order_1,order_1,order_2"}).json()
+        assert body["data"]["missing"] == ["order_1", "order_2"]
@@ -0,0 +1,52 @@
+import argparse
+import os
+
+import pytest
+
+import manage
+from database import OrderDB
+from models import OrderStatus
+from order_factory import ITEMS, seed_orders
+
+@pytest.fixture
+def order_db(order_db):
+    seed_orders(order_db, 20, users=5)
+    return order_db
+
+def reshard(monkeypatch, source: OrderDB, shards: int) -> int:
+    monkeypatch.setattr(manage, "order_db", source)
+    return manage.reshard(argparse.Namespace(shards=shards, batch_size=7))
+
+class TestReshard:
+    
+    def test_1_orders_are_moved_to_new_layout(self, order_db, monkeypatch):
+        assert reshard(monkeypatch, order_db, 2) == 0
+        
+        target = OrderDB(db_path=order_db.db_path, shards=2)
+        assert target.count_stored_orders() == 20
+        assert target.get_total_orders_count() == 20
+        for i in range(5):
+            assert target.get_user_orders_count(f"user_{i}") == 4
+        assert target.get_order_by_id("order_07").items == ITEMS
+    
+    def test_2_round_trip_refuses_stale_target(self, order_db, monkeypatch):
+        assert reshard(monkeypatch, order_db, 2) == 0
+        sharded = OrderDB(db_path=order_db.db_path, shards=2)
+        assert sharded.update_order_status("order_03", OrderStatus.IN_PROGRESS)
+        assert sharded.update_order_status("order_03", OrderStatus.COMPLETED)
+        
+        # исходный orders.db все еще лежит на месте со старым статусом order_03
+        assert reshard(monkeypatch, sharded, 1) == 1
+        assert order_db.get_order_by_id("order_03").status == OrderStatus.CREATED
+        
+        os.remove(order_db.db_path)
+        assert reshard(monkeypatch, sharded, 1) == 0
+        
+        merged = OrderDB(db_path=order_db.db_path, shards=1)
+        assert merged.get_order_by_id("order_03").status == OrderStatus.COMPLETED
+        assert merged.get_total_orders_count() == 20
+        assert merged.get_total_orders_count(status_filter=[OrderStatus.COMPLETED.value]) == 1
+        assert merged.get_stats_overview()["orders_by_status"][OrderStatus.COMPLETED.value] == 1
+    
+    def test_3_same_shard_count_is_rejected(self, order_db, monkeypatch):
+        assert reshard(monkeypatch, order_db, 1) == 1
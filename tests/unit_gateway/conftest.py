@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# общий хук лежит в tests/: при запуске из этого каталога pytest не добавляет его в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service_modules import isolate_service  # noqa: E402
+
+# запросы к сервисам за шлюзом подменяются транспортом httpx
+pytest_collectstart = isolate_service("api_gateway")
+
+@pytest.fixture(scope="session", autouse=True)
+def check_services():
+    """Сервисы для юнит-тестов не нужны"""
+    yield
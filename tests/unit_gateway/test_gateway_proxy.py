@@ -0,0 +1,105 @@
+import asyncio
+import gzip
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+import main
+
+SERVICE_URL = "http://orders-service:8002"
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # сервисы за шлюзом: ответ задает тест, запросы шлюза сохраняются
+    state = {"requests": [], "response": httpx.Response(200, json={"success": True})}
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(request)
+        response = state["response"]
+        if isinstance(response, Exception):
+            raise response
+        return response
+    
+    async_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        main.httpx, "AsyncClient", lambda **kwargs: async_client(transport=httpx.MockTransport(handler), **kwargs)
+    )
+    return state
+
+def proxy(method: str, path: str, query: bytes = b"", body: bytes = b"", headers: dict = None, request_id: str = None):
+    # запрос к шлюзу без стека middleware: proxy_request получает готовый Request
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": f"/v1/{path}",
+        "query_string": query,
+        "headers": [(name.lower().encode(), value.encode()) for name, value in {
+            "Host": "gateway:8000", "Authorization": "Bearer token", **(headers or {})
+        }.items()],
+        "state": {"request_id": request_id} if request_id else {}
+    }
+    return asyncio.run(main.proxy_request(Request(scope, receive), SERVICE_URL, path))
+
+class TestGatewayProxy:
+    
+    def test_1_body_is_relayed_byte_for_byte(self, upstream):
+        # форматирование upstream (пробелы, 1.50) сохраняется: шлюз не перекодирует JSON
+        body = b'{"success": true,  "data": {"total_amount": 1.50}}'
+        upstream["response"] = httpx.Response(201, content=body, headers={
+            "Content-Type": "application/json", "ETag": '"3"', "Connection": "keep-alive", "Keep-Alive": "timeout=5"
+        })
+        
+        response = proxy("GET", "orders/order_1")
+        
+        assert response.status_code == 201
+        assert response.body == body
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["etag"] == '"3"'
+        assert response.headers["content-length"] == str(len(body))
+        assert "connection" not in response.headers
+        assert "keep-alive" not in response.headers
+    
+    def test_2_compressed_upstream_is_not_double_decoded(self, upstream):
+        # httpx уже распаковал тело: content-encoding upstream не должен дойти до клиента
+        body = b'{"success": true, "data": {"orders": []}}'
+        upstream["response"] = httpx.Response(200, content=gzip.compress(body), headers={
+            "Content-Type": "application/json", "Content-Encoding": "gzip", "Transfer-Encoding": "chunked"
+        })
+        
+        response = proxy("GET", "orders")
+        
+        assert response.body == body
+        assert "content-encoding" not in response.headers
+        assert "transfer-encoding" not in response.headers
+        assert response.headers["content-length"] == str(len(body))
+    
+    def test_3_request_is_forwarded(self, upstream):
+        proxy("PUT", "orders/order_1/status", body=b'{"status": "completed"}', request_id="req-1")
+        
+        request = upstream["requests"][0]
+        assert request.method == "PUT"
+        assert str(request.url) == f"{SERVICE_URL}/v1/orders/order_1/status"
+        assert request.content == b'{"status": "completed"}'
+        assert request.headers["x-request-id"] == "req-1"
+        assert request.headers["authorization"] == "Bearer token"
+        assert request.headers["host"] == "orders-service:8002"
+    
+    def test_4_unreachable_service(self, upstream):
+        upstream["response"] = httpx.ConnectError("connection refused")
+        
+        response = proxy("GET", "orders")
+        
+        assert response.status_code == 503
+        assert b"SERVICE_UNAVAILABLE" in response.body
+    
+    def test_5_repeated_query_params_are_forwarded(self, upstream):
+        proxy("GET", "orders", query=b"status=created&status=in_progress&limit=5&fields=id%2Cstatus")
+        
+        params = upstream["requests"][0].url.params
+        assert params.get_list("status") == ["created", "in_progress"]
+        assert params["limit"] == "5"
+        assert params["fields"] == "id,status"
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# общий хук лежит в tests/: при запуске из этого каталога pytest не добавляет его в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service_modules import isolate_service  # noqa: E402
+
+# DATABASE_URL задается до импорта database: модуль создает user_db при импорте
+pytest_collectstart = isolate_service(
+    "service_users", DATABASE_URL=os.path.join(tempfile.mkdtemp(), "users.db")
+)
+
+@pytest.fixture(scope="session", autouse=True)
+def check_services():
+    """Сервисы для юнит-тестов не нужны"""
+    yield
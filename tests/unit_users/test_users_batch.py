@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database import UserDB
+
+ADMIN = {"user_id": "admin_1", "roles": ["admin"]}
+NOW = datetime(2024, 1, 1)
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    db = UserDB(db_path=str(tmp_path / "users.db"))
+    monkeypatch.setattr(main, "user_db", db)
+    db.create_users_bulk([
+        {
+            "id": f"user_{i}", "email": f"user{i}@example.com", "password_hash": "x",
+            "name": f"User {i}", "roles": ["user"], "created_at": NOW, "updated_at": NOW
+        }
+        for i in range(3)
+    ])
+    return db
+
+@pytest.fixture
+def client(user_db):
+    main.app.dependency_overrides[main.verify_token] = lambda: ADMIN
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+class TestUsersBatchLookup:
+    
+    def test_1_get_and_post_return_the_same_profiles(self, client):
+        by_get = client.get("/v1/users/batch?ids=user_0,user_2&ids=user_9&ids=user_0").json()
+        by_post = client.post("/v1/users/batch", json={"ids": ["user_0", "user_2", "user_9", "user_0"]}).json()
+        
+        assert by_get == by_post
+        assert by_get["data"] == {
+            "users": {
+                "user_0": {"email": "user0@example.com", "name": "User 0"},
+                "user_2": {"email": "user2@example.com", "name": "User 2"}
+            },
+            "missing": ["user_9"]
+        }
+    
+    def test_2_too_many_ids_same_error_for_get_and_post(self, client):
+        ids = [f"user_{i}" for i in range(main.BATCH_MAX_IDS + 1)]
+        
+        by_get = client.get("/v1/users/batch", params={"ids": ",".join(ids)})
+        by_post = client.post("/v1/users/batch", json={"ids": ids})
+        
+        assert by_get.status_code == by_post.status_code == 200
+        assert by_get.json()["error"]["code"] == by_post.json()["error"]["code"] == "INVALID_IDS"
+    
+    def test_3_empty_post_is_invalid_ids(self, client):
+        response = client.post("/v1/users/batch", json={"ids": []})
+        
+        assert response.json()["success"] == False
+        assert response.json()["error"]["code"] == "INVALID_IDS"
@@ -0,0 +1,79 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import database
+from database import UserDB, to_db_time
+
+NOW = datetime(2024, 1, 1)
+
+def new_user(user_id: str, email: str) -> dict:
+    return {
+        "id": user_id, "email": email, "password_hash": "x", "name": "Cached User",
+        "roles": ["user"], "created_at": NOW, "updated_at": NOW
+    }
+
+def insert_directly(user_db, user_id: str, email: str):
+    # запись мимо этого UserDB - как из другого процесса
+    with sqlite3.connect(user_db.db_path) as conn:
+        conn.execute(
+            "INSERT INTO users (id, email, password_hash, name, roles, created_at, updated_at) VALUES (?, ?, 'x', 'Other', 'user', ?, ?)",
+            (user_id, email, to_db_time(NOW), to_db_time(NOW))
+        )
+
+@pytest.fixture
+def user_db(tmp_path):
+    return UserDB(db_path=str(tmp_path / "users.db"))
+
+class TestUsersCache:
+    
+    def test_1_profile_is_served_from_cache_until_update(self, user_db):
+        user_db.create_user(new_user("user_1", "cached@example.com"))
+        user_db.get_user_by_id("user_1")
+        hits = user_db.cache.hits
+        
+        assert user_db.get_user_by_id("user_1").name == "Cached User"
+        assert user_db.cache.hits == hits + 1
+        
+        user_db.update_user("user_1", {"name": "Renamed"})
+        assert user_db.get_user_by_id("user_1").name == "Renamed"
+    
+    def test_2_email_change_evicts_old_email(self, user_db):
+        user_db.create_user(new_user("user_1", "old@example.com"))
+        assert user_db.get_user_by_email("old@example.com").id == "user_1"
+        
+        user_db.update_user("user_1", {"email": "new@example.com"})
+        
+        assert user_db.get_user_by_email("old@example.com") is None
+        assert user_db.get_user_by_email("new@example.com").id == "user_1"
+        assert user_db.get_user_by_id("user_1").email == "new@example.com"
+    
+    def test_3_old_email_can_be_registered_again(self, user_db):
+        user_db.create_user(new_user("user_1", "old@example.com"))
+        user_db.get_user_by_email("old@example.com")
+        user_db.update_user("user_1", {"email": "new@example.com"})
+        
+        user_db.create_user(new_user("user_2", "old@example.com"))
+        
+        assert user_db.get_user_by_email("old@example.com").id == "user_2"
+    
+    def test_4_negative_cache(self, user_db, monkeypatch):
+        monkeypatch.setattr(database, "USER_CACHE_NEGATIVE", True)
+        
+        assert user_db.get_user_by_email("ghost@example.com") is None
+        # промах закэширован: пользователь из другого процесса не виден до истечения TTL
+        insert_directly(user_db, "user_ghost", "ghost@example.com")
+        assert user_db.get_user_by_email("ghost@example.com") is None
+        
+        # регистрация через этот процесс сбрасывает негативную запись
+        assert user_db.get_user_by_email("late@example.com") is None
+        user_db.create_user(new_user("user_late", "late@example.com"))
+        assert user_db.get_user_by_email("late@example.com").id == "user_late"
+    
+    def test_5_negative_cache_disabled_by_default(self, user_db):
+        assert user_db.get_user_by_email("ghost@example.com") is None
+        
+        insert_directly(user_db, "user_ghost", "ghost@example.com")
+        
+        assert user_db.get_user_by_email("ghost@example.com").id == "user_ghost"
@@ -0,0 +1,85 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from auth import verify_password
+from database import UserDB
+
+ADMIN = {"user_id": "admin_1", "roles": ["admin"]}
+NOW = datetime(2024, 1, 1)
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    db = UserDB(db_path=str(tmp_path / "users.db"))
+    monkeypatch.setattr(main, "user_db", db)
+    return db
+
+@pytest.fixture
+def client(user_db, monkeypatch):
+    # маленькие пачки, чтобы строки попали в разные чанки; хэши - в потоках вместо процессов
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(main, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(main, "get_hash_pool", lambda: pool)
+    main.app.dependency_overrides[main.verify_token] = lambda: ADMIN
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+    pool.shutdown()
+
+def ndjson(*rows) -> bytes:
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows).encode()
+
+class TestUsersImport:
+    
+    def test_1_rows_with_errors_do_not_stop_import(self, client, user_db):
+        user_db.create_user({
+            "id": "user_existing", "email": "taken@example.com", "password_hash": "x", "name": "Taken",
+            "roles": ["user"], "created_at": NOW, "updated_at": NOW
+        })
+        
+        body = ndjson(
+            {"email": "first@example.com", "password": "secret1", "name": "First"},
+            "{not json",
+            {"email": "nopassword@example.com", "name": "No Password"},
+            {"email": "taken@example.com", "password": "secret", "name": "Taken Again"},
+            "",
+            {"email": "second@example.com", "password": "secret2", "name": "Second"},
+            {"email": "first@example.com", "password": "secret", "name": "First Again"},
+            {"email": "not-an-email", "password": "secret", "name": "Bad Email"}
+        )
+        response = client.post("/v1/users/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+        
+        data = response.json()["data"]
+        assert data["created"] == 2
+        assert data["failed"] == 5
+        assert [(error["line"], error["code"]) for error in sorted(data["errors"], key=lambda error: error["line"])] == [
+            (2, "INVALID_ROW"),
+            (3, "INVALID_ROW"),
+            (4, "USER_EXISTS"),
+            (7, "USER_EXISTS"),
+            (8, "INVALID_ROW")
+        ]
+        
+        first = user_db.get_user_by_email("first@example.com")
+        assert first.name == "First"
+        assert verify_password("secret1", first.password_hash)
+        assert user_db.get_user_by_email("second@example.com").roles == ["user"]
+        assert user_db.get_user_by_email("taken@example.com").id == "user_existing"
+    
+    def test_2_last_line_without_newline(self, client, user_db):
+        body = ndjson({"email": "last@example.com", "password": "secret", "name": "Last"})
+        
+        data = client.post("/v1/users/import", content=body).json()["data"]
+        
+        assert data == {"created": 1, "failed": 0, "errors": []}
+        assert user_db.get_user_by_email("last@example.com") is not None
+    
+    def test_3_requires_admin(self, client):
+        main.app.dependency_overrides[main.verify_token] = lambda: {"user_id": "user_1", "roles": ["user"]}
+        
+        response = client.post("/v1/users/import", content=ndjson({"email": "a@example.com"}))
+        
+        assert response.status_code == 403
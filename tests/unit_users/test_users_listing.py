@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database import UserDB
+
+ADMIN = {"user_id": "admin_1", "roles": ["admin"]}
+START = datetime(2024, 1, 1)
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    db = UserDB(db_path=str(tmp_path / "users.db"))
+    monkeypatch.setattr(main, "user_db", db)
+    return db
+
+@pytest.fixture
+def client(user_db):
+    main.app.dependency_overrides[main.verify_token] = lambda: ADMIN
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+def create_users(user_db, total: int) -> list:
+    # у пар пользователей одинаковый created_at: порядок внутри пары задает id
+    users = []
+    for i in range(total):
+        created_at = START + timedelta(minutes=i // 2)
+        users.append({
+            "id": f"user_{i:03d}",
+            "email": f"user{i}@example.com",
+            "password_hash": "x",
+            "name": f"User {i}",
+            "roles": ["user"],
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+    user_db.create_users_bulk(users)
+    return users
+
+class TestUsersKeysetPagination:
+    
+    def test_1_cursor_pages_cover_all_users_once(self, client, user_db):
+        users = create_users(user_db, 25)
+        expected = [user["id"] for user in sorted(users, key=lambda user: (user["created_at"], user["id"]), reverse=True)]
+        
+        response = client.get("/v1/users?limit=10")
+        data = response.json()["data"]
+        assert data["pagination"]["total"] == 25
+        assert data["pagination"]["page"] == 1
+        
+        seen = [user["id"] for user in data["users"]]
+        cursor = data["pagination"]["next_cursor"]
+        while cursor:
+            data = client.get("/v1/users", params={"limit": 10, "cursor": cursor}).json()["data"]
+            # страница по курсору не считает COUNT(*)
+            assert "total" not in data["pagination"]
+            seen.extend(user["id"] for user in data["users"])
+            cursor = data["pagination"]["next_cursor"]
+        
+        assert seen == expected
+    
+    def test_2_cursor_continues_after_new_users(self, client, user_db):
+        create_users(user_db, 6)
+        first = client.get("/v1/users?limit=3").json()["data"]
+        
+        # новые пользователи попадают в начало списка и не сдвигают следующую страницу
+        user_db.create_user({
+            "id": "user_new", "email": "new@example.com", "password_hash": "x", "name": "New",
+            "roles": ["user"], "created_at": START + timedelta(days=1), "updated_at": START + timedelta(days=1)
+        })
+        second = client.get("/v1/users", params={"limit": 3, "cursor": first["pagination"]["next_cursor"]}).json()["data"]
+        
+        assert [user["id"] for user in second["users"]] == ["user_002", "user_001", "user_000"]
+        assert second["pagination"]["next_cursor"] is None
+    
+    def test_3_invalid_cursor(self, client, user_db):
+        response = client.get("/v1/users", params={"cursor": "not-a-cursor"})
+        
+        assert response.json()["success"] == False
+        assert response.json()["error"]["code"] == "INVALID_CURSOR"
+
+class TestUsersFields:
+    
+    def test_1_listing_projection_keeps_cursor(self, client, user_db):
+        create_users(user_db, 5)
+        
+        data = client.get("/v1/users", params={"fields": "email", "limit": 3}).json()["data"]
+        assert data["users"] == [{"email": f"user{i}@example.com"} for i in (4, 3, 2)]
+        
+        data = client.get("/v1/users", params={"fields": "id", "cursor": data["pagination"]["next_cursor"]}).json()["data"]
+        assert data["users"] == [{"id": "user_001"}, {"id": "user_000"}]
+    
+    def test_2_profile_projection(self, client, user_db):
+        user_db.create_user({
+            "id": ADMIN["user_id"], "email": "admin@example.com", "password_hash": "x", "name": "Admin",
+            "roles": ["admin"], "created_at": START, "updated_at": START
+        })
+        
+        body = client.get("/v1/users/me", params={"fields": "name,roles"}).json()
+        
+        assert body["data"] == {"name": "Admin", "roles": ["admin"]}
+    
+    def test_3_unknown_fields_are_rejected(self, client, user_db):
+        for path in ("/v1/users", "/v1/users/me"):
+            body = client.get(path, params={"fields": "id,password_hash"}).json()
+            assert body["success"] == False
+            assert body["error"]["code"] == "INVALID_FIELDS"
@@ -0,0 +1,41 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import manage
+from database import UserDB
+
+NOW = datetime(2024, 1, 1)
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    db = UserDB(db_path=str(tmp_path / "users.db"))
+    if not db.search_enabled:
+        pytest.skip("FTS5 trigram is not available in this SQLite build")
+    monkeypatch.setattr(manage, "user_db", db)
+    db.create_users_bulk([
+        {
+            "id": f"user_{i}", "email": f"user{i}@tenant{i % 3}.example.com", "password_hash": "x",
+            "name": f"User {i}", "roles": ["user"], "created_at": NOW, "updated_at": NOW
+        }
+        for i in range(9)
+    ])
+    return db
+
+class TestUsersSearchIndex:
+    
+    def test_1_substring_search_uses_index(self, user_db):
+        users = user_db.get_all_users(email_filter="tenant1.example")
+        
+        assert sorted(user.id for user in users) == ["user_1", "user_4", "user_7"]
+        assert user_db.get_users_count(email_filter="tenant1.example", name_filter="User 4") == 1
+    
+    def test_2_rebuild_command_restores_index(self, user_db):
+        # индекс, разошедшийся с таблицей (как после VACUUM), ничего не находит
+        with sqlite3.connect(user_db.db_path) as conn:
+            conn.execute("INSERT INTO users_search(users_search) VALUES ('delete-all')")
+        assert user_db.get_all_users(email_filter="tenant1.example") == []
+        
+        assert manage.rebuild_search_index(None) == 0
+        assert len(user_db.get_all_users(email_filter="tenant1.example")) == 3